@@ -82,7 +82,86 @@ class Settings(BaseSettings):
     # セキュリティ設定
     ENCRYPT_CREDENTIALS: bool = True
     AUTO_DELETE_CREDENTIALS: bool = True
-    
+
+    # === PDF生成設定 ===
+    # 常駐 wkhtmltopdf ワーカー数（0 でプール無効、毎回プロセスを起動）
+    PDF_RENDER_POOL_SIZE: int = 2
+    # 1ワーカーあたりの処理ジョブ数上限（超えたらプロセスを再起動）
+    PDF_RENDER_WORKER_MAX_JOBS: int = 100
+    # 常駐ワーカー用の作業ディレクトリ（空の場合は /dev/shm、なければ OS 既定の一時ディレクトリ）
+    PDF_SCRATCH_DIR: str = ""
+    # 同時レンダリング数の上限（イベントループ外のスレッドで実行）
+    PDF_RENDER_MAX_CONCURRENCY: int = 2
+    # 実行待ちキューの上限（超えたら 429 を返す）
+    PDF_RENDER_MAX_QUEUE: int = 8
+    # 実行待ちの最大秒数（超えたら 503 を返す）
+    PDF_RENDER_QUEUE_TIMEOUT: int = 30
+    # 優先度クラスごとの同時実行数上限（0 で PDF_RENDER_MAX_CONCURRENCY まで）。対話的なダウンロードは上限なし
+    PDF_RENDER_MAIL_MAX_CONCURRENCY: int = 1
+    PDF_RENDER_BATCH_MAX_CONCURRENCY: int = 1
+    # 低優先度（メール・一括出力）の要求がこの秒数以上待った場合は優先度に関係なく先に実行する
+    PDF_RENDER_STARVATION_SECONDS: float = 10.0
+    # レンダリングの同時実行数を実測遅延・メモリの空きに応じて自動調整するか（初期値は PDF_RENDER_MAX_CONCURRENCY）
+    PDF_ADAPTIVE_CONCURRENCY: bool = False
+    # 自動調整の下限・上限（上限 0 で CPU コア数）
+    PDF_ADAPTIVE_MIN_CONCURRENCY: int = 1
+    PDF_ADAPTIVE_MAX_CONCURRENCY: int = 0
+    # 直近のレンダリング時間が基準のこの倍率を超えたら同時実行数を減らす
+    PDF_ADAPTIVE_LATENCY_TOLERANCE: float = 1.5
+    # メモリの空きがこの割合（%）を下回ったら同時実行数を減らす
+    PDF_ADAPTIVE_MIN_MEMORY_PERCENT: float = 10.0
+    # 議事録PDFのレンダリングが直近の p95 を超えたら同じレンダリングをもう1つ起動し、先に終わった方を使うか
+    PDF_HEDGE_RENDERS: bool = False
+    # 同時に実行するヘッジの上限（レンダリングの同時実行数に対する割合、%）
+    PDF_HEDGE_MAX_PERCENT: float = 50.0
+    # 生成中にクライアントの切断・期限（X-Request-Timeout）を確認する間隔（秒）
+    PDF_DISCONNECT_POLL_INTERVAL: float = 0.5
+    # 生成済み PDF キャッシュの容量（バイト、0 で無効）
+    PDF_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    # 同一内容の PDF 生成が同時に要求された場合に1回の生成結果を共有するか
+    PDF_SINGLE_FLIGHT: bool = True
+    # 大きな議事録のサニタイズ・テンプレート処理を行う別プロセス数（0 で無効）
+    PDF_PREP_PROCESS_WORKERS: int = 2
+    # 別プロセスで処理する議事録HTMLの最小サイズ（文字数）
+    PDF_PREP_PROCESS_THRESHOLD_BYTES: int = 512 * 1024
+    # 埋め込み画像（data URI）を縮小する印刷解像度（dpi、0 で無効）
+    PDF_IMAGE_DPI: int = 150
+    # 埋め込み画像を JPEG で再エンコードする際の品質
+    PDF_IMAGE_JPEG_QUALITY: int = 85
+    # PDF生成ジョブ（/api/pdf/jobs）の結果の保持秒数
+    PDF_JOB_TTL_SECONDS: int = 600
+    # 未完了の PDF生成ジョブ数の上限（超えたら 429 を返す）
+    PDF_JOB_MAX_PENDING: int = 32
+    # 保持する PDF生成ジョブの結果の合計バイト数の上限（超えたら完了が古いジョブから破棄する）
+    PDF_JOB_MAX_RESULT_BYTES: int = 268435456
+    # 一括出力（/api/pdf/batch）1回あたりの最大件数
+    PDF_BATCH_MAX_ITEMS: int = 100
+    # 議事録本文をシャードに分けて並行レンダリングする最小サイズ（文字数、0 で無効）。
+    # 実機の wkhtmltopdf での計測結果（bench_sharded_render）が得られるまで既定は無効とする
+    PDF_SHARD_THRESHOLD_BYTES: int = 0
+    # 分割レンダリングの最大シャード数（= 1件あたりの wkhtmltopdf 同時実行数）
+    PDF_SHARD_MAX_SHARDS: int = 4
+    # /api/pdf/export の PDF 受け渡し方式（file: 出力ファイルをそのまま送信して削除 / memory: メモリ上のバイト列）
+    PDF_DELIVERY_MODE: str = "file"
+    # PDF を線形化（Fast Web View）して出力する既定値（リクエストの linearize で上書き可、pikepdf が必要）
+    PDF_LINEARIZE: bool = False
+    # プレビュー画像（/api/pdf/preview）の解像度（dpi）
+    PDF_PREVIEW_DPI: int = 60
+    # プレビューできる先頭ページ数の上限
+    PDF_PREVIEW_MAX_PAGES: int = 3
+    # プレビュー画像キャッシュの容量（バイト、0 で無効）
+    PDF_PREVIEW_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    # 起動時に wkhtmltopdf のウォームアップレンダリングを行うか（フォント・常駐ワーカーを事前に温める）
+    PDF_RENDERER_WARMUP: bool = True
+    # 同梱の日本語フォントのディレクトリ（'Hiragino Sans' / 'Yu Gothic' / 'Meiryo' をこのフォントに割り当てる、空の場合は OS のフォント）
+    PDF_FONT_DIR: str = ""
+    # 同梱フォント用の fontconfig 設定・キャッシュの作成先（空の場合は OS の一時ディレクトリ/pdf-fontconfig）
+    PDF_FONT_CACHE_DIR: str = ""
+    # 単純な議事録（見出し・段落・リスト・表のみ）を wkhtmltopdf を起動せず reportlab で生成するか
+    PDF_ENGINE_ROUTING: bool = False
+    # reportlab で生成してよいインライン装飾（太字・リンク等、reportlab では失われる）の最大数
+    PDF_REPORTLAB_MAX_SCORE: int = 0
+
     @validator('CORS_ORIGINS')
     def parse_cors_origins(cls, v):
         """CORS設定を解析してリストに変換"""
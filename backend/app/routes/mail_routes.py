@@ -11,6 +11,7 @@ from typing import Optional
 from services.mail_service import MailService
 from app.config.settings import get_settings
 from services.minutes_pdf_service import generate_minutes_pdf
+from services.render_executor import PRIORITY_MAIL, RenderSaturatedError, run_render
 from services.word_document_service import WordDocumentService
 from app.services.department_service import DepartmentService
 import datetime
@@ -240,7 +241,12 @@ async def send_pdf_email(
 
         # PDF 生成 (集中化サービス)
         try:
-            pdf_bytes = generate_minutes_pdf(request.meetingInfo or {}, request.minutesHtml or '', session_id)
+            # メール送信は対話的なダウンロードより後に実行する
+            pdf_bytes = await run_render(
+                generate_minutes_pdf, request.meetingInfo or {}, request.minutesHtml or '', session_id, priority=PRIORITY_MAIL
+            )
+        except RenderSaturatedError as e:
+            raise HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"PDF生成失敗: {e}")
 
@@ -365,6 +371,8 @@ async def send_pdf_email(
         else:
             raise HTTPException(status_code=500, detail=f"PDFメール送信に失敗しました: {result.get('error')}")
             
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
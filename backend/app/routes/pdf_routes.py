@@ -12,16 +12,29 @@ PDFファイル出力用のAPIルート
     legacy な html_content パラメータも引き続き受け付ける。
 """
 
-from fastapi import APIRouter, HTTPException, Request
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Optional
-import io
+from typing import List, Optional
+import datetime
+import hashlib
+import os
 import re
+import tempfile
 import urllib.parse
 
-from services.minutes_pdf_service import generate_minutes_pdf, normalize_meeting
-from services.pdf_service import generate_pdf_from_html  # 旧互換ルートで直接使用
+from app.config import get_settings
+from services.minutes_pdf_service import generate_minutes_pdf, generate_minutes_pdf_file, normalize_meeting
+from services.pdf_batch import BatchItem, stream_batch_zip
+from services.pdf_jobs import JOB_SUCCEEDED, get_job_store
+from services.pdf_preview import PreviewUnavailableError, cached_minutes_preview, render_minutes_preview
+from services.pdf_service import generate_pdf_file, generate_pdf_from_html  # 旧互換ルートで直接使用
+from services.render_cancel import RenderCancelled
+from services.render_executor import PRIORITY_INTERACTIVE, RenderSaturatedError, run_render_cancellable
+from services.renderer_discovery import RENDERER_READY, renderer_status
+from services import pdf_metrics
+from services.template_registry import get_asset_text
 
 router = APIRouter(tags=["pdf"])
 
@@ -85,16 +98,109 @@ def generate_pdf_filename(meeting_info: dict) -> str:
     
     return sanitize_filename(filename)
 
-def encode_filename_for_header(filename: str) -> str:
+def encode_filename_for_header(filename: str, disposition: str = "attachment") -> str:
     """HTTPヘッダー用にファイル名をエンコード（RFC 6266準拠）"""
     # ASCII文字のみの場合はそのまま
     try:
         filename.encode('ascii')
-        return f"attachment; filename=\"{filename}\""
+        return f"{disposition}; filename=\"{filename}\""
     except UnicodeEncodeError:
         # 日本語など非ASCII文字が含まれる場合はUTF-8エンコード
         encoded = urllib.parse.quote(filename.encode('utf-8'))
-        return f"attachment; filename*=UTF-8''{encoded}"
+        return f"{disposition}; filename*=UTF-8''{encoded}"
+
+
+_RANGE_PATTERN = re.compile(r'bytes=(\d*)-(\d*)')
+
+
+def parse_range_header(range_header: Optional[str], size: int):
+    """Range ヘッダー（単一範囲のみ）を解釈し、(開始, 終了) の閉区間を返す
+
+    ヘッダーがない・複数範囲・書式不正の場合は None（全体を返す）。
+    満たせない範囲の場合は ValueError（416 を返す）。
+    """
+    if not range_header:
+        return None
+    match = _RANGE_PATTERN.fullmatch(range_header.strip())
+    if match is None or (not match.group(1) and not match.group(2)):
+        return None
+    first, last = match.group(1), match.group(2)
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if start >= size or (last and int(last) < start):
+            raise ValueError(range_header)
+    else:
+        # 末尾から N バイト
+        suffix = int(last)
+        if suffix == 0:
+            raise ValueError(range_header)
+        start, end = max(0, size - suffix), size - 1
+    return start, end
+
+
+def requested_range(request: Request, size: int, etag_header: str):
+    """Range / If-Range ヘッダーから返す範囲を決める（parse_range_header と同じ戻り値・例外）"""
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # If-Range が現在の ETag と一致しない場合は全体を返す
+    if not range_header or (if_range and if_range != etag_header):
+        return None
+    return parse_range_header(range_header, size)
+
+
+def _download_headers(filename: str, etag: str, disposition: str) -> dict:
+    return {
+        "Content-Disposition": encode_filename_for_header(filename, disposition),
+        "Accept-Ranges": "bytes",
+        "ETag": f'"{etag}"',
+    }
+
+
+def pdf_download_response(data: bytes, filename: str, etag: str, request: Request, disposition: str) -> Response:
+    """PDF を Range リクエスト対応で返す（線形化 PDF をブラウザで開く際の部分取得用）"""
+    headers = _download_headers(filename, etag, disposition)
+    try:
+        byte_range = requested_range(request, len(data), headers["ETag"])
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{len(data)}"})
+    if byte_range is not None:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+        return Response(content=data[start:end + 1], status_code=206, media_type="application/pdf", headers=headers)
+    return Response(content=data, media_type="application/pdf", headers=headers)
+
+
+def file_etag(path: str) -> str:
+    """ファイル内容の ETag（ジョブ結果と同じく SHA-256 の先頭 32 桁、チャンク単位で読む）"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(TempFileResponse.chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+async def pdf_file_download_response(path: str, filename: str, request: Request, disposition: str) -> Response:
+    """生成済みの PDF ファイルを Range リクエスト対応でチャンク送信し、送信後にファイルを削除する
+
+    pdf_download_response のファイル版（Starlette 0.27 の FileResponse は Range に対応していないため）。
+    """
+    size = os.path.getsize(path)
+    etag = await run_in_threadpool(file_etag, path)
+    headers = _download_headers(filename, etag, disposition)
+    try:
+        byte_range = requested_range(request, size, headers["ETag"])
+    except ValueError:
+        remove_file(path)
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    status_code = 200
+    start, end = 0, size - 1
+    if byte_range is not None:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return TempFileResponse(path, start, end, status_code=status_code, media_type="application/pdf", headers=headers)
 
 
 class PdfExportRequest(BaseModel):
@@ -105,64 +211,16 @@ class PdfExportRequest(BaseModel):
     minutesHtml: Optional[str] = None
     filename: str = "document"
     title: str = "エクスポートされたドキュメント"
+    # 線形化（Fast Web View）して出力するか（省略時は設定値 PDF_LINEARIZE）
+    linearize: Optional[bool] = None
 
 
-@router.post("/export")
-async def export_to_pdf(request: PdfExportRequest, fastapi_request: Request):
-    """PDFダウンロードエンドポイント (テンプレート統一版)
-
-    優先ロジック:
-      1. minutesHtml が提供された場合: meeting_minutes.html テンプレートでレンダリングし generate_pdf_from_html。
-      2. それ以外 (互換モード): html_content をそのまま PdfExportService.html_to_pdf。
-    """
-    try:
-        if request.minutesHtml is not None:
-            # セッションIDを取得
-            session_id = getattr(fastapi_request.state, 'session_id', None)
-            
-            # 会議情報 + 議事録本文 => テンプレートレンダリング
-            meeting = normalize_meeting(request.meetingInfo or {})
-
-            # 分類項目はテンプレート側から既に削除済み (meeting_minutes.html)
-            # minutesHtml をサニタイズ (mail_routes と同等ポリシー)
-            try:
-                pdf_bytes = generate_minutes_pdf(meeting, request.minutesHtml or '', session_id)
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"PDF生成失敗: {e}")
-
-            # ファイル名を新しい形式で生成（【社外秘】_会議日（YYYY-MM-DD）_会議タイトル）
-            pdf_filename = generate_pdf_filename(meeting)
-
-            return StreamingResponse(
-                io.BytesIO(pdf_bytes),
-                media_type="application/pdf",
-                headers={
-                    "Content-Disposition": encode_filename_for_header(f"{pdf_filename}.pdf")
-                }
-            )
-
-        # 互換: 従来の html_content ルート
-        if not request.html_content:
-            raise HTTPException(status_code=400, detail="minutesHtml もしくは html_content のいずれかが必要です")
-
-        # 旧互換ルート: 受け取った HTML をそのまま wkhtmltopdf ラッパへ渡す
-        try:
-            # To ensure legacy html_content also uses shared CSS, wrap it in a
-            # minimal HTML that inlines backend/templates/pdf.css if present.
-            from pathlib import Path
-            backend_dir = Path(__file__).resolve().parents[2]  # project root/backend/app/.. -> backend/
-            templates_dir = backend_dir / 'templates'
-            css_text = ''
-            css_path = templates_dir / 'pdf.css'
-            try:
-                if css_path.exists():
-                    css_text = css_path.read_text(encoding='utf-8')
-            except Exception:
-                css_text = ''
-
-            raw_html = request.html_content or ''
-            if css_text:
-                wrapped = f"""
+def wrap_legacy_html(raw_html: str) -> str:
+    """旧互換の html_content を backend/templates/pdf.css を埋め込んだ最小限の HTML で包む"""
+    css_text = get_asset_text('pdf.css')
+    if not css_text:
+        return raw_html
+    return f"""
 <!doctype html>
 <html>
 <head>
@@ -176,20 +234,276 @@ async def export_to_pdf(request: PdfExportRequest, fastapi_request: Request):
 </body>
 </html>
 """
-            else:
-                wrapped = raw_html
 
-            pdf_data = generate_pdf_from_html(wrapped, confidential_level=request.meeting_info.get('機密レベル', '社外秘') if request.meeting_info else '社外秘')
+
+def build_render_call(request: PdfExportRequest, session_id: Optional[str], output_path: Optional[str] = None):
+    """リクエストから (生成関数, 位置引数, キーワード引数, ファイル名（拡張子なし）) を組み立てる
+
+    minutesHtml があれば meeting_minutes.html テンプレート経由、なければ旧互換の html_content をそのまま使う。
+    output_path を指定した場合は PDF を返さずそのファイルへ書き出す生成関数を使う。
+    """
+    linearize = request.linearize if request.linearize is not None else get_settings().PDF_LINEARIZE
+    if request.minutesHtml is not None:
+        # 会議情報 + 議事録本文 => テンプレートレンダリング（サニタイズは generate_minutes_pdf 内で mail_routes と同等ポリシー）
+        meeting = normalize_meeting(request.meetingInfo or {})
+        # ファイル名を新しい形式で生成（【社外秘】_会議日（YYYY-MM-DD）_会議タイトル）
+        pdf_filename = generate_pdf_filename(meeting)
+        kwargs = {'linearize': linearize}
+        if output_path is not None:
+            return generate_minutes_pdf_file, (meeting, request.minutesHtml or '', output_path, session_id), kwargs, pdf_filename
+        return generate_minutes_pdf, (meeting, request.minutesHtml or '', session_id), kwargs, pdf_filename
+
+    # 互換: 従来の html_content ルート
+    if not request.html_content:
+        raise HTTPException(status_code=400, detail="minutesHtml もしくは html_content のいずれかが必要です")
+    confidential_level = request.meetingInfo.get('機密レベル', '社外秘') if request.meetingInfo else '社外秘'
+    wrapped = wrap_legacy_html(request.html_content)
+    kwargs = {'confidential_level': confidential_level, 'linearize': linearize}
+    if output_path is not None:
+        return generate_pdf_file, (wrapped, output_path), kwargs, request.filename
+    return generate_pdf_from_html, (wrapped,), kwargs, request.filename
+
+
+class TempFileResponse(StreamingResponse):
+    """ファイルの start〜end バイト（閉区間）をチャンク単位で送信し、送信完了後（切断時も含む）にファイルを削除するレスポンス"""
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, path: str, start: int, end: int, **kwargs):
+        self.path = path
+        super().__init__(self._read_chunks(path, start, end), **kwargs)
+
+    async def _read_chunks(self, path: str, start: int, end: int):
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await run_in_threadpool(f.read, min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            remove_file(self.path)
+
+
+def remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def new_output_path() -> str:
+    """ファイル配信用の出力ファイルを作成してパスを返す（PDF_SCRATCH_DIR、未設定時は OS の一時ディレクトリ）"""
+    fd, path = tempfile.mkstemp(prefix='pdf-export-', suffix='.pdf', dir=get_settings().PDF_SCRATCH_DIR or None)
+    os.close(fd)
+    return path
+
+
+def saturated_exception(e: RenderSaturatedError) -> HTTPException:
+    return HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+@router.post("/export")
+async def export_to_pdf(request: PdfExportRequest, fastapi_request: Request):
+    """PDFダウンロードエンドポイント (テンプレート統一版)
+
+    優先ロジック:
+      1. minutesHtml が提供された場合: meeting_minutes.html テンプレートでレンダリングし generate_pdf_from_html。
+      2. それ以外 (互換モード): html_content をそのまま generate_pdf_from_html。
+    """
+    output_path = None
+    try:
+        # セッションIDを取得
+        session_id = getattr(fastapi_request.state, 'session_id', None)
+        # ファイル配信: wkhtmltopdf の出力ファイルをそのままチャンク送信し、送信後に削除する
+        if get_settings().PDF_DELIVERY_MODE == 'file':
+            output_path = new_output_path()
+        func, args, kwargs, pdf_filename = build_render_call(request, session_id, output_path)
+        failure_label = "PDF生成失敗" if request.minutesHtml is not None else "PDF生成失敗 (互換ルート)"
+
+        try:
+            # クライアントが切断・期限切れになった場合は wkhtmltopdf を終了させる
+            pdf_bytes = await run_render_cancellable(
+                fastapi_request, func, *args, priority=PRIORITY_INTERACTIVE, **kwargs
+            )
+        except RenderSaturatedError as e:
+            raise saturated_exception(e)
+        except RenderCancelled as e:
+            raise HTTPException(status_code=e.status_code, detail=str(e))
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"PDF生成失敗 (互換ルート): {e}")
-        return StreamingResponse(
-            io.BytesIO(pdf_data),
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": encode_filename_for_header(f"{request.filename}.pdf")
-            }
-        )
+            raise HTTPException(status_code=500, detail=f"{failure_label}: {e}")
+
+        # いずれの配信方法も Range リクエスト（線形化 PDF の部分取得）に対応する
+        if output_path is not None:
+            response = await pdf_file_download_response(output_path, f"{pdf_filename}.pdf", fastapi_request, "attachment")
+            output_path = None  # 以降の削除はレスポンスが行う
+            return response
+        etag = hashlib.sha256(pdf_bytes).hexdigest()[:32]
+        return pdf_download_response(pdf_bytes, f"{pdf_filename}.pdf", etag, fastapi_request, "attachment")
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if output_path is not None:
+            remove_file(output_path)
+
+
+@router.post("/jobs", status_code=202)
+async def create_pdf_job(request: PdfExportRequest, fastapi_request: Request, response: Response):
+    """PDF生成ジョブを登録し、ジョブ ID を返す（結果は /jobs/{job_id}/result から取得）"""
+    session_id = getattr(fastapi_request.state, 'session_id', None)
+    store = get_job_store()
+    try:
+        func, args, kwargs, pdf_filename = build_render_call(request, session_id)
+        # ジョブはクライアントが完了をポーリングで待つため対話的な要求として扱う
+        job = store.submit(func, *args, filename=f"{pdf_filename}.pdf", priority=PRIORITY_INTERACTIVE, **kwargs)
+    except HTTPException:
+        raise
+    except RenderSaturatedError as e:
+        raise saturated_exception(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    response.headers["Location"] = f"{fastapi_request.url.path.rstrip('/')}/{job.id}"
+    return job.to_dict(store.ttl_seconds)
+
+
+class PdfBatchItem(BaseModel):
+    meetingInfo: Optional[dict] = None
+    minutesHtml: str = ""
+
+
+class PdfBatchRequest(BaseModel):
+    items: List[PdfBatchItem]
+    filename: Optional[str] = None
+
+
+@router.post("/batch")
+async def export_pdf_batch(request: PdfBatchRequest, fastapi_request: Request):
+    """複数の議事録 PDF を並行生成し、ZIP でストリーミング返却する
+
+    ZIP 内の各 PDF は /export と同じ generate_pdf_filename の命名で、完成した順に格納される。
+    個別の失敗は一括出力を中断せず、末尾の manifest.json に記録する。
+    """
+    settings = get_settings()
+    if not request.items:
+        raise HTTPException(status_code=400, detail="items が空です")
+    if len(request.items) > settings.PDF_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"一度に出力できるのは {settings.PDF_BATCH_MAX_ITEMS} 件までです")
+
+    session_id = getattr(fastapi_request.state, 'session_id', None)
+    items = []
+    for index, item in enumerate(request.items):
+        try:
+            meeting = normalize_meeting(item.meetingInfo or {})
+        except Exception as e:
+            # 会議情報の形式エラーなどは manifest に記録して続行
+            items.append(BatchItem(index, '', error=str(e)))
+            continue
+        items.append(BatchItem(
+            index,
+            f"{generate_pdf_filename(meeting)}.pdf",
+            render=(generate_minutes_pdf, (meeting, item.minutesHtml, session_id), {}),
+        ))
+
+    zip_name = sanitize_filename(request.filename or f"議事録_{datetime.date.today():%Y%m%d}")
+    return StreamingResponse(
+        stream_batch_zip(items, settings.PDF_RENDER_MAX_CONCURRENCY),
+        media_type="application/zip",
+        headers={"Content-Disposition": encode_filename_for_header(f"{zip_name}.zip")},
+    )
+
+
+class PdfPreviewRequest(BaseModel):
+    meetingInfo: Optional[dict] = None
+    minutesHtml: str = ""
+    # 先頭から何ページ分をプレビューするか（上限は PDF_PREVIEW_MAX_PAGES）
+    pages: int = 1
+
+
+@router.post("/preview")
+async def preview_pdf(request: PdfPreviewRequest, fastapi_request: Request):
+    """議事録PDFの先頭ページを低解像度の PNG 画像で返す（メール送信前のレイアウト確認用）
+
+    /export と同じテンプレートでレンダリングする。同じ内容の再プレビューはキャッシュから返す。
+    """
+    settings = get_settings()
+    if not 1 <= request.pages <= settings.PDF_PREVIEW_MAX_PAGES:
+        raise HTTPException(status_code=400, detail=f"pages は 1 から {settings.PDF_PREVIEW_MAX_PAGES} の範囲で指定してください")
+
+    try:
+        meeting = normalize_meeting(request.meetingInfo or {})
+        # キャッシュキーの計算は本文（数 MB の画像を含みうる）全体をハッシュするため、イベントループ外で行う
+        image = await run_in_threadpool(
+            cached_minutes_preview, meeting, request.minutesHtml, request.pages, settings.PDF_PREVIEW_DPI
+        )
+        if image is None:
+            image = await run_render_cancellable(
+                fastapi_request, render_minutes_preview, meeting, request.minutesHtml, request.pages,
+                settings.PDF_PREVIEW_DPI, priority=PRIORITY_INTERACTIVE,
+            )
+    except RenderSaturatedError as e:
+        raise saturated_exception(e)
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except PreviewUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"プレビュー生成失敗: {e}")
+
+    return Response(content=image, media_type="image/png", headers={"Cache-Control": "no-store"})
+
+
+def _get_job_or_404(job_id: str):
+    job = get_job_store().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="ジョブが見つからないか、有効期限が切れています")
+    return job
+
+
+@router.get("/jobs/{job_id}")
+async def get_pdf_job(job_id: str):
+    """PDF生成ジョブの状態を返す"""
+    job = _get_job_or_404(job_id)
+    return job.to_dict(get_job_store().ttl_seconds)
+
+
+@router.api_route("/jobs/{job_id}/result", methods=["GET", "HEAD"])
+async def get_pdf_job_result(job_id: str, fastapi_request: Request, inline: bool = False):
+    """完了した PDF生成ジョブの PDF を返す（未完了・失敗時は 409）
+
+    Range リクエストに対応しているため、linearize を指定して生成した PDF は
+    inline=true でブラウザのビューアに渡すと先頭ページから順に表示できる。
+    """
+    job = _get_job_or_404(job_id)
+    if job.status != JOB_SUCCEEDED:
+        detail = f"ジョブは完了していません (status={job.status})"
+        if job.error:
+            detail = f"{detail}: {job.error}"
+        raise HTTPException(status_code=409, detail=detail)
+
+    return pdf_download_response(job.result, job.filename, job.etag, fastapi_request, "inline" if inline else "attachment")
+
+
+@router.get("/ready")
+async def get_pdf_readiness():
+    """PDF生成のレディネス（wkhtmltopdf の検出・バージョン確認・ウォームアップが完了していれば 200、それ以外は 503）"""
+    status = renderer_status()
+    if status['state'] != RENDERER_READY:
+        return JSONResponse(status_code=503, content=status, headers={"Retry-After": "5"})
+    return status
+
+
+@router.get("/metrics")
+async def get_pdf_metrics():
+    """PDF生成パイプラインのメトリクス（キャッシュのヒット/ミス等）を返す"""
+    return pdf_metrics.snapshot()
@@ -7,19 +7,19 @@ PDFファイル出力を独立したサービスで管理
 
 import io
 import subprocess
-import shutil
 import tempfile
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 from bs4 import BeautifulSoup
 import re
 from reportlab.lib import colors
 from pathlib import Path
+from xml.sax.saxutils import escape
+
+from services.renderer_discovery import resolve_wkhtmltopdf
+from services.reportlab_fonts import get_reportlab_font, get_reportlab_stylesheet
 
 
 class PdfExportService:
@@ -57,26 +57,8 @@ class PdfExportService:
             PDFファイルのバイトデータ
         """
         try:
-            # まずリポジトリ直下に置かれた wkhtmltopdf 実行ファイル（ユーザー提供）を使って変換を試みる
-            try:
-                repo_root = Path(__file__).resolve().parents[3]
-            except Exception:
-                repo_root = Path.cwd()
-
-            # check for wkhtmltopdf in repo root (either '#file:wkhtmltopdf.exe' or 'wkhtmltopdf.exe') and system PATH
-            candidates = [repo_root / '#file:wkhtmltopdf.exe', repo_root / 'wkhtmltopdf.exe']
-            wk_path = None
-            for c in candidates:
-                try:
-                    if c.exists() and c.is_file():
-                        wk_path = str(c)
-                        break
-                except Exception:
-                    continue
-
-            if wk_path is None:
-                # try system PATH
-                wk_path = shutil.which('wkhtmltopdf') or shutil.which('wkhtmltopdf.exe')
+            # wkhtmltopdf は起動時に1回だけ探索した結果を使う（リポジトリ直下の実行ファイル・PATH 上の順）
+            wk_path = resolve_wkhtmltopdf()
 
             if wk_path:
                 print(f"PdfExportService: attempting wkhtmltopdf at {wk_path}")
@@ -158,29 +140,8 @@ class PdfExportService:
                     print(f"PdfExportService: wkhtmltopdf execution error: {e}")
                     # fallthrough to reportlab implementation
                     pass
-            # Windows日本語フォントを登録
-            default_font = 'Helvetica'  # デフォルト
-            
-            # Windows日本語フォントの優先順位
-            windows_fonts = [
-                ('C:/Windows/Fonts/msgothic.ttc', 'MS Gothic'),
-                ('C:/Windows/Fonts/yugothic.ttc', 'Yu Gothic'),
-                ('C:/Windows/Fonts/meiryo.ttc', 'Meiryo'),
-                ('C:/Windows/Fonts/msmincho.ttc', 'MS Mincho'),
-                ('C:/Windows/Fonts/msgothic.ttf', 'MS Gothic'),
-                ('C:/Windows/Fonts/yugothic.ttf', 'Yu Gothic'),
-                ('C:/Windows/Fonts/meiryo.ttf', 'Meiryo'),
-            ]
-            
-            for font_path, font_name in windows_fonts:
-                try:
-                    pdfmetrics.registerFont(TTFont(font_name, font_path))
-                    default_font = font_name
-                    print(f"日本語フォント '{font_name}' を登録しました")
-                    break
-                except Exception as e:
-                    print(f"フォント '{font_name}' の登録に失敗: {e}")
-                    continue
+            # 日本語フォントとスタイルシートはプロセス内で1回だけ登録・生成したものを共有する
+            default_font = get_reportlab_font()
 
             # クラス変数に保存して他の staticmethod から参照できるようにする
             PdfExportService._default_font = default_font
@@ -190,40 +151,7 @@ class PdfExportService:
             doc = SimpleDocTemplate(buffer, pagesize=A4)
             story = []
 
-            # スタイルシートを取得
-            styles = getSampleStyleSheet()
-            
-            # カスタムスタイルを追加（日本語フォント対応）
-            styles.add(ParagraphStyle(
-                name='CustomHeading1',
-                parent=styles['Heading1'],
-                fontName=default_font,
-                fontSize=16,
-                spaceAfter=12
-            ))
-            styles.add(ParagraphStyle(
-                name='CustomHeading2',
-                parent=styles['Heading2'],
-                fontName=default_font,
-                fontSize=14,
-                spaceAfter=10
-            ))
-            styles.add(ParagraphStyle(
-                name='CustomHeading3',
-                parent=styles['Heading3'],
-                fontName=default_font,
-                fontSize=12,
-                spaceAfter=8
-            ))
-            
-            # 通常テキスト用のスタイルも日本語フォントに設定
-            styles.add(ParagraphStyle(
-                name='JapaneseNormal',
-                parent=styles['Normal'],
-                fontName=default_font,
-                fontSize=10,
-                spaceAfter=6
-            ))
+            styles = get_reportlab_stylesheet()
 
             # HTMLをパース
             soup = BeautifulSoup(html_content, 'html.parser')
@@ -264,23 +192,25 @@ class PdfExportService:
             # 見出し
             level = int(tag_name[1])
             style_name = f'CustomHeading{level}' if level <= 3 else f'Heading{level}'
-            story.append(Paragraph(element.get_text(), styles[style_name]))
+            story.append(Paragraph(escape(element.get_text()), styles[style_name]))
             story.append(Spacer(1, 6))
 
         elif tag_name == 'p':
             # 段落
             text = element.get_text().strip()
             if text:
-                story.append(Paragraph(text, styles['JapaneseNormal']))
+                story.append(Paragraph(escape(text), styles['JapaneseNormal']))
                 story.append(Spacer(1, 6))
 
         elif tag_name in ['ul', 'ol']:
             # リスト
+            number = 0
             for li in element.find_all('li', recursive=False):
                 text = li.get_text().strip()
                 if text:
-                    bullet = "• " if tag_name == 'ul' else f"{len(story) + 1}. "
-                    story.append(Paragraph(bullet + text, styles['JapaneseNormal']))
+                    number += 1
+                    bullet = "• " if tag_name == 'ul' else f"{number}. "
+                    story.append(Paragraph(bullet + escape(text), styles['JapaneseNormal']))
             story.append(Spacer(1, 6))
 
         elif tag_name == 'table':
@@ -291,16 +221,7 @@ class PdfExportService:
             # 引用
             text = element.get_text().strip()
             if text:
-                # 引用用のスタイルを作成
-                quote_style = ParagraphStyle(
-                    name='JapaneseQuote',
-                    parent=styles['Italic'],
-                    fontName=PdfExportService._default_font,
-                    fontSize=10,
-                    leftIndent=20,
-                    spaceAfter=6
-                )
-                story.append(Paragraph(f'"{text}"', quote_style))
+                story.append(Paragraph(f'"{escape(text)}"', styles['JapaneseQuote']))
                 story.append(Spacer(1, 6))
 
     @staticmethod
@@ -325,7 +246,7 @@ class PdfExportService:
             for cell in cells:
                 text = cell.get_text().strip()
                 # Paragraph を使うことで改行や基本的なフォーマットを保つ
-                row_cells.append(Paragraph(text, styles['JapaneseNormal']))
+                row_cells.append(Paragraph(escape(text), styles['JapaneseNormal']))
             if row_cells:
                 data.append(row_cells)
 
@@ -333,7 +254,7 @@ class PdfExportService:
             # Table を作成し罫線スタイルを適用
             tbl = Table(data, hAlign='LEFT')
             tbl_style = TableStyle([
-                ('FONTNAME', (0, 0), (-1, -1), PdfExportService._default_font),
+                ('FONTNAME', (0, 0), (-1, -1), get_reportlab_font()),
                 ('FONTSIZE', (0, 0), (-1, -1), 10),
                 ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
                 ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
@@ -20,6 +20,11 @@ from app.routes import mail_routes, pdf_routes, department_routes
 from app.config import get_settings
 from app.config.database import init_database
 from app.middleware.session_middleware import SessionMiddleware
+from services.renderer_pool import shutdown_renderer_pool
+from services.render_executor import shutdown_render_executor
+from services.cpu_pool import shutdown_cpu_pool
+from services.pdf_jobs import shutdown_job_store
+from services.renderer_discovery import start_renderer_initialization
 from pathlib import Path
 
 # デバッグ: インポートされたルーターの確認
@@ -107,6 +112,21 @@ async def root():
     return {"message": "HTML Editor Backend API"}
 
 
+@app.on_event("startup")
+def start_pdf_renderer():
+    """wkhtmltopdf の検出・バージョン確認・ウォームアップをバックグラウンドで開始（状態は /api/pdf/ready）"""
+    start_renderer_initialization()
+
+
+@app.on_event("shutdown")
+def shutdown_pdf_renderers():
+    """PDF生成ジョブ・レンダリング実行器・CPU プロセスプール・常駐 wkhtmltopdf ワーカーを停止"""
+    shutdown_job_store()
+    shutdown_render_executor()
+    shutdown_cpu_pool()
+    shutdown_renderer_pool()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host=settings.HOST, port=settings.PORT_NO)
\ No newline at end of file
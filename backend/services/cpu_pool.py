@@ -0,0 +1,72 @@
+"""CPUバウンド処理用プロセスプール
+
+責務: 大きな議事録のサニタイズ・テンプレートレンダリングや HTML からのテキスト抽出など、
+GIL を握り続ける純 Python 処理を別プロセスで実行する。
+
+入力サイズがしきい値（PDF_PREP_PROCESS_THRESHOLD_BYTES）以上の場合のみプロセスプールへ送り、
+小さな入力はプロセス間通信のコストを避けて呼び出し元スレッドでそのまま実行する。
+プールで実行する関数と引数は pickle 可能（モジュールのトップレベル関数）である必要がある。
+"""
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from . import pdf_metrics
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    """プロセスプールを取得（無効の場合は None）"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                from app.config import get_settings
+                workers = get_settings().PDF_PREP_PROCESS_WORKERS
+                if workers <= 0:
+                    return None
+                # fork はスレッド（レンダリング実行器・常駐ワーカーの監視）と相性が悪いため spawn を使う
+                _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+                logger.info(f"CPU process pool started: workers={workers}")
+    return _pool
+
+
+def run_cpu_task(func: Callable[..., Any], *args: Any, size: int) -> Any:
+    """func(*args) を実行する（size がしきい値以上ならプロセスプールで実行）
+
+    Args:
+        func: 実行する関数（モジュールのトップレベル関数）
+        size: 入力サイズ（バイト数・文字数の目安）
+    """
+    from app.config import get_settings
+    threshold = get_settings().PDF_PREP_PROCESS_THRESHOLD_BYTES
+    pool = _get_pool() if size >= threshold else None
+    if pool is None:
+        return func(*args)
+
+    pdf_metrics.increment('cpu_pool.tasks')
+    try:
+        return pool.submit(func, *args).result()
+    except BrokenProcessPool as e:
+        # ワーカーが異常終了した場合はプールを作り直し、今回はこのスレッドで実行する
+        logger.error(f"CPU process pool is broken, running in-process: {e}")
+        pdf_metrics.increment('cpu_pool.broken')
+        shutdown_cpu_pool()
+        return func(*args)
+
+
+def shutdown_cpu_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
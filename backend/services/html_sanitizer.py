@@ -0,0 +1,281 @@
+"""議事録HTMLサニタイザ
+
+責務: TinyMCE / Teams / Word から貼り付けられた議事録 HTML を、1回の走査で
+許可タグ・許可属性のみの安全な HTML に変換する。
+
+- <style> / <script> は中身ごと除去
+- テキスト中に残った CSS ルール（例: "p.MsoNormal { margin: 0 }"）を除去
+- 許可されていないタグは除去し、中身のテキストは残す（bleach の strip=True 相当）
+- 許可属性以外、および許可されていない URL スキームの href/src は除去
+- 閉じ忘れたタグは末尾で閉じ、対応しない終了タグは捨てる
+
+入力長に対して線形時間で動作するよう、各処理は str.find と位置固定の単純な
+正規表現（入れ子の量指定子なし）のみで先へ進む。数 MB の base64 画像を含む
+貼り付けでもバックトラッキングは発生しない。
+"""
+from __future__ import annotations
+
+import html
+import re
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional
+
+_TAG_NAME = re.compile(r'[A-Za-z][A-Za-z0-9:_-]*')
+_ATTR_NAME = re.compile(r'[^\s/>="\'<]+')
+_UNQUOTED_VALUE = re.compile(r'[^\s>]*')
+_WHITESPACE = re.compile(r'\s*')
+_URL_SCHEME = re.compile(r'([A-Za-z][A-Za-z0-9+.-]*):')
+_BARE_AMPERSAND = re.compile(r'&(?!(?:#[0-9]{1,8}|#[xX][0-9a-fA-F]{1,8}|[A-Za-z][A-Za-z0-9]{0,31});)')
+_URL_IGNORED_CHARS = re.compile(r'[\x00-\x20]+')
+
+# 中身ごと除去するタグ
+_RAW_TEXT_TAGS = ('script', 'style')
+_RAW_TEXT_END = {name: re.compile(r'</' + name + r'\s*>', re.IGNORECASE) for name in _RAW_TEXT_TAGS}
+
+VOID_TAGS = frozenset({'br', 'img', 'hr', 'wbr'})
+URL_ATTRIBUTES = frozenset({'href', 'src'})
+_CSS_IDENT_CHARS = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ-')
+
+
+def _escape_text(text: str) -> str:
+    """テキストを HTML 用にエスケープ（既存の文字参照は保持）"""
+    if '&' in text:
+        text = _BARE_AMPERSAND.sub('&amp;', text)
+    return text.replace('<', '&lt;').replace('>', '&gt;')
+
+
+def _escape_attr(value: str) -> str:
+    return html.escape(value, quote=True)
+
+
+def strip_css_residue(text: str) -> str:
+    """テキスト中の CSS ルール（識別子 { ... }）を前後の空白ごと除去する
+
+    旧実装の正規表現 ``\\s*[a-zA-Z-]+\\s*{\\s*[^}]*}\\s*`` と同じ範囲を、
+    '{' と '}' の位置探索のみで線形時間に処理する。
+    """
+    if '{' not in text:
+        return text
+
+    out: List[str] = []
+    pos = 0
+    length = len(text)
+    close = -1
+    while True:
+        brace = text.find('{', pos)
+        if brace == -1:
+            break
+        # '}' は前回見つけた位置を過ぎた場合のみ探し直す（'{' ごとに末尾まで走査しない）
+        if close <= brace:
+            close = text.find('}', brace + 1)
+            if close == -1:
+                # 以降の '{' にも対応する '}' はない
+                break
+
+        # '{' の直前: 空白 → 識別子（1文字以上）→ 空白 の順に後ろ向きに確認
+        start = brace
+        while start > pos and text[start - 1].isspace():
+            start -= 1
+        ident_end = start
+        while start > pos and text[start - 1] in _CSS_IDENT_CHARS:
+            start -= 1
+        if start == ident_end:
+            out.append(text[pos:brace + 1])
+            pos = brace + 1
+            continue
+        while start > pos and text[start - 1].isspace():
+            start -= 1
+
+        end = close + 1
+        while end < length and text[end].isspace():
+            end += 1
+        out.append(text[pos:start])
+        pos = end
+
+    out.append(text[pos:])
+    return ''.join(out)
+
+
+class HtmlSanitizer:
+    """許可リスト方式の単一パス HTML サニタイザ（設定済みインスタンスを使い回す）"""
+
+    def __init__(self, tags: Iterable[str], attributes: Mapping[str, Iterable[str]], protocols: Iterable[str],
+                 strip_css: bool = True):
+        self.tags: FrozenSet[str] = frozenset(t.lower() for t in tags) - set(_RAW_TEXT_TAGS)
+        global_attrs = frozenset(a.lower() for a in attributes.get('*', ()))
+        self.attributes: Dict[str, FrozenSet[str]] = {
+            tag: global_attrs | frozenset(a.lower() for a in attributes.get(tag, ()))
+            for tag in self.tags
+        }
+        self.protocols: FrozenSet[str] = frozenset(p.lower() for p in protocols)
+        self.strip_css = strip_css
+
+    def _url_allowed(self, value: str) -> bool:
+        normalized = _URL_IGNORED_CHARS.sub('', value)
+        match = _URL_SCHEME.match(normalized)
+        # スキームなし（相対 URL）は許可
+        return match is None or match.group(1).lower() in self.protocols
+
+    def _emit_text(self, out: List[str], text: str) -> None:
+        if not text:
+            return
+        if self.strip_css:
+            text = strip_css_residue(text)
+        out.append(_escape_text(text))
+
+    def sanitize(self, source: Optional[str]) -> str:
+        """HTML を許可タグ・属性のみにして返す"""
+        if not source:
+            return ''
+
+        out: List[str] = []
+        stack: List[str] = []
+        open_counts: Dict[str, int] = {}
+        # style / script の終了タグの探索結果（タグ名ごと、None は以降に終了タグがない）
+        raw_text_ends: Dict[str, Optional[re.Match]] = {}
+        pos = 0
+        length = len(source)
+
+        while pos < length:
+            lt = source.find('<', pos)
+            if lt == -1:
+                self._emit_text(out, source[pos:])
+                break
+            self._emit_text(out, source[pos:lt])
+            pos = lt
+
+            if source.startswith('<!--', pos):
+                end = source.find('-->', pos + 4)
+                # 閉じていないコメントは末尾まで
+                pos = length if end == -1 else end + 3
+                continue
+
+            nxt = source[pos + 1] if pos + 1 < length else ''
+            if nxt in ('!', '?'):
+                # DOCTYPE / CDATA / 処理命令 / Word の条件付きコメントは除去
+                end = source.find('>', pos + 2)
+                pos = length if end == -1 else end + 1
+                continue
+
+            if nxt == '/':
+                name_match = _TAG_NAME.match(source, pos + 2)
+                if name_match is None:
+                    out.append('&lt;/')
+                    pos += 2
+                    continue
+                end = source.find('>', name_match.end())
+                pos = length if end == -1 else end + 1
+                name = name_match.group(0).lower()
+                if open_counts.get(name):
+                    # 対応する開始タグまでの未閉じタグを閉じる
+                    while stack:
+                        top = stack.pop()
+                        open_counts[top] -= 1
+                        out.append(f'</{top}>')
+                        if top == name:
+                            break
+                continue
+
+            name_match = _TAG_NAME.match(source, pos + 1)
+            if name_match is None:
+                out.append('&lt;')
+                pos += 1
+                continue
+
+            name = name_match.group(0).lower()
+            pos, attrs = self._parse_attributes(source, name_match.end())
+            if pos is None:
+                break
+
+            if name in _RAW_TEXT_TAGS:
+                # 前回の探索結果が現在位置より後ろならそれを使い、同じ範囲を何度も走査しない
+                closing = raw_text_ends.get(name, False)
+                if closing is False or (closing is not None and closing.start() < pos):
+                    closing = raw_text_ends[name] = _RAW_TEXT_END[name].search(source, pos)
+                if closing is None:
+                    # 終了タグがなければ末尾までを中身として除去する
+                    break
+                pos = closing.end()
+                continue
+
+            if name not in self.tags:
+                continue
+
+            allowed = self.attributes[name]
+            parts = [f'<{name}']
+            for attr_name, value in attrs:
+                if attr_name not in allowed:
+                    continue
+                if attr_name == 'style':
+                    # 旧実装（css_sanitizer なしの bleach）と同様、インライン style は適用しない
+                    continue
+                if attr_name in URL_ATTRIBUTES and not self._url_allowed(value):
+                    continue
+                parts.append(f' {attr_name}="{_escape_attr(value)}"')
+            parts.append('>')
+            out.append(''.join(parts))
+
+            if name not in VOID_TAGS:
+                stack.append(name)
+                open_counts[name] = open_counts.get(name, 0) + 1
+
+        while stack:
+            out.append(f'</{stack.pop()}>')
+        return ''.join(out)
+
+    @staticmethod
+    def _parse_attributes(source: str, pos: int):
+        """開始タグの属性を読み取り、(タグ終了位置, [(名前, 値)]) を返す（タグが閉じていなければ位置は None）"""
+        attrs = []
+        seen = set()
+        length = len(source)
+        while True:
+            pos = _WHITESPACE.match(source, pos).end()
+            if pos >= length:
+                return None, attrs
+            ch = source[pos]
+            if ch == '>':
+                return pos + 1, attrs
+            if ch == '/' or ch == '<' or ch in '"\'=':
+                pos += 1
+                continue
+
+            name_match = _ATTR_NAME.match(source, pos)
+            name = name_match.group(0).lower()
+            pos = _WHITESPACE.match(source, name_match.end()).end()
+            value = ''
+            if pos < length and source[pos] == '=':
+                pos = _WHITESPACE.match(source, pos + 1).end()
+                if pos < length and source[pos] in '"\'':
+                    quote = source[pos]
+                    end = source.find(quote, pos + 1)
+                    if end == -1:
+                        return None, attrs
+                    value = source[pos + 1:end]
+                    pos = end + 1
+                else:
+                    value_match = _UNQUOTED_VALUE.match(source, pos)
+                    value = value_match.group(0)
+                    pos = value_match.end()
+                if '&' in value:
+                    value = html.unescape(value)
+            if name not in seen:
+                seen.add(name)
+                attrs.append((name, value))
+
+
+# 議事録本文用の設定済みサニタイザ（旧 bleach 設定と同じ許可リスト）
+MINUTES_ALLOWED_TAGS = frozenset({
+    'a', 'abbr', 'acronym', 'b', 'blockquote', 'code', 'em', 'i', 'strong',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'p', 'br', 'ul', 'ol', 'li',
+    'table', 'thead', 'tbody', 'tr', 'th', 'td', 'div', 'span', 'img',
+})
+MINUTES_ALLOWED_ATTRIBUTES = {
+    '*': ('class', 'style'),
+    'a': ('href', 'title'),
+    'abbr': ('title',),
+    'acronym': ('title',),
+    'img': ('src', 'alt', 'width', 'height'),
+}
+MINUTES_ALLOWED_PROTOCOLS = ('http', 'https', 'data')  # data: は base64 画像用
+
+minutes_sanitizer = HtmlSanitizer(MINUTES_ALLOWED_TAGS, MINUTES_ALLOWED_ATTRIBUTES, MINUTES_ALLOWED_PROTOCOLS)
@@ -5,15 +5,24 @@ Used by: mail_routes (/mail/send-pdf) and pdf_routes (/pdf/export with minutesHt
 """
 from __future__ import annotations
 
+import os
 import re
-from pathlib import Path
 import datetime
-import os
 from typing import Any, Dict
-import bleach
-from jinja2 import Environment, FileSystemLoader, select_autoescape
 
-from .pdf_service import generate_pdf_from_html
+from . import pdf_metrics
+from .cpu_pool import run_cpu_task
+from .html_sanitizer import minutes_sanitizer
+from .pdf_cache import build_cache_key, get_pdf_cache
+from .pdf_singleflight import run_once
+from .pdf_hedge import hedged_render, hedged_render_to_file
+from .pdf_engine import ENGINE_REPORTLAB, ENGINE_WKHTMLTOPDF, choose_engine, record_engine, render_minutes_reportlab
+from .pdf_images import optimize_embedded_images, record_image_metrics
+from .pdf_linearize import linearize_pdf, linearize_pdf_file
+from .pdf_service import generate_pdf_file, generate_pdf_from_html
+from .pdf_shard import render_sharded, shards_for
+from .pdf_stamp import stamp_confidentiality, stamp_confidentiality_file
+from .template_registry import asset_version, get_asset_text, get_template
 
 
 def validate_datetime_format(datetime_str: str) -> bool:
@@ -43,35 +52,6 @@ def validate_datetime_format(datetime_str: str) -> bool:
         return False
 
 
-# Allow class/style so action-item etc. remain, but explicitly exclude style and script tags
-_ALLOWED_TAGS = set(bleach.sanitizer.ALLOWED_TAGS).union({
-    'h1','h2','h3','h4','h5','p','br','ul','ol','li','table','thead','tbody','tr','th','td','div','span','img'
-})
-_ALLOWED_TAGS.discard('style')  # Explicitly remove style tag to prevent CSS from appearing in content
-_ALLOWED_TAGS.discard('script')  # Explicitly remove script tag for security
-
-def _allowed_attrs():  # dynamic to avoid mutating global constant
-    raw_allowed = bleach.sanitizer.ALLOWED_ATTRIBUTES
-    if isinstance(raw_allowed, dict):
-        allowed = dict(raw_allowed)
-        existing = allowed.get('*')
-        if existing is None:
-            allowed['*'] = ['class', 'style']
-        else:
-            if not isinstance(existing, (list, tuple)):
-                existing = [existing]
-            for a in ('class','style'):
-                if a not in existing:
-                    existing.append(a)
-            allowed['*'] = existing
-        
-        # 画像タグの属性を許可
-        allowed['img'] = ['src', 'alt', 'width', 'height', 'class', 'style']
-    else:
-        allowed = {'*': list(raw_allowed) + ['class','style'], 'img': ['src', 'alt', 'width', 'height', 'class', 'style']}
-    return allowed
-
-
 def normalize_meeting(meeting: Dict[str, Any] | None) -> Dict[str, Any]:
     if not meeting:
         return {}
@@ -105,44 +85,39 @@ def normalize_meeting(meeting: Dict[str, Any] | None) -> Dict[str, Any]:
     return normalized
 
 
-def render_minutes_html(meeting: Dict[str, Any], minutes_html: str) -> str:
-    # templates directory (backend/services/ -> backend/templates/)
-    backend_dir = Path(__file__).resolve().parents[1]  # backend/
-    templates_dir = backend_dir / 'templates'
-    
-    if not templates_dir.exists():
-        raise FileNotFoundError(f"Templates directory not found: {templates_dir}")
-    
-    env = Environment(loader=FileSystemLoader(str(templates_dir)), autoescape=select_autoescape(['html','xml']))
-    
-    # 改行処理のカスタムフィルタを追加（\n と /n の両方に対応）
-    def process_line_breaks(text):
-        if not text:
-            return ''
-        return str(text).replace('\\n', '<br/>').replace('/n', '<br/>').replace('\n', '<br/>')
-    
-    env.filters['process_line_breaks'] = process_line_breaks
-    
-    template = env.get_template('meeting_minutes.html')
-
-    # Load shared PDF CSS (if present) and pass its contents to template
-    pdf_css_path = templates_dir / 'pdf.css'
-    pdf_css = ''
-    try:
-        if pdf_css_path.exists():
-            pdf_css = pdf_css_path.read_text(encoding='utf-8')
-    except Exception:
-        pdf_css = ''
+def render_minutes_html(meeting: Dict[str, Any], minutes_html: str, now: str | None = None,
+                        include_front: bool = True, include_back: bool = True) -> str:
+    # コンパイル済みテンプレートと pdf.css はレジストリで共有（更新時刻が変わった時のみ再読込）
+    template = get_template('meeting_minutes.html')
+    pdf_css = get_asset_text('pdf.css')
 
     return template.render(
         meeting=meeting,
         minutes_html=minutes_html,
-        now=datetime.datetime.utcnow().isoformat(),
-        pdf_css=pdf_css
+        now=now or datetime.datetime.utcnow().isoformat(),
+        pdf_css=pdf_css,
+        include_front=include_front,
+        include_back=include_back,
     )
 
 
-def generate_minutes_pdf(meeting_info: Dict[str, Any] | None, minutes_html_raw: str, session_id: str = None) -> bytes:
+def prepare_minutes_html(meeting: Dict[str, Any], minutes_html_raw: str, now: str) -> tuple:
+    """議事録本文のサニタイズ・埋め込み画像の最適化・テンプレートレンダリング
+
+    大きな議事録ではプロセスプール（cpu_pool）から呼ばれるため、引数・戻り値は pickle 可能な値のみとする。
+
+    Returns:
+        (本文HTML, レンダリング済みHTML, 埋め込み画像の統計)
+    """
+    # style/script の除去・CSS 残骸の除去・許可タグ以外の除去を1回の走査で行う
+    safe_minutes_html = minutes_sanitizer.sanitize(minutes_html_raw)
+    # base64 埋め込み画像を印刷解像度まで縮小（同一画像は1回だけ処理）
+    safe_minutes_html, image_stats = optimize_embedded_images(safe_minutes_html)
+    return safe_minutes_html, render_minutes_html(meeting, safe_minutes_html, now=now), image_stats
+
+
+def _prepare_minutes_render(meeting_info: Dict[str, Any] | None, minutes_html_raw: str):
+    """会議情報の正規化・本文の前処理・キャッシュキー計算（generate_minutes_pdf / generate_minutes_pdf_file 共通）"""
     import logging
     logger = logging.getLogger(__name__)
     
@@ -154,29 +129,136 @@ def generate_minutes_pdf(meeting_info: Dict[str, Any] | None, minutes_html_raw:
     confidential_level = meeting.get('機密レベル', '社外秘')
     logger.info(f"Generate minutes PDF - confidential_level: {confidential_level}")
     
-    # HTMLコンテンツの準備
-    cleaned_html = minutes_html_raw or ''
-    
-    # Remove CSS content and style tags completely
-    
-    # Remove <style> tags and their content
-    cleaned_html = re.sub(r'<style[^>]*>.*?</style>', '', cleaned_html, flags=re.DOTALL | re.IGNORECASE)
-    
-    # Remove <script> tags and their content for security
-    cleaned_html = re.sub(r'<script[^>]*>.*?</script>', '', cleaned_html, flags=re.DOTALL | re.IGNORECASE)
-    
-    # Remove any remaining CSS-like content (standalone CSS rules without HTML tags)
-    # This handles cases where CSS is directly in the content without <style> tags
-    cleaned_html = re.sub(r'\s*[a-zA-Z-]+\s*{\s*[^}]*}\s*', '', cleaned_html, flags=re.MULTILINE)
-    
-    # Clean with bleach to ensure only allowed tags and attributes
-    safe_minutes_html = bleach.clean(
-        cleaned_html,
-        tags=_ALLOWED_TAGS,
-        attributes=_allowed_attrs(),
-        protocols=['http', 'https', 'data'],  # data: プロトコルを許可（base64画像用）
-        strip=True
+    # 作成日（1ページ目の作成欄）をここで確定させ、キャッシュキーとレンダリングで同じ値を使う
+    render_date = datetime.date.today()
+
+    # キャッシュするのは機密レベルのスタンプ前の本文 PDF（機密レベル違いでも再利用できる）
+    base_meeting = {k: v for k, v in meeting.items() if k != '機密レベル'}
+
+    # サニタイズ + テンプレートレンダリング（大きな議事録は別プロセスで実行し GIL を占有しない）
+    minutes_html_raw = minutes_html_raw or ''
+    safe_minutes_html, rendered_html, image_stats = run_cpu_task(
+        prepare_minutes_html, base_meeting, minutes_html_raw, render_date.isoformat(), size=len(minutes_html_raw)
     )
-    
-    rendered_html = render_minutes_html(meeting, safe_minutes_html)
-    return generate_pdf_from_html(rendered_html, confidential_level=confidential_level, meeting_info=meeting)
+    record_image_metrics(image_stats)
+
+    # 単純な議事録は reportlab で生成する（PDF_ENGINE_ROUTING 有効時）。出力が異なるためキャッシュキーに含める
+    engine = choose_engine(safe_minutes_html)
+    cache_key = build_cache_key(safe_minutes_html, base_meeting, asset_version(), render_date.isoformat(), engine)
+    return confidential_level, base_meeting, render_date, safe_minutes_html, rendered_html, cache_key, engine
+
+
+def render_minutes_with_reportlab(base_meeting: Dict[str, Any], safe_minutes_html: str,
+                                  render_date: datetime.date) -> bytes | None:
+    """reportlab で議事録PDFを生成する（失敗した場合は None を返し、呼び出し側は wkhtmltopdf で生成する）"""
+    import logging
+    logger = logging.getLogger(__name__)
+    try:
+        return render_minutes_reportlab(base_meeting, safe_minutes_html, render_date)
+    except Exception as e:
+        logger.warning(f"reportlab render failed, falling back to wkhtmltopdf: {e}")
+        pdf_metrics.increment('pdf_engine.reportlab_failed')
+        return None
+
+
+def generate_minutes_pdf(meeting_info: Dict[str, Any] | None, minutes_html_raw: str, session_id: str = None,
+                         linearize: bool = False) -> bytes:
+    import logging
+    logger = logging.getLogger(__name__)
+
+    confidential_level, base_meeting, render_date, safe_minutes_html, rendered_html, cache_key, engine = \
+        _prepare_minutes_render(meeting_info, minutes_html_raw)
+
+    cache = get_pdf_cache()
+    base_pdf = cache.get(cache_key)
+    if base_pdf is not None:
+        logger.info(f"Generate minutes PDF - cache hit: {cache_key[:12]}")
+    else:
+        def render() -> bytes:
+            pdf, used_engine = None, engine
+            if used_engine == ENGINE_REPORTLAB:
+                pdf = render_minutes_with_reportlab(base_meeting, safe_minutes_html, render_date)
+            if pdf is None:
+                used_engine = ENGINE_WKHTMLTOPDF
+                # 非常に長い議事録は章単位のシャードに分けて並行レンダリングする（設定で有効な場合のみ）
+                shards = shards_for(safe_minutes_html)
+                if len(shards) > 1:
+                    logger.info(f"Generate minutes PDF - sharded render: {len(shards)} shards")
+                    pdf = render_sharded(base_meeting, shards, render_date.isoformat(), creation_date=render_date)
+                else:
+                    # 直近の p95 を超えて止まった場合は複製を起動して先に終わった方を使う（PDF_HEDGE_RENDERS 有効時のみ）
+                    pdf = hedged_render(
+                        generate_pdf_from_html,
+                        rendered_html, use_header=False, meeting_info=base_meeting, creation_date=render_date
+                    )
+            record_engine(used_engine, session_id)
+            cache.put(cache_key, pdf)
+            return pdf
+
+        # 同一内容の生成が実行中ならその結果を共有する
+        base_pdf, _ = run_once(cache_key, render)
+
+    pdf = stamp_confidentiality(base_pdf, confidential_level)
+    # 線形化はスタンプ後の最終形に対して行う（キャッシュはスタンプ前の本文のまま）
+    return linearize_pdf(pdf) if linearize else pdf
+
+
+def generate_minutes_pdf_file(meeting_info: Dict[str, Any] | None, minutes_html_raw: str, output_path: str,
+                              session_id: str = None, linearize: bool = False) -> None:
+    """generate_minutes_pdf のファイル版: wkhtmltopdf に output_path へ直接書き出させ、スタンプを追記する
+
+    ファイル配信（PDF_DELIVERY_MODE=file）用。キャッシュには小さな PDF（容量の 1/8 以下）のみ読み込んで登録し、
+    大きな PDF は Python のメモリに載せない。
+    """
+    import logging
+    logger = logging.getLogger(__name__)
+
+    confidential_level, base_meeting, render_date, safe_minutes_html, rendered_html, cache_key, engine = \
+        _prepare_minutes_render(meeting_info, minutes_html_raw)
+
+    cache = get_pdf_cache()
+    base_pdf = cache.get(cache_key)
+    if base_pdf is not None:
+        logger.info(f"Generate minutes PDF - cache hit: {cache_key[:12]}")
+        with open(output_path, 'wb') as f:
+            f.write(base_pdf)
+    else:
+        def render() -> None:
+            pdf, used_engine = None, engine
+            if used_engine == ENGINE_REPORTLAB:
+                pdf = render_minutes_with_reportlab(base_meeting, safe_minutes_html, render_date)
+            if pdf is None:
+                used_engine = ENGINE_WKHTMLTOPDF
+                shards = shards_for(safe_minutes_html)
+                if len(shards) > 1:
+                    # 分割レンダリングの連結はメモリ上で行う
+                    logger.info(f"Generate minutes PDF - sharded render: {len(shards)} shards")
+                    pdf = render_sharded(base_meeting, shards, render_date.isoformat(), creation_date=render_date)
+                else:
+                    # 直近の p95 を超えて止まった場合は別の一時ファイルへ複製を起動する（PDF_HEDGE_RENDERS 有効時のみ）
+                    hedged_render_to_file(
+                        generate_pdf_file, output_path,
+                        rendered_html, use_header=False, meeting_info=base_meeting, creation_date=render_date
+                    )
+            if pdf is not None:
+                with open(output_path, 'wb') as f:
+                    f.write(pdf)
+            record_engine(used_engine, session_id)
+            if os.path.getsize(output_path) <= cache.max_bytes // 8:
+                with open(output_path, 'rb') as f:
+                    cache.put(cache_key, f.read())
+
+        def read_output(_) -> bytes:
+            # スタンプ前の本文を待機中の要求に渡す
+            with open(output_path, 'rb') as f:
+                return f.read()
+
+        # 同一内容の生成が実行中ならその結果（バイト列）を自分の出力ファイルに書き出す
+        shared_pdf, coalesced = run_once(cache_key, render, share=read_output)
+        if coalesced:
+            with open(output_path, 'wb') as f:
+                f.write(shared_pdf)
+
+    stamp_confidentiality_file(output_path, confidential_level)
+    if linearize:
+        linearize_pdf_file(output_path)
@@ -0,0 +1,123 @@
+"""PDF一括出力
+
+責務: 複数の議事録 PDF を並行して生成し、完成した順に ZIP エントリとして
+ストリーミングする。最後に各項目の成否をまとめた manifest.json を追加する。
+
+- レンダリングはレンダリング実行器（render_executor）で行い、1つの一括出力が同時に投入するのは
+  実行器の同時実行数までとする（実行器が飽和している間は待って再試行する）
+- 1件の失敗で一括出力全体を中断せず、manifest.json に記録する
+- PDF は圧縮済みのため ZIP には無圧縮（ZIP_STORED）で格納する
+"""
+from __future__ import annotations
+
+import asyncio
+import datetime
+import json
+import logging
+import time
+import zipfile
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from . import pdf_metrics
+from .render_executor import PRIORITY_BATCH, run_render_retrying
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+
+
+class BatchItem:
+    """一括出力の1項目（render が None の場合は error に受付時の失敗理由を持つ）"""
+
+    def __init__(self, index: int, filename: str,
+                 render: Optional[Tuple[Callable[..., bytes], tuple, dict]] = None, error: Optional[str] = None):
+        self.index = index
+        self.filename = filename
+        self.render = render
+        self.error = error
+
+
+class _ZipStream:
+    """ZipFile の書き込み先。書き込まれたバイト列を溜め、take() で取り出す（シーク不可）"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _unique_name(filename: str, used: Dict[str, int]) -> str:
+    """ZIP 内のファイル名が重複する場合は「名前 (2).pdf」のように番号を付ける"""
+    count = used.get(filename, 0) + 1
+    used[filename] = count
+    if count == 1:
+        return filename
+    stem, dot, ext = filename.rpartition('.')
+    return f"{stem} ({count}).{ext}" if dot else f"{filename} ({count})"
+
+
+async def stream_batch_zip(items: List[BatchItem], concurrency: int) -> AsyncIterator[bytes]:
+    """items を並行して生成し、完成した順に ZIP のバイト列を返す非同期イテレータ"""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def render(item: BatchItem) -> Tuple[BatchItem, Optional[bytes], Optional[str], float]:
+        started = time.monotonic()
+        if item.render is None:
+            return item, None, item.error, 0.0
+        func, args, kwargs = item.render
+        try:
+            async with semaphore:
+                data = await run_render_retrying(func, *args, priority=PRIORITY_BATCH, **kwargs)
+            return item, data, None, time.monotonic() - started
+        except Exception as e:
+            logger.error(f"Batch item {item.index} failed: {e}")
+            return item, None, str(e), time.monotonic() - started
+
+    tasks = [asyncio.ensure_future(render(item)) for item in items]
+    sink = _ZipStream()
+    used_names: Dict[str, int] = {}
+    manifest: List[Dict[str, Any]] = []
+    try:
+        with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_STORED) as archive:
+            for next_done in asyncio.as_completed(tasks):
+                item, data, error, seconds = await next_done
+                entry: Dict[str, Any] = {'index': item.index, 'filename': None, 'status': 'failed', 'error': error}
+                if data is not None:
+                    name = _unique_name(item.filename, used_names)
+                    info = zipfile.ZipInfo(name, date_time=datetime.datetime.now().timetuple()[:6])
+                    archive.writestr(info, data)
+                    entry.update(filename=name, status='succeeded', size=len(data), seconds=round(seconds, 3))
+                    pdf_metrics.increment('pdf_batch.items_succeeded')
+                else:
+                    pdf_metrics.increment('pdf_batch.items_failed')
+                manifest.append(entry)
+                yield sink.take()
+
+            manifest.sort(key=lambda e: e['index'])
+            summary = {
+                'total': len(items),
+                'succeeded': sum(1 for e in manifest if e['status'] == 'succeeded'),
+                'failed': sum(1 for e in manifest if e['status'] == 'failed'),
+                'items': manifest,
+            }
+            archive.writestr(
+                zipfile.ZipInfo(MANIFEST_NAME, date_time=datetime.datetime.now().timetuple()[:6]),
+                json.dumps(summary, ensure_ascii=False, indent=2),
+            )
+        yield sink.take()
+        pdf_metrics.increment('pdf_batch.batches')
+    finally:
+        # クライアント切断などで途中終了した場合は残りの生成を取り消す
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,100 @@
+"""PDF生成結果キャッシュ
+
+責務: 同一内容（サニタイズ済み本文・正規化済み会議情報・機密レベル・テンプレート版）
+の PDF を再生成しないよう、生成結果をバイト数上限付きの LRU で保持する。
+
+プレビュー目的の /api/pdf/export と、その後の /api/mail/send-pdf が同じ内容で
+呼ばれるケースを想定している。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+from . import pdf_metrics
+
+logger = logging.getLogger(__name__)
+
+
+def build_cache_key(*parts: Any) -> str:
+    """キー構成要素を正規化した JSON の SHA-256 をキーとする"""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class PdfResultCache:
+    """バイト数上限付き LRU キャッシュ"""
+
+    def __init__(self, max_bytes: int, metric_prefix: str = 'pdf_cache'):
+        self.max_bytes = max_bytes
+        self.metric_prefix = metric_prefix
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        pdf_metrics.increment(f"{self.metric_prefix}.{'misses' if data is None else 'hits'}")
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        # 上限を超える単一エントリは保持しない
+        if self.max_bytes <= 0 or len(data) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_cache: Optional[PdfResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_pdf_cache() -> PdfResultCache:
+    """プロセス共通の PDF キャッシュを取得"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                from app.config import get_settings
+                _cache = PdfResultCache(get_settings().PDF_CACHE_MAX_BYTES)
+                pdf_metrics.register_provider('pdf_cache', _cache.stats)
+    return _cache
@@ -0,0 +1,232 @@
+"""議事録PDFのレンダリングエンジン選択
+
+責務: サニタイズ済みの議事録本文の複雑さを評価し、プロセス内の reportlab
+（PdfExportService._process_element / _process_table）で十分な再現性が得られる単純な
+議事録（見出し・段落・リスト・表のみ）は reportlab で、それ以外は wkhtmltopdf で PDF 化する。
+
+- 画像・style 属性・装飾クラス（action-item 等）・code・ブロックの入れ子・ブロック外のテキストは
+  reportlab では再現できないため wkhtmltopdf にする（阻害要因）
+- 太字・リンクなどのインライン装飾は reportlab では失われるため、1つごとに1点を加算し、
+  合計が PDF_REPORTLAB_MAX_SCORE 以下の場合のみ reportlab を使う
+- reportlab 版は meeting_minutes.html と同じ構成（1ページ目情報・表題・要約・本文・改ページ後の参加者等）を
+  reportlab の部品で組み立てる（子プロセスは起動しない）。スループットの改善は実機の wkhtmltopdf で
+  計測していないため、振り分けは既定で無効
+- 選択結果はリクエストごとにログへ、件数・理由はメトリクス（pdf_engine.*）に記録する
+"""
+from __future__ import annotations
+
+import io
+import logging
+import re
+from datetime import date
+from typing import Any, Dict, List, NamedTuple, Optional
+from xml.sax.saxutils import escape
+
+from . import pdf_metrics
+
+logger = logging.getLogger(__name__)
+
+ENGINE_REPORTLAB = 'reportlab'
+ENGINE_WKHTMLTOPDF = 'wkhtmltopdf'
+
+# PdfExportService._process_element が処理するブロック要素
+BLOCK_TAGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'ul', 'ol', 'table', 'blockquote')
+# ブロック要素の内側で使える構造用タグ
+_STRUCTURE_TAGS = frozenset({'li', 'thead', 'tbody', 'tr', 'th', 'td'})
+# reportlab では失われるインライン装飾（1つにつき1点）
+_INLINE_TAGS = frozenset({'a', 'abbr', 'acronym', 'b', 'strong', 'em', 'i', 'span', 'br'})
+# pdf.css で装飾されるクラス
+_STYLED_CLASSES = frozenset({'action-item', 'important', 'page-break'})
+
+# サニタイズ済み HTML のタグ（タグ名は小文字、属性値中の '>' はエスケープ済み）
+_TAG = re.compile(r'<(/?)([a-z][a-z0-9]*)([^>]*)>')
+_CLASS_ATTR = re.compile(r'\sclass="([^"]*)"')
+_STYLE_ATTR = re.compile(r'\sstyle="[^"]*\S[^"]*"')
+
+
+class Complexity(NamedTuple):
+    """本文の複雑さ（score: インライン装飾の数、blockers: reportlab で再現できない要素）"""
+    score: int
+    blockers: List[str]
+
+
+def assess_complexity(html: str) -> Complexity:
+    """サニタイズ済みの議事録本文を1回走査して複雑さを評価する"""
+    from .html_sanitizer import VOID_TAGS
+
+    blockers = set()
+    score = 0
+    stack: List[str] = []
+    position = 0
+    for match in _TAG.finditer(html):
+        # ブロック要素の外にある（reportlab では出力されない）テキスト
+        if html[position:match.start()].strip() and not any(tag in BLOCK_TAGS for tag in stack):
+            blockers.add('loose_text')
+        position = match.end()
+
+        closing, name, attrs = match.group(1), match.group(2), match.group(3)
+        if closing:
+            if name in stack:
+                while stack.pop() != name:
+                    pass
+            continue
+
+        if name == 'img':
+            blockers.add('image')
+        elif name == 'code':
+            blockers.add('code')
+        elif name in BLOCK_TAGS:
+            if any(tag in BLOCK_TAGS for tag in stack):
+                blockers.add('nested_block')
+        elif name in _INLINE_TAGS:
+            score += 1
+        elif name not in _STRUCTURE_TAGS and name != 'div':
+            blockers.add(f'tag_{name}')
+        if attrs:
+            if _STYLE_ATTR.search(attrs):
+                blockers.add('inline_style')
+            class_match = _CLASS_ATTR.search(attrs)
+            if class_match and _STYLED_CLASSES.intersection(class_match.group(1).split()):
+                blockers.add('styled_class')
+        if name not in VOID_TAGS:
+            stack.append(name)
+    if html[position:].strip() and not stack:
+        blockers.add('loose_text')
+    return Complexity(score, sorted(blockers))
+
+
+def choose_engine(html: str) -> str:
+    """本文に対して使うエンジン（PDF_ENGINE_ROUTING 無効時は常に wkhtmltopdf）"""
+    from app.config import get_settings
+    settings = get_settings()
+    if not settings.PDF_ENGINE_ROUTING:
+        return ENGINE_WKHTMLTOPDF
+    complexity = assess_complexity(html)
+    if complexity.blockers:
+        for reason in complexity.blockers:
+            pdf_metrics.increment(f'pdf_engine.reason.{reason}')
+        return ENGINE_WKHTMLTOPDF
+    if complexity.score > settings.PDF_REPORTLAB_MAX_SCORE:
+        pdf_metrics.increment('pdf_engine.reason.inline_formatting')
+        return ENGINE_WKHTMLTOPDF
+    return ENGINE_REPORTLAB
+
+
+def record_engine(engine: str, session_id: Optional[str] = None) -> None:
+    """リクエストごとの選択結果を記録する"""
+    pdf_metrics.increment(f'pdf_engine.{engine}')
+    logger.info(f"Minutes PDF engine: {engine} (session: {session_id})")
+
+
+def _text(value: Any) -> str:
+    """テンプレートの process_line_breaks と同じ改行処理をした Paragraph 用テキスト"""
+    if not value:
+        return ''
+    return escape(str(value)).replace('\\n', '<br/>').replace('/n', '<br/>').replace('\n', '<br/>')
+
+
+def _first_page_info(meeting: Dict[str, Any], creation_date: date, font_name: str):
+    """create_first_page_info_html と同じ内容（左: 議事録No.、右: 作成/検認欄）"""
+    from reportlab.lib import colors
+    from reportlab.lib.units import mm
+    from reportlab.platypus import Table, TableStyle
+
+    from .pdf_service import first_page_fields
+
+    minutes_no, creation_text, ka_name, issuer = first_page_fields(meeting, creation_date)
+    number = Table([[f"議事録No.{minutes_no}"]], hAlign='LEFT')
+    number.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), font_name),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('BOX', (0, 0), (-1, -1), 0.75, colors.HexColor('#333333')),
+    ]))
+    approval = Table(
+        [['作成', '検認'], [creation_text, ''], [ka_name, ''], [issuer, '']],
+        colWidths=[14 * mm, 20 * mm], rowHeights=[5 * mm] * 4,
+    )
+    approval.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), font_name),
+        ('FONTSIZE', (0, 0), (-1, -1), 7.5),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f0f0f0')),
+        ('BOX', (0, 0), (-1, -1), 0.75, colors.HexColor('#333333')),
+        ('INNERGRID', (0, 0), (-1, 0), 0.75, colors.HexColor('#333333')),
+        ('LINEAFTER', (0, 1), (0, -1), 0.75, colors.HexColor('#333333')),
+        ('LINEBELOW', (0, 0), (-1, 0), 0.75, colors.HexColor('#333333')),
+        ('SPAN', (1, 1), (1, 3)),
+    ]))
+    layout = Table([[number, approval]], colWidths=['*', 36 * mm])
+    layout.setStyle(TableStyle([
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 0),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+    ]))
+    return layout
+
+
+def render_minutes_reportlab(meeting: Dict[str, Any], minutes_html: str,
+                             creation_date: Optional[date] = None) -> bytes:
+    """meeting_minutes.html と同じ構成の議事録PDFを reportlab で生成する（スタンプなし）"""
+    from bs4 import BeautifulSoup
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import mm
+    from reportlab.platypus import HRFlowable, PageBreak, Paragraph, SimpleDocTemplate, Spacer
+
+    from app.services.pdfExportService import PdfExportService
+    from .pdf_service import PAGE_MARGINS_MM
+    from .reportlab_fonts import get_reportlab_font, get_reportlab_stylesheet
+
+    font_name = get_reportlab_font()
+    styles = get_reportlab_stylesheet()
+    creation_date = creation_date or date.today()
+
+    story: list = [_first_page_info(meeting, creation_date, font_name), Spacer(1, 4 * mm)]
+    story.append(Paragraph(_text(meeting.get('title')), styles['CustomHeading1']))
+    story.append(Paragraph(_text(meeting.get('datetime')), styles['JapaneseNormal']))
+    story.append(Paragraph('要約', styles['CustomHeading3']))
+    story.append(Paragraph(_text(meeting.get('summary')), styles['JapaneseNormal']))
+
+    soup = BeautifulSoup(minutes_html, 'html.parser')
+    for element in soup.find_all(list(BLOCK_TAGS)):
+        PdfExportService._process_element(story, element, styles)
+
+    story.append(HRFlowable(width='100%', thickness=0.5, color='#999999', spaceBefore=6, spaceAfter=6))
+    story.append(PageBreak())
+    sections = [
+        ('参加者', '<br/>'.join(escape(str(p)) for p in meeting.get('participants') or [])),
+        ('講評', _text(meeting.get('review'))),
+        ('発行者', _text(meeting.get('発行者') or meeting.get('issuer'))),
+        ('部門情報', _department_text(meeting)),
+        ('大分類/中分類/小分類', escape(' / '.join(
+            v for v in (meeting.get('major_category'), meeting.get('middle_category'), meeting.get('minor_category')) if v
+        ))),
+    ]
+    for heading, body in sections:
+        story.append(Paragraph(heading, styles['CustomHeading3']))
+        story.append(Paragraph(body, styles['JapaneseNormal']))
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer, pagesize=A4, title=meeting.get('title') or '',
+        topMargin=PAGE_MARGINS_MM['top'] * mm, bottomMargin=PAGE_MARGINS_MM['bottom'] * mm,
+        leftMargin=PAGE_MARGINS_MM['left'] * mm, rightMargin=PAGE_MARGINS_MM['right'] * mm,
+    )
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def _department_text(meeting: Dict[str, Any]) -> str:
+    """テンプレートの部門情報欄と同じ内容"""
+    lines = []
+    if meeting.get('bu') or meeting.get('ka') or meeting.get('job_type'):
+        if meeting.get('bu'):
+            lines.append(f"部: {meeting['bu']}")
+        if meeting.get('ka'):
+            lines.append(f"課: {meeting['ka']}")
+        if meeting.get('job_type'):
+            lines.append(f"職種: {meeting['job_type']}")
+    elif meeting.get('department'):
+        lines.append(str(meeting['department']))
+    return '<br/>'.join(escape(line) for line in lines)
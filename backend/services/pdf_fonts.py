@@ -0,0 +1,231 @@
+"""PDFレンダリング用フォントの準備
+
+責務: テンプレート・pdf.css・ヘッダーが指定する 'Hiragino Sans' / 'Yu Gothic' / 'Meiryo'
+（Linux のレンダリングホストには存在しない）を、同梱フォントディレクトリ（PDF_FONT_DIR）の
+日本語フォントへ即座に解決させる。
+
+- CSS の別名: 3つのファミリー名に同梱フォントファイルを割り当てる @font-face を HTML に挿入する
+  （wkhtmltopdf はファイルを直接読み込み、fontconfig のフォールバック探索を行わない）
+- fontconfig: 同梱ディレクトリと別名を定義した fonts.conf を生成し、起動時に fc-cache で
+  キャッシュを作成しておく（sans-serif など CSS で別名にしていない指定も同梱フォントに解決される）
+- 常駐ワーカーは起動時の環境変数（FONTCONFIG_FILE）を使い続けるため、レンダラープールは
+  ワーカーを起動する前に provision_fonts の完了を待つ
+- PDF_FONT_DIR が未設定の場合は何もしない（従来どおり OS のフォントを使う）
+"""
+from __future__ import annotations
+
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+from xml.sax.saxutils import escape
+
+from . import pdf_metrics
+
+logger = logging.getLogger(__name__)
+
+# テンプレート・CSS が指定している（Linux に存在しない）ファミリー名
+ALIASED_FAMILIES = ('Hiragino Sans', 'Yu Gothic', 'Meiryo')
+FONT_EXTENSIONS = ('.ttf', '.otf', '.ttc')
+# スタイル名から判定する太さ（該当しないものは 400）
+_WEIGHTS = (('black', 900), ('heavy', 900), ('extrabold', 800), ('bold', 700), ('semibold', 600),
+            ('medium', 500), ('light', 300), ('thin', 100))
+_HEAD = re.compile(r'<head\b[^>]*>', re.IGNORECASE)
+
+
+class FontFace(NamedTuple):
+    family: str
+    weight: int
+    path: str
+
+
+def _weight(style: str) -> int:
+    normalized = style.lower().replace(' ', '').replace('-', '')
+    for name, weight in _WEIGHTS:
+        if name in normalized:
+            return weight
+    return 400
+
+
+def scan_font_dir(font_dir: str) -> List[FontFace]:
+    """フォントディレクトリ内のフォント（ファイル名順、斜体は除く）"""
+    from PIL import ImageFont
+
+    faces = []
+    for path in sorted(Path(font_dir).rglob('*')):
+        if path.suffix.lower() not in FONT_EXTENSIONS:
+            continue
+        try:
+            family, style = ImageFont.truetype(str(path), size=12).getname()
+        except Exception as e:
+            logger.warning(f"Skipping unreadable font {path}: {e}")
+            continue
+        if 'italic' in (style or '').lower() or 'oblique' in (style or '').lower():
+            continue
+        faces.append(FontFace(family, _weight(style or ''), str(path.resolve())))
+    return faces
+
+
+class FontProvisioning:
+    """同梱フォントディレクトリから生成する @font-face と fontconfig 設定"""
+
+    def __init__(self, font_dir: str, cache_dir: str):
+        self.font_dir = str(Path(font_dir).resolve())
+        self.cache_dir = cache_dir
+        self.faces = scan_font_dir(self.font_dir)
+        # 別名の割り当て先は最初に見つかったファミリー（同じファミリーの太さ違いを併せて使う）
+        self.family = self.faces[0].family if self.faces else None
+        self.fontconfig_file = os.path.join(cache_dir, 'fonts.conf')
+        self._css = self._build_css()
+
+    def _build_css(self) -> str:
+        weights: Dict[int, str] = {}
+        for face in self.faces:
+            if face.family == self.family:
+                weights.setdefault(face.weight, face.path)
+        rules = []
+        for alias in ALIASED_FAMILIES:
+            for weight, path in sorted(weights.items()):
+                rules.append(
+                    f"@font-face {{ font-family: '{alias}'; font-weight: {weight}; "
+                    f"src: url('{Path(path).as_uri()}'); }}"
+                )
+        return '\n'.join(rules)
+
+    @property
+    def font_face_css(self) -> str:
+        return self._css
+
+    def apply_css(self, html: str) -> str:
+        """HTML の <head> 直後（なければ先頭）に @font-face を挿入する"""
+        if not self._css:
+            return html
+        style = f"<style>\n{self._css}\n</style>"
+        match = _HEAD.search(html)
+        if match is None:
+            return style + html
+        return html[:match.end()] + style + html[match.end():]
+
+    def fontconfig_xml(self) -> str:
+        aliases = ''.join(
+            f'  <alias binding="strong"><family>{escape(alias)}</family><prefer><family>{escape(self.family)}</family></prefer></alias>\n'
+            for alias in ALIASED_FAMILIES + ('sans-serif',)
+        )
+        return (
+            '<?xml version="1.0"?>\n'
+            '<!DOCTYPE fontconfig SYSTEM "fonts.dtd">\n'
+            '<fontconfig>\n'
+            f'  <dir>{escape(self.font_dir)}</dir>\n'
+            f'  <cachedir>{escape(self.cache_dir)}</cachedir>\n'
+            '  <include ignore_missing="yes">/etc/fonts/fonts.conf</include>\n'
+            f'{aliases}'
+            '</fontconfig>\n'
+        )
+
+    def env(self) -> Optional[Dict[str, str]]:
+        """wkhtmltopdf に渡す環境変数（fontconfig を使わない Windows では None）"""
+        if os.name == 'nt' or not os.path.exists(self.fontconfig_file):
+            return None
+        return {**os.environ, 'FONTCONFIG_FILE': self.fontconfig_file}
+
+    def build_cache(self, timeout: float = 120) -> bool:
+        """fonts.conf を書き出し、fc-cache で fontconfig キャッシュを事前に作成する"""
+        if os.name == 'nt' or self.family is None:
+            return False
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self.fontconfig_file, 'w', encoding='utf-8') as f:
+            f.write(self.fontconfig_xml())
+
+        fc_cache = shutil.which('fc-cache')
+        if fc_cache is None:
+            logger.warning("fc-cache not found; the fontconfig cache will be built by the first render")
+            pdf_metrics.increment('pdf_fonts.cache_unavailable')
+            return False
+        started = time.monotonic()
+        proc = subprocess.run([fc_cache, '-f'], env=self.env(), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                              timeout=timeout)
+        if proc.returncode != 0:
+            logger.warning(f"fc-cache failed: {proc.stderr.decode('utf-8', errors='ignore').strip()}")
+            pdf_metrics.increment('pdf_fonts.cache_failed')
+            return False
+        logger.info(f"fontconfig cache built in {time.monotonic() - started:.2f}s: {self.cache_dir}")
+        return True
+
+    def stats(self) -> dict:
+        return {
+            'font_dir': self.font_dir,
+            'family': self.family,
+            'faces': len(self.faces),
+            'fontconfig_file': self.fontconfig_file if self.env() else None,
+        }
+
+
+_provisioning: Optional[FontProvisioning] = None
+_provisioning_lock = threading.Lock()
+_provisioning_loaded = False
+_provisioned = False
+_provision_lock = threading.Lock()
+
+
+def get_font_provisioning() -> Optional[FontProvisioning]:
+    """プロセス共通のフォント設定（PDF_FONT_DIR 未設定・フォントなしの場合は None）"""
+    global _provisioning, _provisioning_loaded
+    if _provisioning_loaded:
+        return _provisioning
+    with _provisioning_lock:
+        if _provisioning_loaded:
+            return _provisioning
+        from app.config import get_settings
+        settings = get_settings()
+        if settings.PDF_FONT_DIR:
+            if os.path.isdir(settings.PDF_FONT_DIR):
+                cache_dir = settings.PDF_FONT_CACHE_DIR or os.path.join(tempfile.gettempdir(), 'pdf-fontconfig')
+                provisioning = FontProvisioning(settings.PDF_FONT_DIR, cache_dir)
+                if provisioning.family is not None:
+                    _provisioning = provisioning
+                    pdf_metrics.register_provider('pdf_fonts', provisioning.stats)
+                else:
+                    logger.warning(f"No usable fonts in PDF_FONT_DIR={settings.PDF_FONT_DIR}")
+            else:
+                logger.warning(f"PDF_FONT_DIR does not exist: {settings.PDF_FONT_DIR}")
+        _provisioning_loaded = True
+    return _provisioning
+
+
+def provision_fonts() -> None:
+    """fonts.conf と fontconfig キャッシュを作成する（プロセスで1回のみ。実行中に呼ばれた場合は完了を待つ）
+
+    起動時処理（レンダラーのウォームアップ前）と、レンダラープールのワーカー起動前に呼ばれる。
+    """
+    global _provisioned
+    if _provisioned:
+        return
+    with _provision_lock:
+        if _provisioned:
+            return
+        try:
+            provisioning = get_font_provisioning()
+            if provisioning is not None:
+                provisioning.build_cache()
+                logger.info(f"PDF fonts provisioned: {provisioning.stats()}")
+        finally:
+            # 失敗しても再試行しない（OS のフォントでレンダリングを続ける）
+            _provisioned = True
+
+
+def apply_font_css(html: str) -> str:
+    """同梱フォントの @font-face を HTML に挿入する（未設定の場合はそのまま）"""
+    provisioning = get_font_provisioning()
+    return provisioning.apply_css(html) if provisioning is not None else html
+
+
+def renderer_env() -> Optional[Dict[str, str]]:
+    """wkhtmltopdf プロセスの環境変数（同梱フォントの fontconfig を使う場合のみ、それ以外は None = 継承）"""
+    provisioning = get_font_provisioning()
+    return provisioning.env() if provisioning is not None else None
@@ -0,0 +1,253 @@
+"""議事録PDFレンダリングのヘッジ実行
+
+責務: wkhtmltopdf が fontconfig や画像の読み込みで数秒以上止まることがあるため、通常は1秒未満で終わる
+レンダリングが直近のレンダリング時間の p95 を超えても終わらない場合に、同じレンダリングをもう1つ起動し、
+先に終わった方の結果を使って残りを終了させる（PDF_HEDGE_RENDERS 有効時のみ）。
+
+- 対象は generate_minutes_pdf / generate_minutes_pdf_file の単発の wkhtmltopdf レンダリングのみ（分割レンダリングは
+  既に並行実行しており、reportlab はプロセス内で動くため終了させられない）
+- ファイル版（hedged_render_to_file）は各レンダリングを出力先と同じディレクトリの別の一時ファイルに書き出させ、
+  先に成功した方を os.replace で出力先に置き、負けた方のファイルは削除する
+- 各レンダリングは専用の取り消しトークンで実行し、負けた方は render_cancel の仕組みでプロセスグループごと
+  （常駐ワーカーの場合はワーカーを）終了させる。リクエスト自体の取り消し・期限は両方に伝える
+- 実行中のヘッジの数は、レンダリングの同時実行数の上限 × PDF_HEDGE_MAX_PERCENT% 以下に抑える
+  （0 件になる場合はヘッジしない）。ヘッジは実行器の枠を使わないため、これが追加負荷の上限になる
+- p95 は直近 WINDOW 件の最初のレンダリングの所要時間から求める（MIN_SAMPLES 件に満たない間はヘッジしない）。
+  負けて終了させたレンダリングはそれまでの経過時間を所要時間として記録する
+- 起動・勝敗・予算不足による見送りはメトリクス（pdf_hedge.*）で参照できる
+"""
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from contextlib import nullcontext
+from typing import Any, Callable, Deque, List, Optional
+
+from . import pdf_metrics
+from .render_cancel import CancelToken, current_token, use_token
+
+logger = logging.getLogger(__name__)
+
+# 負けたレンダリングを終了させる際の取り消し理由
+REASON_HEDGE_LOST = 'hedge_lost'
+
+WINDOW = 200
+MIN_SAMPLES = 20
+
+
+def _start(func: Callable[[], Any], token: CancelToken) -> Future:
+    """func を token を有効にした別スレッドで実行する"""
+    future: Future = Future()
+
+    def run():
+        token.started = True
+        with use_token(token):
+            try:
+                token.check()
+                future.set_result(func())
+            except BaseException as e:
+                future.set_exception(e)
+
+    threading.Thread(target=run, name='pdf-hedge', daemon=True).start()
+    return future
+
+
+class Hedger:
+    """遅いレンダリングを複製し、先に終わった方の結果を使う"""
+
+    def __init__(self, max_percent: float, capacity: Callable[[], int], window: int = WINDOW,
+                 min_samples: int = MIN_SAMPLES):
+        self.max_percent = max_percent
+        self._capacity = capacity
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.launched = 0
+        self.won = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """ヘッジを起動するまでの待ち時間（直近の p95、サンプル不足の場合は None）"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def max_in_flight(self) -> int:
+        return int(self._capacity() * self.max_percent / 100)
+
+    def _acquire(self) -> bool:
+        limit = self.max_in_flight()
+        with self._lock:
+            if self.in_flight >= limit:
+                return False
+            self.in_flight += 1
+            self.launched += 1
+        return True
+
+    def _release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def _record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """func(*args, **kwargs) を実行し、p95 を超えたら複製を起動して先に終わった方の結果を返す
+
+        両方とも失敗した場合は最初のレンダリングの例外を送出する。
+        """
+        call = lambda: func(*args, **kwargs)  # noqa: E731
+        delay = self.hedge_delay()
+        parent = current_token()
+        deadline = parent.deadline if parent is not None else None
+        tokens: List[CancelToken] = [CancelToken(deadline)]
+
+        def cancel_all():
+            for token in tokens:
+                token.cancel(parent.reason)
+
+        # リクエストの取り消し（切断・期限切れ）は全レンダリングに伝える
+        with parent.on_cancel(cancel_all) if parent is not None else nullcontext():
+            started = time.monotonic()
+            primary = _start(call, tokens[0])
+            hedged = False
+            if delay is not None and not wait([primary], timeout=delay).done:
+                if self._acquire():
+                    hedged = True
+                    pdf_metrics.increment('pdf_hedge.launched')
+                    logger.info(f"PDF render exceeded p95 ({delay:.2f}s), launching hedge")
+                    tokens.append(CancelToken(deadline))
+                else:
+                    pdf_metrics.increment('pdf_hedge.skipped_budget')
+            futures = [primary] + ([_start(call, tokens[1])] if hedged else [])
+            try:
+                winner = self._first_success(futures)
+                # 最初のレンダリングの所要時間（負けた場合は終了させるまでの経過時間）
+                self._record(time.monotonic() - started)
+            finally:
+                # 終わっていない方（負けた方）を終了させる
+                for token, future in zip(tokens, futures):
+                    if not future.done():
+                        token.cancel(REASON_HEDGE_LOST)
+                if hedged:
+                    self._release()
+
+        if hedged:
+            if winner is not primary:
+                with self._lock:
+                    self.won += 1
+            pdf_metrics.increment('pdf_hedge.won' if winner is not primary else 'pdf_hedge.lost')
+        return winner.result()
+
+    def run_to_file(self, func: Callable[..., Any], output_path: str, *args, **kwargs) -> None:
+        """func(*args, output_path=出力先, **kwargs) を run と同様にヘッジして実行する
+
+        先に成功した方の出力を output_path に置く。各レンダリングは output_path と同じディレクトリの一時ファイルに書き出す（os.replace で置き換えるため）。
+        """
+        directory, name = os.path.split(os.path.abspath(output_path))
+        lock = threading.Lock()
+        paths: List[str] = []
+        decided = False
+
+        def attempt() -> str:
+            fd, path = tempfile.mkstemp(prefix=f'.{name}.', suffix='.hedge', dir=directory)
+            os.close(fd)
+            with lock:
+                paths.append(path)
+            try:
+                func(*args, output_path=path, **kwargs)
+            except BaseException:
+                _unlink(path)
+                raise
+            with lock:
+                # 勝敗が決まった後に終わった負けた方は自分で削除する
+                if decided:
+                    _unlink(path)
+            return path
+
+        winner = None
+        try:
+            winner = self.run(attempt)
+            os.replace(winner, output_path)
+        finally:
+            with lock:
+                decided = True
+                losers = [path for path in paths if path != winner]
+            for path in losers:
+                _unlink(path)
+
+    @staticmethod
+    def _first_success(futures: List[Future]) -> Future:
+        """最初に成功した Future を返す（全て失敗した場合は最初の Future の例外を送出する）"""
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in futures:
+                if future in done and future.exception() is None:
+                    return future
+        raise futures[0].exception()
+
+    def stats(self) -> dict:
+        delay = self.hedge_delay()
+        with self._lock:
+            return {
+                'p95_seconds': round(delay, 4) if delay is not None else None,
+                'samples': len(self._samples),
+                'in_flight': self.in_flight,
+                'max_in_flight': self.max_in_flight(),
+                'launched': self.launched,
+                'won': self.won,
+            }
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+_hedger: Optional[Hedger] = None
+_hedger_lock = threading.Lock()
+
+
+def get_render_hedger() -> Optional[Hedger]:
+    """プロセス共通のヘッジ実行器（PDF_HEDGE_RENDERS 無効時は None）"""
+    global _hedger
+    from app.config import get_settings
+    settings = get_settings()
+    if not settings.PDF_HEDGE_RENDERS:
+        return None
+    if _hedger is None:
+        with _hedger_lock:
+            if _hedger is None:
+                from .render_executor import get_render_executor
+                executor = get_render_executor()
+                _hedger = Hedger(settings.PDF_HEDGE_MAX_PERCENT, lambda: executor.concurrency_limit)
+                pdf_metrics.register_provider('pdf_hedge', _hedger.stats)
+    return _hedger
+
+
+def hedged_render(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """共通のヘッジ実行器で func を実行する（無効時はそのまま実行する）"""
+    hedger = get_render_hedger()
+    if hedger is None:
+        return func(*args, **kwargs)
+    return hedger.run(func, *args, **kwargs)
+
+
+def hedged_render_to_file(func: Callable[..., Any], output_path: str, *args, **kwargs) -> None:
+    """共通のヘッジ実行器で func(*args, output_path=output_path, **kwargs) を実行する（無効時はそのまま output_path に書き出す）"""
+    hedger = get_render_hedger()
+    if hedger is None:
+        func(*args, output_path=output_path, **kwargs)
+        return
+    hedger.run_to_file(func, output_path, *args, **kwargs)
@@ -0,0 +1,178 @@
+"""埋め込み画像の最適化
+
+責務: 議事録 HTML に data URI（base64）で埋め込まれた画像をデコードし、
+A4・設定済み余白の本文領域を印刷解像度（PDF_IMAGE_DPI）で表示するのに足りる
+画素数まで縮小・再エンコードしてからレンダリングに渡す。
+
+- 同じ画像（内容ハッシュが同じもの）は1回だけ処理する（プロセス内でも結果を再利用）
+- 再エンコードは PNG / JPEG（透過なしの場合）のうち小さい方を採用し、元より小さくならなければ元のまま
+- アニメーション GIF・デコードできない画像は変更しない
+- pdf.css の img { max-width: 100% } により、縮小後も本文幅いっぱいに表示されるため
+  レイアウトは変わらない
+
+処理はプロセスプール（cpu_pool）上で実行されることがあるため、統計は戻り値で返し、
+メトリクスへの記録（record_image_metrics）は呼び出し元プロセスで行う。
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from PIL import Image
+
+from . import pdf_metrics
+from .pdf_service import PAGE_MARGINS_MM, PAGE_SIZE_MM
+
+logger = logging.getLogger(__name__)
+
+# サニタイズ済み HTML（属性値は必ず二重引用符）の img src に含まれる data URI
+_DATA_URI_SRC = re.compile(r'src="data:(image/[A-Za-z0-9.+-]+);base64,([A-Za-z0-9+/=\s]*)"')
+_BASE64_WHITESPACE = re.compile(r'\s+')
+
+RASTER_MIME_TYPES = frozenset({'image/png', 'image/jpeg', 'image/jpg', 'image/gif', 'image/webp', 'image/bmp'})
+
+# 最適化結果のプロセス内キャッシュ（元画像の SHA-256 → (MIME タイプ, 画像データ)）
+_MEMO_MAX_ENTRIES = 64
+_memo: 'OrderedDict[tuple, Tuple[str, bytes]]' = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def max_image_size(dpi: int) -> Tuple[int, int]:
+    """本文領域（A4 - 余白）を dpi で印刷するのに必要な最大画素数 (幅, 高さ)"""
+    width_mm = PAGE_SIZE_MM[0] - PAGE_MARGINS_MM['left'] - PAGE_MARGINS_MM['right']
+    height_mm = PAGE_SIZE_MM[1] - PAGE_MARGINS_MM['top'] - PAGE_MARGINS_MM['bottom']
+    return round(width_mm / 25.4 * dpi), round(height_mm / 25.4 * dpi)
+
+
+def _has_alpha(image: Image.Image) -> bool:
+    return image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+def _encode(image: Image.Image, fmt: str, quality: int) -> bytes:
+    output = io.BytesIO()
+    if fmt == 'JPEG':
+        image.save(output, 'JPEG', quality=quality, optimize=True, progressive=True)
+    else:
+        image.save(output, 'PNG', optimize=True)
+    return output.getvalue()
+
+
+def optimize_image(data: bytes, mime: str, max_size: Tuple[int, int], quality: int) -> Tuple[str, bytes]:
+    """画像を max_size 以内に縮小し、小さい形式で再エンコードする（改善しない場合は元のまま返す）"""
+    try:
+        image = Image.open(io.BytesIO(data))
+        if getattr(image, 'n_frames', 1) > 1:
+            return mime, data
+        # JPEG はデコード時点で 1/2, 1/4, 1/8 に縮小できる（max_size 以上は保たれる）
+        image.draft('RGB', max_size)
+        image.load()
+    except Exception as e:
+        logger.warning(f"Embedded image could not be decoded, keeping original: {e}")
+        return mime, data
+
+    resized = image.width > max_size[0] or image.height > max_size[1]
+    if resized:
+        image.thumbnail(max_size, Image.LANCZOS)
+
+    if image.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+        image = image.convert('RGBA' if _has_alpha(image) else 'RGB')
+
+    candidates = [('image/png', _encode(image, 'PNG', quality))]
+    if not _has_alpha(image):
+        rgb = image if image.mode in ('RGB', 'L') else image.convert('RGB')
+        candidates.append(('image/jpeg', _encode(rgb, 'JPEG', quality)))
+    best_mime, best = min(candidates, key=lambda c: len(c[1]))
+
+    if not resized and len(best) >= len(data):
+        return mime, data
+    return best_mime, best
+
+
+def _optimize_cached(data: bytes, mime: str, max_size: Tuple[int, int], quality: int) -> Tuple[str, bytes]:
+    key = (hashlib.sha256(data).digest(), max_size, quality)
+    with _memo_lock:
+        cached = _memo.get(key)
+        if cached is not None:
+            _memo.move_to_end(key)
+            return cached
+
+    result = optimize_image(data, mime, max_size, quality)
+    with _memo_lock:
+        _memo[key] = result
+        while len(_memo) > _MEMO_MAX_ENTRIES:
+            _memo.popitem(last=False)
+    return result
+
+
+def optimize_embedded_images(html: str, dpi: Optional[int] = None, quality: Optional[int] = None) -> Tuple[str, Dict[str, int]]:
+    """HTML 中の data URI 画像を縮小・再エンコードする
+
+    Args:
+        html: サニタイズ済み HTML
+        dpi: 印刷解像度（省略時は設定値、0 以下で処理しない）
+        quality: JPEG 品質（省略時は設定値）
+
+    Returns:
+        (変換後 HTML, 統計 {'images', 'unique', 'optimized', 'bytes_before', 'bytes_after'})
+    """
+    stats = {'images': 0, 'unique': 0, 'optimized': 0, 'bytes_before': 0, 'bytes_after': 0}
+    if 'src="data:image/' not in html:
+        return html, stats
+
+    if dpi is None or quality is None:
+        from app.config import get_settings
+        settings = get_settings()
+        dpi = settings.PDF_IMAGE_DPI if dpi is None else dpi
+        quality = settings.PDF_IMAGE_JPEG_QUALITY if quality is None else quality
+    if dpi <= 0:
+        return html, stats
+
+    max_size = max_image_size(dpi)
+    replacements: Dict[str, Tuple[str, int, int]] = {}
+
+    def replace(match: 're.Match[str]') -> str:
+        mime = match.group(1).lower()
+        payload = _BASE64_WHITESPACE.sub('', match.group(2))
+        if mime not in RASTER_MIME_TYPES or not payload:
+            return match.group(0)
+
+        replaced = replacements.get(payload)
+        if replaced is None:
+            try:
+                data = base64.b64decode(payload, validate=True)
+            except (binascii.Error, ValueError):
+                return match.group(0)
+            new_mime, new_data = _optimize_cached(data, mime, max_size, quality)
+            src = f'src="data:{new_mime};base64,{base64.b64encode(new_data).decode("ascii")}"'
+            replaced = (src, len(data), len(new_data))
+            replacements[payload] = replaced
+            stats['unique'] += 1
+            if len(new_data) < len(data):
+                stats['optimized'] += 1
+
+        src, before, after = replaced
+        stats['images'] += 1
+        stats['bytes_before'] += before
+        stats['bytes_after'] += after
+        return src
+
+    return _DATA_URI_SRC.sub(replace, html), stats
+
+
+def record_image_metrics(stats: Dict[str, int]) -> None:
+    """optimize_embedded_images の統計をメトリクスに記録する"""
+    if not stats.get('images'):
+        return
+    for name in ('images', 'unique', 'optimized', 'bytes_before', 'bytes_after'):
+        pdf_metrics.increment(f'pdf_images.{name}', stats[name])
+    logger.info(
+        f"Embedded images optimized: images={stats['images']}, unique={stats['unique']}, "
+        f"bytes {stats['bytes_before']} -> {stats['bytes_after']}"
+    )
@@ -0,0 +1,210 @@
+"""PDF生成ジョブ管理
+
+責務: PDF 生成を非同期ジョブとして受け付け、ジョブ ID で状態・結果を参照できるようにする。
+クライアントは POST /api/pdf/jobs で ID を受け取り、完了までポーリングしてから結果を取得するため、
+レンダリング中に HTTP 接続（IIS のプロキシ接続）を保持し続けずに済む。
+
+- 実際のレンダリングはレンダリング実行器（render_executor）で行う
+- 同時に実行器へ投入するジョブ数は実行器の同時実行数までとし、残りはここで待機させる
+  （実行器の待ち行列を溢れさせて対話的なリクエストを 429 にしないため）
+- 未完了ジョブ数が上限に達している場合は受け付けない（RenderSaturatedError 429）
+- 完了したジョブは結果ごと TTL 経過後に破棄する
+- 保持する結果（PDF）の合計バイト数には上限があり、超える場合は完了が古いジョブから破棄する
+  （上限を単独で超える結果のジョブは失敗とする）
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+from . import pdf_metrics
+from .render_executor import RenderSaturatedError, run_render_retrying
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+
+
+class PdfJob:
+    """PDF生成ジョブ"""
+
+    def __init__(self, filename: str):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.status = JOB_QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.result: Optional[bytes] = None
+        self.etag: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in (JOB_SUCCEEDED, JOB_FAILED)
+
+    def to_dict(self, ttl_seconds: float) -> dict:
+        """状態参照 API 用の表現"""
+        return {
+            'jobId': self.id,
+            'status': self.status,
+            'filename': self.filename,
+            'createdAt': self.created_at,
+            'startedAt': self.started_at,
+            'finishedAt': self.finished_at,
+            'expiresAt': self.finished_at + ttl_seconds if self.finished_at else None,
+            'size': len(self.result) if self.result is not None else None,
+            'error': self.error,
+        }
+
+
+class PdfJobStore:
+    """ジョブの登録・実行・期限切れ破棄を行うインメモリストア"""
+
+    def __init__(self, ttl_seconds: float, max_pending: int, max_running: int, max_result_bytes: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_pending = max(1, max_pending)
+        self.max_result_bytes = max_result_bytes
+        self._jobs: Dict[str, PdfJob] = {}
+        self._lock = threading.Lock()
+        self._dispatch = asyncio.Semaphore(max(1, max_running))
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = {JOB_QUEUED: 0, JOB_RUNNING: 0, JOB_SUCCEEDED: 0, JOB_FAILED: 0}
+            result_bytes = 0
+            for job in self._jobs.values():
+                counts[job.status] += 1
+                result_bytes += len(job.result or b'')
+        return {**counts, 'result_bytes': result_bytes, 'max_result_bytes': self.max_result_bytes,
+                'ttl_seconds': self.ttl_seconds}
+
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        """TTL を過ぎた完了済みジョブを破棄し、破棄した件数を返す"""
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and now - job.finished_at >= self.ttl_seconds]
+            for job_id in expired:
+                del self._jobs[job_id]
+        if expired:
+            pdf_metrics.increment('pdf_jobs.expired', len(expired))
+        return len(expired)
+
+    def _store_result(self, job: PdfJob, result: bytes) -> None:
+        """結果を保持する（合計が上限を超える場合は完了が古いジョブから破棄する）"""
+        size = len(result)
+        if size > self.max_result_bytes:
+            pdf_metrics.increment('pdf_jobs.result_too_large')
+            raise RuntimeError(f'生成した PDF（{size} バイト）がジョブ結果の保持上限を超えています')
+        with self._lock:
+            held = sorted((j for j in self._jobs.values() if j.result is not None), key=lambda j: j.finished_at)
+            total = sum(len(j.result) for j in held)
+            evicted = 0
+            for old in held:
+                if total + size <= self.max_result_bytes:
+                    break
+                del self._jobs[old.id]
+                total -= len(old.result)
+                evicted += 1
+            job.result = result
+        if evicted:
+            logger.info(f"PDF job results evicted to stay within {self.max_result_bytes} bytes: {evicted}")
+            pdf_metrics.increment('pdf_jobs.evicted', evicted)
+
+    def get(self, job_id: str) -> Optional[PdfJob]:
+        """ジョブを取得（存在しない・期限切れの場合は None）"""
+        self.purge_expired()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def submit(self, func: Callable[..., bytes], *args: Any, filename: str, priority: str, **kwargs: Any) -> PdfJob:
+        """ジョブを登録し、バックグラウンドで実行を開始する（イベントループ上から呼ぶ）
+
+        priority はレンダリング実行器の優先度クラス（render_executor.PRIORITIES）。
+
+        Raises:
+            RenderSaturatedError: 未完了ジョブ数が上限に達している場合
+        """
+        self.purge_expired()
+        job = PdfJob(filename)
+        with self._lock:
+            pending = sum(1 for j in self._jobs.values() if not j.done)
+            if pending >= self.max_pending:
+                pdf_metrics.increment('pdf_jobs.rejected')
+                raise RenderSaturatedError('PDF生成ジョブが混雑しています。しばらくしてから再試行してください', 429, 10)
+            self._jobs[job.id] = job
+        pdf_metrics.increment('pdf_jobs.submitted')
+        job.task = asyncio.get_running_loop().create_task(self._run(job, func, args, kwargs, priority))
+        return job
+
+    async def _run(self, job: PdfJob, func: Callable[..., bytes], args: tuple, kwargs: dict, priority: str) -> None:
+        try:
+            async with self._dispatch:
+                job.status = JOB_RUNNING
+                job.started_at = time.time()
+                # 対話的なリクエストで実行器が混雑している間は待って再試行する
+                result = await run_render_retrying(func, *args, priority=priority, **kwargs)
+            self._store_result(job, result)
+            job.etag = hashlib.sha256(job.result).hexdigest()[:32]
+            job.status = JOB_SUCCEEDED
+            pdf_metrics.increment('pdf_jobs.succeeded')
+        except asyncio.CancelledError:
+            job.status = JOB_FAILED
+            job.error = 'cancelled'
+            raise
+        except Exception as e:
+            logger.error(f"PDF job {job.id} failed: {e}")
+            job.status = JOB_FAILED
+            job.error = str(e)
+            pdf_metrics.increment('pdf_jobs.failed')
+        finally:
+            job.finished_at = time.time()
+            job.task = None
+
+    def cancel_all(self) -> None:
+        with self._lock:
+            jobs = list(self._jobs.values())
+            self._jobs.clear()
+        for job in jobs:
+            if job.task is not None:
+                job.task.cancel()
+
+
+_store: Optional[PdfJobStore] = None
+_store_lock = threading.Lock()
+
+
+def get_job_store() -> PdfJobStore:
+    """プロセス共通のジョブストアを取得"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                from app.config import get_settings
+                settings = get_settings()
+                _store = PdfJobStore(
+                    settings.PDF_JOB_TTL_SECONDS,
+                    settings.PDF_JOB_MAX_PENDING,
+                    settings.PDF_RENDER_MAX_CONCURRENCY,
+                    settings.PDF_JOB_MAX_RESULT_BYTES,
+                )
+                pdf_metrics.register_provider('pdf_jobs', _store.stats)
+    return _store
+
+
+def shutdown_job_store() -> None:
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.cancel_all()
+            _store = None
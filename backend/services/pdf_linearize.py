@@ -0,0 +1,64 @@
+"""PDFの線形化（Fast Web View）
+
+責務: スタンプ済みの PDF を線形化し、ブラウザの PDF ビューアが Range リクエストで
+先頭ページに必要な部分だけを取得して表示を始められるようにする。
+
+線形化は qpdf（pikepdf 経由）で行う。pikepdf がインストールされていない場合や
+線形化に失敗した場合は、元の PDF をそのまま返す（PDF としての内容は変わらないため）。
+線形化は構造を作り直すので、スタンプなどの後処理をすべて終えてから最後に行うこと。
+"""
+from __future__ import annotations
+
+import io
+import logging
+import os
+
+from . import pdf_metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _pikepdf():
+    try:
+        import pikepdf
+    except ImportError:
+        logger.warning("pikepdf is not installed; PDF linearization is skipped")
+        pdf_metrics.increment('pdf_linearize.unavailable')
+        return None
+    return pikepdf
+
+
+def linearize_pdf(pdf_bytes: bytes) -> bytes:
+    """線形化した PDF を返す（できない場合は入力をそのまま返す）"""
+    pikepdf = _pikepdf()
+    if pikepdf is None:
+        return pdf_bytes
+    try:
+        with pikepdf.open(io.BytesIO(pdf_bytes)) as pdf:
+            output = io.BytesIO()
+            pdf.save(output, linearize=True)
+    except Exception as e:
+        logger.error(f"PDF linearization failed, returning the original PDF: {e}")
+        pdf_metrics.increment('pdf_linearize.failed')
+        return pdf_bytes
+    pdf_metrics.increment('pdf_linearize.documents')
+    return output.getvalue()
+
+
+def linearize_pdf_file(path: str) -> None:
+    """ファイル上の PDF を線形化して置き換える（qpdf がファイル間で処理するため PDF 全体をメモリに読み込まない）"""
+    pikepdf = _pikepdf()
+    if pikepdf is None:
+        return
+    linearized_path = f"{path}.linearized"
+    try:
+        with pikepdf.open(path) as pdf:
+            pdf.save(linearized_path, linearize=True)
+        os.replace(linearized_path, path)
+    except Exception as e:
+        logger.error(f"PDF linearization failed, keeping the original PDF: {e}")
+        pdf_metrics.increment('pdf_linearize.failed')
+        if os.path.exists(linearized_path):
+            os.remove(linearized_path)
+        return
+    pdf_metrics.increment('pdf_linearize.documents')
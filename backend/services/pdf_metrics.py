@@ -0,0 +1,50 @@
+"""PDF生成メトリクス
+
+責務: PDF生成パイプライン各段のカウンタ・ゲージをプロセス内で集計し、
+/api/pdf/metrics から参照できるようにする。
+"""
+from __future__ import annotations
+
+import threading
+from typing import Callable, Dict, Union
+
+Number = Union[int, float]
+
+_lock = threading.Lock()
+_counters: Dict[str, Number] = {}
+_gauges: Dict[str, Number] = {}
+_providers: Dict[str, Callable[[], dict]] = {}
+
+
+def increment(name: str, value: Number = 1) -> None:
+    """カウンタを加算する"""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def set_gauge(name: str, value: Number) -> None:
+    """ゲージ（現在値）を設定する"""
+    with _lock:
+        _gauges[name] = value
+
+
+def register_provider(name: str, provider: Callable[[], dict]) -> None:
+    """スナップショット取得時に呼び出される統計提供関数を登録する"""
+    with _lock:
+        _providers[name] = provider
+
+
+def snapshot() -> dict:
+    """現在のメトリクスを辞書で返す"""
+    with _lock:
+        result = {
+            'counters': dict(_counters),
+            'gauges': dict(_gauges),
+        }
+        providers = dict(_providers)
+    for name, provider in providers.items():
+        try:
+            result[name] = provider()
+        except Exception as e:
+            result[name] = {'error': str(e)}
+    return result
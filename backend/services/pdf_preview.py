@@ -0,0 +1,167 @@
+"""議事録PDFの先頭ページプレビュー
+
+責務: メール送信前のレイアウト確認用に、議事録PDFの先頭 N ページを低解像度の PNG 画像にする。
+
+- /api/pdf/export と同じ前処理（_prepare_minutes_render）とテンプレート（render_minutes_html）を使う
+- 本文は先頭 N ページ分を十分に超える分量（最上位の要素単位）だけを残して wkhtmltopdf に渡すため、
+  長い議事録でも全体をレンダリングするより速い（切り詰めた場合は参加者以降のページも出力しない）
+- 機密レベルのスタンプを付けたうえで PyMuPDF でラスタライズする
+- 結果は入力内容のハッシュをキーにキャッシュし、編集中の同じ内容の再プレビューは前処理から省略する
+"""
+from __future__ import annotations
+
+import datetime
+import io
+import logging
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import pdf_metrics
+from .html_sanitizer import VOID_TAGS
+from .pdf_cache import PdfResultCache, build_cache_key
+from .pdf_engine import ENGINE_REPORTLAB
+from .pdf_service import generate_pdf_from_html
+from .pdf_stamp import stamp_confidentiality
+from .template_registry import asset_version
+
+logger = logging.getLogger(__name__)
+
+# サニタイズ済み HTML のタグ（タグ名は小文字、属性値中の '>' はエスケープ済み）
+_TAG = re.compile(r'<(/?)([a-z][a-z0-9]*)[^>]*>')
+# 1ページ分とみなす本文の文字数（A4・本文 10.5pt で 1ページに収まる文字数より多めに見積もる）
+CHARS_PER_PAGE = 2000
+# 画像1枚を本文の何文字分とみなすか
+IMAGE_WEIGHT = 1000
+# 複数ページを縦に並べる際のページ間の余白（ピクセル）と背景色
+PAGE_GAP = 8
+BACKGROUND = (128, 128, 128)
+
+
+class PreviewUnavailableError(RuntimeError):
+    """プレビュー画像を生成できない（PyMuPDF が未インストール）"""
+
+
+def leading_html(html: str, budget: int) -> Tuple[str, bool]:
+    """サニタイズ済み HTML の先頭から、本文の文字数（画像は IMAGE_WEIGHT）が budget に達するまでの
+    最上位の要素を返す
+
+    Returns:
+        (先頭部分のHTML, 切り詰めたか)
+    """
+    depth = 0
+    weight = 0
+    position = 0
+    for match in _TAG.finditer(html):
+        if depth == 0 and weight >= budget:
+            return html[:position], True
+        weight += len(html[position:match.start()].strip())
+        closing, name = match.group(1), match.group(2)
+        if closing:
+            depth = max(0, depth - 1)
+        else:
+            if name == 'img':
+                weight += IMAGE_WEIGHT
+            if name not in VOID_TAGS:
+                depth += 1
+        position = match.end()
+    if depth == 0 and weight >= budget and html[position:].strip():
+        return html[:position], True
+    return html, False
+
+
+def _pymupdf():
+    try:
+        import pymupdf
+    except ImportError:
+        pdf_metrics.increment('pdf_preview.unavailable')
+        raise PreviewUnavailableError('プレビュー画像の生成には PyMuPDF (pymupdf) が必要です')
+    return pymupdf
+
+
+def rasterize_pages(pdf_bytes: bytes, pages: int, dpi: int) -> bytes:
+    """PDF の先頭 pages ページを縦に並べた PNG を返す"""
+    pymupdf = _pymupdf()
+    from PIL import Image
+
+    images: List[Image.Image] = []
+    with pymupdf.open(stream=pdf_bytes, filetype='pdf') as document:
+        for index in range(min(pages, document.page_count)):
+            pixmap = document[index].get_pixmap(dpi=dpi, alpha=False)
+            images.append(Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples))
+    if not images:
+        raise ValueError('PDF にページがありません')
+
+    if len(images) == 1:
+        sheet = images[0]
+    else:
+        width = max(image.width for image in images)
+        height = sum(image.height for image in images) + PAGE_GAP * (len(images) - 1)
+        sheet = Image.new('RGB', (width, height), BACKGROUND)
+        top = 0
+        for image in images:
+            sheet.paste(image, ((width - image.width) // 2, top))
+            top += image.height + PAGE_GAP
+
+    output = io.BytesIO()
+    sheet.save(output, format='PNG', optimize=True)
+    return output.getvalue()
+
+
+def preview_cache_key(meeting_info: Dict[str, Any] | None, minutes_html_raw: str, pages: int, dpi: int) -> str:
+    """入力（前処理前）の内容・テンプレート版・作成日・ページ数・解像度から求めるキャッシュキー"""
+    return build_cache_key(
+        'preview', meeting_info or {}, minutes_html_raw or '', asset_version(),
+        datetime.date.today().isoformat(), pages, dpi,
+    )
+
+
+def cached_minutes_preview(meeting_info: Dict[str, Any] | None, minutes_html_raw: str, pages: int,
+                           dpi: int) -> Optional[bytes]:
+    """キャッシュ済みのプレビュー画像を返す（なければ None）"""
+    return get_preview_cache().get(preview_cache_key(meeting_info, minutes_html_raw, pages, dpi))
+
+
+def render_minutes_preview(meeting_info: Dict[str, Any] | None, minutes_html_raw: str, pages: int,
+                           dpi: int) -> bytes:
+    """議事録PDFの先頭 pages ページの PNG 画像を生成し、キャッシュに登録する
+
+    キャッシュの参照は呼び出し元が cached_minutes_preview で先に行う（ヒット時はレンダリング待ち行列に入れない）。
+    """
+    from .minutes_pdf_service import _prepare_minutes_render, render_minutes_html, render_minutes_with_reportlab
+
+    confidential_level, base_meeting, render_date, safe_minutes_html, _, _, engine = \
+        _prepare_minutes_render(meeting_info, minutes_html_raw)
+    # reportlab で生成される議事録は同じエンジンでプレビューする（子プロセスを使わないため全体を生成しても速い）
+    pdf = render_minutes_with_reportlab(base_meeting, safe_minutes_html, render_date) \
+        if engine == ENGINE_REPORTLAB else None
+    body, truncated = safe_minutes_html, False
+    if pdf is None:
+        body, truncated = leading_html(safe_minutes_html, CHARS_PER_PAGE * pages)
+        html = render_minutes_html(base_meeting, body, now=render_date.isoformat(), include_back=not truncated)
+        pdf = generate_pdf_from_html(html, use_header=False, meeting_info=base_meeting, creation_date=render_date)
+    image = rasterize_pages(stamp_confidentiality(pdf, confidential_level), pages, dpi)
+
+    get_preview_cache().put(preview_cache_key(meeting_info, minutes_html_raw, pages, dpi), image)
+    pdf_metrics.increment('pdf_preview.rendered')
+    if truncated:
+        pdf_metrics.increment('pdf_preview.truncated')
+    logger.info(f"Minutes preview rendered: pages={pages}, dpi={dpi}, body={len(body)}/{len(safe_minutes_html)} chars, "
+                f"png={len(image)} bytes")
+    return image
+
+
+_cache: Optional[PdfResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_preview_cache() -> PdfResultCache:
+    """プロセス共通のプレビュー画像キャッシュを取得"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                from app.config import get_settings
+                _cache = PdfResultCache(get_settings().PDF_PREVIEW_CACHE_MAX_BYTES, metric_prefix='pdf_preview_cache')
+                pdf_metrics.register_provider('pdf_preview_cache', _cache.stats)
+    return _cache
@@ -1,24 +1,99 @@
 import subprocess
 import tempfile
 import os
-from pathlib import Path
+import re
+import time
+from contextlib import contextmanager
+from datetime import date
 from typing import Optional
 
-WKHTMLTOPDF_PATH = os.getenv('WKHTMLTOPDF_PATH', str(Path(__file__).resolve().parents[2] / 'wkhtmltopdf.exe'))
+from . import pdf_metrics
+from .pdf_fonts import apply_font_css, renderer_env
+from .pdf_linearize import linearize_pdf, linearize_pdf_file
+from .pdf_stamp import stamp_confidentiality, stamp_confidentiality_file
+from .render_cancel import cap_timeout, check_cancelled, run_process
+from .render_limiter import track_render
+from .renderer_discovery import wkhtmltopdf_path
+from .renderer_pool import RendererTimeoutError, RendererWorkerError, get_renderer_pool
 
+# レンダリングプロファイル
+# - fast: スクリプトを含まない HTML 用。JavaScript を無効化し javascript-delay を省く
+# - scripted: スクリプトを含む HTML 用（従来どおり JavaScript 有効 + 200ms 待機）
+RENDER_PROFILE_FAST = 'fast'
+RENDER_PROFILE_SCRIPTED = 'scripted'
 
-def generate_pdf_from_html(html: str, timeout: int = 30, use_header: bool = True, confidential_level: str = '社外秘', meeting_info: Optional[dict] = None) -> bytes:
+# 用紙と余白（mm）。埋め込み画像の縮小サイズ（pdf_images）もこの本文領域から求める
+PAGE_SIZE_MM = (210, 297)  # A4
+PAGE_MARGINS_MM = {'top': 25, 'bottom': 15, 'left': 15, 'right': 15}
+
+_SCRIPT_PATTERN = re.compile(r'<script\b|\son[a-z]+\s*=|javascript:', re.IGNORECASE)
+
+
+def select_render_profile(html: str) -> str:
+    """HTML にスクリプト（script タグ・イベント属性・javascript: URL）が含まれるかでプロファイルを選ぶ"""
+    return RENDER_PROFILE_SCRIPTED if _SCRIPT_PATTERN.search(html) else RENDER_PROFILE_FAST
+
+
+def generate_pdf_from_html(html: str, timeout: int = 30, use_header: bool = True, confidential_level: str = '社外秘', meeting_info: Optional[dict] = None, creation_date: Optional[date] = None, render_profile: Optional[str] = None, linearize: bool = False) -> bytes:
     """Generate PDF bytes from HTML using wkhtmltopdf.
 
+    creation_date pins the 作成 date on the first page (defaults to today).
+    use_header stamps the confidential_level badge onto every page after rendering.
+    render_profile is detected from the HTML when omitted (see select_render_profile).
+    linearize rewrites the finished PDF for fast web view (see pdf_linearize).
+
+    Raises RuntimeError on failure.
+    """
+    cmd, html_bytes, profile = _prepare_render(html, confidential_level, meeting_info, creation_date, render_profile)
+
+    # 実行時間は同時実行数の自動調整（PDF_ADAPTIVE_CONCURRENCY）にも使う
+    with track_render(), _timed_render(profile):
+        data = _run_wkhtmltopdf(cmd, html_bytes, timeout)
+
+    if not data:
+        raise RuntimeError('Generated PDF is empty')
+
+    if use_header:
+        data = stamp_confidentiality(data, confidential_level)
+
+    if linearize:
+        data = linearize_pdf(data)
+
+    return data
+
+
+def generate_pdf_file(html: str, output_path: str, timeout: int = 30, use_header: bool = True, confidential_level: str = '社外秘', meeting_info: Optional[dict] = None, creation_date: Optional[date] = None, render_profile: Optional[str] = None, linearize: bool = False) -> None:
+    """Render HTML straight into output_path (same options as generate_pdf_from_html).
+
+    wkhtmltopdf writes the file itself and the confidentiality stamp is appended as an
+    incremental update, so the document is never read into Python memory.
+
     Raises RuntimeError on failure.
     """
+    cmd, html_bytes, profile = _prepare_render(html, confidential_level, meeting_info, creation_date, render_profile)
+
+    with track_render(), _timed_render(profile):
+        _run_wkhtmltopdf_to_file(cmd, html_bytes, output_path, timeout)
+
+    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        raise RuntimeError('Generated PDF is empty')
+
+    if use_header:
+        stamp_confidentiality_file(output_path, confidential_level)
+
+    if linearize:
+        linearize_pdf_file(output_path)
+
+
+def _prepare_render(html: str, confidential_level: str, meeting_info: Optional[dict], creation_date: Optional[date], render_profile: Optional[str]):
+    """1ページ目情報の挿入とプロファイル選択を行い、(wkhtmltopdf コマンド, HTML バイト列, プロファイル) を返す"""
     import logging
     logger = logging.getLogger(__name__)
     logger.info(f"PDF generation - confidential_level: {confidential_level}")
     
     # 1ページ目に表示する情報をHTMLに埋め込む
     if meeting_info:
-        first_page_info = create_first_page_info_html(meeting_info)
+        first_page_info = create_first_page_info_html(meeting_info, creation_date)
         # HTMLコンテンツの最初に1ページ目情報を挿入
         if '<body' in html:
             html = html.replace('<body', f'{first_page_info}<body', 1)
@@ -27,86 +102,150 @@ def generate_pdf_from_html(html: str, timeout: int = 30, use_header: bool = True
         else:
             html = first_page_info + html
     
-    # write html to a temporary file
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as h:
-        h.write(html)
-        html_path = h.name
+    profile = render_profile or select_render_profile(html)
+    logger.info(f"PDF generation - render profile: {profile}")
 
-    pdf_fd, pdf_path = tempfile.mkstemp(suffix='.pdf')
-    os.close(pdf_fd)
+    cmd = [wkhtmltopdf_path()]
+    if profile == RENDER_PROFILE_FAST:
+        cmd.append('--disable-javascript')
+    else:
+        cmd.extend(['--enable-javascript', '--javascript-delay', '200'])
+    cmd.extend([
+        '--enable-local-file-access',
+        '--load-error-handling', 'ignore',
+        '--load-media-error-handling', 'ignore',
+        '--margin-top', f"{PAGE_MARGINS_MM['top']}mm",
+        '--margin-bottom', f"{PAGE_MARGINS_MM['bottom']}mm",
+        '--margin-left', f"{PAGE_MARGINS_MM['left']}mm",
+        '--margin-right', f"{PAGE_MARGINS_MM['right']}mm",
+        # 機密レベルはヘッダー HTML ではなく後処理のスタンプで付与する
+        '--print-media-type',
+    ])
+    # 'Hiragino Sans' などの指定を同梱フォントに割り当てる（PDF_FONT_DIR 設定時のみ）
+    html = apply_font_css(html)
+    return cmd, html.encode('utf-8'), profile
 
-    # Header template path
-    header_path = None
-    if use_header:
-        backend_dir = Path(__file__).resolve().parents[1]  # backend/
-        header_template_path = backend_dir / 'templates' / 'header.html'
-        if header_template_path.exists():
-            # 機密レベルのみのシンプルなヘッダーを作成
-            header_path = create_simple_header(confidential_level)
-            logger.info(f"PDF generation - created simple header: {header_path}")
 
-    try:
-        cmd = [
-            WKHTMLTOPDF_PATH,
-            '--enable-javascript',
-            '--javascript-delay', '200',
-            '--enable-local-file-access',
-            '--load-error-handling', 'ignore',
-            '--load-media-error-handling', 'ignore',
-            '--margin-top', '25mm',
-            '--margin-bottom', '15mm',
-            '--margin-left', '15mm',
-            '--margin-right', '15mm'
-        ]
-        
-        # Add header if available
-        if header_path:
-            cmd.extend(['--header-html', header_path])
-            cmd.extend(['--header-spacing', '5'])
-            cmd.extend(['--print-media-type'])
-        
-        cmd.extend([html_path, pdf_path])
-        
-        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
-        if proc.returncode != 0:
-            raise RuntimeError(f"wkhtmltopdf failed: {proc.stderr.decode(errors='ignore')}")
+@contextmanager
+def _timed_render(profile: str):
+    """wkhtmltopdf の所要時間をプロファイル別に記録する"""
+    import logging
+    logger = logging.getLogger(__name__)
+
+    started = time.monotonic()
+    yield
+    elapsed = time.monotonic() - started
+    pdf_metrics.increment(f'pdf_render.profile.{profile}')
+    pdf_metrics.increment(f'pdf_render.seconds.{profile}', elapsed)
+    logger.info(f"PDF generation - wkhtmltopdf finished in {elapsed:.3f}s (profile: {profile})")
+
 
-        with open(pdf_path, 'rb') as f:
-            data = f.read()
+def scratch_dir() -> Optional[str]:
+    """作業ファイル用ディレクトリ（設定値 > /dev/shm > OS 既定の一時ディレクトリ）"""
+    from app.config import get_settings
+    configured = get_settings().PDF_SCRATCH_DIR
+    if configured:
+        return configured
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return None
 
-        if not data:
-            raise RuntimeError('Generated PDF is empty')
 
-        return data
-    finally:
+def _run_wkhtmltopdf(cmd: list, html_bytes: bytes, timeout: int) -> bytes:
+    """wkhtmltopdf を実行し PDF バイトを返す
+
+    常駐プールが使える場合はプールのワーカーへ渡す（ワーカーの標準入力は引数の受け渡しに
+    使うため、入出力はメモリ上のスクラッチディレクトリのファイルを介する）。
+    プールが使えない場合は単発プロセスで HTML を標準入力、PDF を標準出力でやり取りし、
+    一時ファイルを作らない。いずれもリクエストの取り消し（render_cancel）で直ちに終了する。
+    ワーカーが混雑・異常終了した場合は単発プロセスで再試行するが、タイムアウトした場合は再試行しない。
+    """
+    pool = get_renderer_pool(cmd[0])
+    if pool is not None:
+        started = time.monotonic()
         try:
-            os.unlink(html_path)
-        except Exception:
-            pass
+            return _render_with_pool(pool, cmd, html_bytes, timeout)
+        except RendererWorkerError as e:
+            timeout = _fallback_timeout(cmd, timeout, started, e)
+
+    proc = run_process(cmd + ['-', '-'], html_bytes, subprocess.PIPE, timeout, env=renderer_env())
+    if proc.returncode != 0:
+        raise RuntimeError(f"wkhtmltopdf failed: {proc.stderr.decode(errors='ignore')}")
+    return proc.stdout
+
+
+def _run_wkhtmltopdf_to_file(cmd: list, html_bytes: bytes, output_path: str, timeout: int) -> None:
+    """wkhtmltopdf に output_path へ直接 PDF を書き出させる（_run_wkhtmltopdf のファイル版）"""
+    pool = get_renderer_pool(cmd[0])
+    if pool is not None:
+        started = time.monotonic()
         try:
-            os.unlink(pdf_path)
-        except Exception:
-            pass
-        # 動的ヘッダーファイルも削除
-        if header_path:
-            try:
-                os.unlink(header_path)
-            except Exception:
-                pass
-
-
-def create_first_page_info_html(meeting_info: dict) -> str:
-    """1ページ目に表示する議事録No.と作成情報のHTMLを生成"""
+            _render_with_pool(pool, cmd, html_bytes, timeout, output_path=output_path)
+            return
+        except RendererWorkerError as e:
+            timeout = _fallback_timeout(cmd, timeout, started, e)
+
+    proc = run_process(cmd + ['-', output_path], html_bytes, subprocess.DEVNULL, timeout, env=renderer_env())
+    if proc.returncode != 0:
+        raise RuntimeError(f"wkhtmltopdf failed: {proc.stderr.decode(errors='ignore')}")
+
+
+def _fallback_timeout(cmd: list, timeout: float, started: float, error: RendererWorkerError) -> float:
+    """常駐ワーカーでの失敗後に単発プロセスで再試行する場合の残り時間を返す
+
+    再試行には元の期限までの残り時間のみ与える。タイムアウトした文書は単発プロセスでも止まる可能性が
+    高いため再試行せず subprocess.TimeoutExpired を送出する。
+
+    Raises:
+        RenderCancelled: 取り消しでワーカーを終了させた場合
+        subprocess.TimeoutExpired: ワーカーがタイムアウトした、または残り時間がない場合
+    """
     import logging
     logger = logging.getLogger(__name__)
-    
+
+    # 取り消しでワーカーを終了させた場合は再試行しない
+    check_cancelled()
+    remaining = timeout - (time.monotonic() - started)
+    if isinstance(error, RendererTimeoutError) or remaining <= 0:
+        logger.warning(f"Renderer pool job timed out, not retrying: {error}")
+        raise subprocess.TimeoutExpired(cmd, timeout) from error
+    # ワーカー混雑・異常時は従来の単発プロセスで再試行し、エラー内容を取得する
+    logger.warning(f"Renderer pool job failed, retrying with a one-shot process ({remaining:.1f}s left): {error}")
+    return remaining
+
+
+def _render_with_pool(pool, cmd: list, html_bytes: bytes, timeout: int, output_path: Optional[str] = None) -> Optional[bytes]:
+    """常駐ワーカーでレンダリングする（作業ファイルはスクラッチディレクトリに置く）
+
+    output_path を指定した場合はそこへ書き出させて None を返し、省略時は PDF バイト列を返す。
+    """
+    with tempfile.TemporaryDirectory(prefix='pdf-', dir=scratch_dir()) as work_dir:
+        html_path = os.path.join(work_dir, 'input.html')
+        pdf_path = output_path or os.path.join(work_dir, 'output.pdf')
+        with open(html_path, 'wb') as f:
+            f.write(html_bytes)
+
+        pool.render(cmd[1:] + [html_path, pdf_path], timeout=cap_timeout(timeout))
+
+        if output_path is not None:
+            if not os.path.exists(output_path):
+                raise RendererWorkerError("renderer worker produced no output")
+            return None
+        try:
+            with open(pdf_path, 'rb') as f:
+                return f.read()
+        except OSError as e:
+            raise RendererWorkerError(f"renderer worker produced no output: {e}")
+
+
+def first_page_fields(meeting_info: dict, creation_date: Optional[date] = None):
+    """1ページ目の表示内容 (議事録No., 作成日, 課名, 発行者) を返す（reportlab 版の議事録と共通）"""
     # 会議情報から必要な値を取得
     minutes_no = meeting_info.get('議事録No', '')
     
-    # 作成情報の自動生成
-    from datetime import datetime
-    now = datetime.now()
-    creation_date = f"{now.year % 100}/{now.month}/{now.day}"
+    # 作成情報の自動生成（呼び出し側で日付が確定していればそれを使う）
+    created = creation_date or date.today()
+    creation_date_text = f"{created.year % 100}/{created.month}/{created.day}"
     
     # 課名の抽出
     ka_raw = meeting_info.get('課', '')
@@ -118,7 +257,15 @@ def create_first_page_info_html(meeting_info: dict) -> str:
     
     # 発行者の取得
     issuer = meeting_info.get('発行者', '')
-    
+    return minutes_no, creation_date_text, ka_name, issuer
+
+
+def create_first_page_info_html(meeting_info: dict, creation_date: Optional[date] = None) -> str:
+    """1ページ目に表示する議事録No.と作成情報のHTMLを生成"""
+    import logging
+    logger = logging.getLogger(__name__)
+
+    minutes_no, creation_date_text, ka_name, issuer = first_page_fields(meeting_info, creation_date)
     logger.info(f"Creating first page info - minutes_no: {minutes_no}, ka_name: {ka_name}, issuer: {issuer}")
     
     return f"""
@@ -157,7 +304,7 @@ def create_first_page_info_html(meeting_info: dict) -> str:
                 <th style="border: 1px solid #333; padding: 2px 4px; text-align: center; font-size: 10px; height: 16px; background-color: #f0f0f0; font-weight: bold; width: 55px;">検認</th>
             </tr>
             <tr>
-                <td style="border: 1px solid #333; border-bottom: none; padding: 2px 4px; text-align: center; font-size: 10px; height: 16px; width: 40px;">{creation_date}</td>
+                <td style="border: 1px solid #333; border-bottom: none; padding: 2px 4px; text-align: center; font-size: 10px; height: 16px; width: 40px;">{creation_date_text}</td>
                 <td rowspan="3" style="border: 1px solid #333; padding: 2px 4px; text-align: center; font-size: 10px; width: 55px;"></td>
             </tr>
             <tr>
@@ -172,66 +319,6 @@ def create_first_page_info_html(meeting_info: dict) -> str:
 """
 
 
-def create_simple_header(confidential_level: str) -> str:
-    """機密レベルのみの簡潔なヘッダーファイルを作成し、パスを返す"""
-    import logging
-    logger = logging.getLogger(__name__)
-    logger.info(f"Creating simple header with confidential_level: {confidential_level}")
-    
-    header_content = f"""<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <style>
-        body {{
-            margin: 0;
-            padding: 0;
-            font-family: 'Hiragino Sans', 'Yu Gothic', 'Meiryo', sans-serif;
-        }}
-        .header-container {{
-            width: 100%;
-            height: 40px;
-            position: relative;
-            padding: 10px 20px;
-            box-sizing: border-box;
-            display: flex;
-            justify-content: flex-end;
-            align-items: flex-start;
-        }}
-        .confidential {{
-            position: absolute;
-            right: 20px;
-            top: 10px;
-            color: red;
-            border: 2px solid red;
-            padding: 5px 10px;
-            font-weight: bold;
-            font-size: 14px;
-            background-color: white;
-        }}
-    </style>
-</head>
-<body>
-    <div class="header-container">
-        <div class="confidential">{confidential_level}</div>
-    </div>
-</body>
-</html>"""
-    
-    # 一時ファイルとして保存
-    header_fd, header_path = tempfile.mkstemp(suffix='.html')
-    try:
-        with os.fdopen(header_fd, 'w', encoding='utf-8') as f:
-            f.write(header_content)
-        logger.info(f"Simple header content written to: {header_path}")
-        logger.info(f"Header content preview: {header_content[:200]}...")
-    except Exception:
-        os.close(header_fd)
-        raise
-    
-    return header_path
-
-
 def create_dynamic_header(confidential_level: str, meeting_info: Optional[dict] = None) -> str:
     """機密レベルに応じた動的ヘッダーファイルを作成し、パスを返す"""
     import logging
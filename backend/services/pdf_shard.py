@@ -0,0 +1,167 @@
+"""議事録PDFの分割レンダリング
+
+責務: 非常に長い議事録本文を最上位の見出し（章）単位で複数のシャードに分け、
+シャードごとに wkhtmltopdf を並行実行して1つの PDF に連結する。
+1プロセスが1コアで数百ページを順にレイアウトする時間をシャード数に応じて短縮することを狙うが、
+実際の wkhtmltopdf での効果は未計測のため既定では無効（PDF_SHARD_THRESHOLD_BYTES=0）。
+有効にする前に tests/benchmarks/bench_sharded_render.py で一括レンダリングと比較すること。
+
+- 1ページ目の情報（議事録No.・作成欄）と表題・要約は先頭シャードのみ、
+  参加者（.page-break で改ページ）以降は末尾シャードのみが出力する
+- 各シャードは新しいページから始まる（章の区切りで改ページが入る点だけが一括レンダリングと異なる）
+- 機密レベルのスタンプは連結後の PDF に対して呼び出し元で付与するため、全ページに正しく入る
+  （ページ番号はレンダラー側では付けていないので、連結後の物理ページ順がそのまま通し番号になる）
+- 並行数は要求自身の実行枠 + レンダリング実行器から借りられた空き枠の数まで（render_executor.borrow_render_slots）。
+  実行器の外から呼ばれた場合は借りられないため順に実行する。同時実行数の上限を超えて wkhtmltopdf を起動しない
+- 1つのシャードが失敗した場合は、実行中のシャードを終了させ、未着手のシャードは実行しない
+"""
+from __future__ import annotations
+
+import io
+import logging
+import re
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from pypdf import PdfReader, PdfWriter
+
+from . import pdf_metrics
+from .html_sanitizer import VOID_TAGS
+from .pdf_service import generate_pdf_from_html
+from .render_cancel import CancelToken, current_token, use_token
+from .render_executor import borrow_render_slots, return_render_slots
+
+logger = logging.getLogger(__name__)
+
+# サニタイズ済み HTML のタグ（タグ名は小文字、属性値中の '>' はエスケープ済み）
+_TAG = re.compile(r'<(/?)([a-z][a-z0-9]*)[^>]*>')
+# 章の区切りとみなす見出し（上位のものから順に探す）
+SECTION_HEADINGS = ('h1', 'h2', 'h3')
+# 他のシャードの失敗で残りのシャードを終了させる際の取り消し理由
+REASON_SHARD_FAILED = 'shard_failed'
+
+
+def split_sections(html: str) -> List[str]:
+    """サニタイズ済み HTML を最上位の見出しの直前で区切って章のリストにする
+
+    最上位（入れ子になっていない位置）にある h1 → h2 → h3 のうち最初に見つかった階層で区切る。
+    区切れない場合は全体を1要素として返す。
+    """
+    boundaries: Dict[str, List[int]] = {name: [] for name in SECTION_HEADINGS}
+    depth = 0
+    for match in _TAG.finditer(html):
+        closing, name = match.group(1), match.group(2)
+        if closing:
+            depth = max(0, depth - 1)
+            continue
+        if depth == 0 and name in boundaries:
+            boundaries[name].append(match.start())
+        if name not in VOID_TAGS:
+            depth += 1
+
+    for name in SECTION_HEADINGS:
+        cuts = [pos for pos in boundaries[name] if pos > 0]
+        if cuts:
+            edges = [0] + cuts + [len(html)]
+            return [html[start:end] for start, end in zip(edges, edges[1:]) if html[start:end].strip()]
+    return [html]
+
+
+def plan_shards(sections: List[str], max_shards: int) -> List[str]:
+    """連続する章をおおよそ同じ大きさの最大 max_shards 個のシャードにまとめる"""
+    if max_shards <= 1 or len(sections) <= 1:
+        return [''.join(sections)]
+
+    shard_count = min(max_shards, len(sections))
+    target = sum(len(s) for s in sections) / shard_count
+    shards: List[str] = []
+    current: List[str] = []
+    size = 0
+    for index, section in enumerate(sections):
+        current.append(section)
+        size += len(section)
+        remaining_sections = len(sections) - index - 1
+        remaining_shards = shard_count - len(shards) - 1
+        # 目標サイズに達したら区切る（残りの章で残りのシャードを埋められる範囲で）
+        if remaining_shards > 0 and (size >= target or remaining_sections == remaining_shards):
+            shards.append(''.join(current))
+            current, size = [], 0
+    if current:
+        shards.append(''.join(current))
+    return shards
+
+
+def shards_for(html: str) -> List[str]:
+    """設定に従って本文をシャードに分ける（分割しない場合は1要素のリスト）"""
+    from app.config import get_settings
+    settings = get_settings()
+    threshold = settings.PDF_SHARD_THRESHOLD_BYTES
+    if threshold <= 0 or len(html) < threshold or settings.PDF_SHARD_MAX_SHARDS <= 1:
+        return [html]
+    return plan_shards(split_sections(html), settings.PDF_SHARD_MAX_SHARDS)
+
+
+def concatenate_pdfs(parts: List[bytes]) -> bytes:
+    """PDF を順に連結する"""
+    writer = PdfWriter()
+    for data in parts:
+        writer.append(PdfReader(io.BytesIO(data)))
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def render_sharded(meeting: Dict[str, Any], shards: List[str], now: str, creation_date: Optional[date] = None,
+                   timeout: int = 30) -> bytes:
+    """シャードごとにテンプレートをレンダリングして並行に PDF 化し、連結した PDF を返す（スタンプなし）"""
+    from .minutes_pdf_service import render_minutes_html
+
+    last = len(shards) - 1
+    # 取り消しはシャードのスレッドにも引き継ぎ、シャードの失敗時は残りのシャードだけを取り消す
+    parent = current_token()
+    token = CancelToken(parent.deadline if parent is not None else None)
+    errors: List[BaseException] = []
+
+    def render(index: int) -> bytes:
+        with use_token(token):
+            # 他のシャードが失敗済みなら着手しない
+            token.check()
+            try:
+                html = render_minutes_html(
+                    meeting, shards[index], now=now, include_front=index == 0, include_back=index == last
+                )
+                return generate_pdf_from_html(
+                    html,
+                    timeout=timeout,
+                    use_header=False,
+                    meeting_info=meeting if index == 0 else None,
+                    creation_date=creation_date,
+                )
+            except BaseException as e:
+                # 次のシャードに着手する前に、実行中の他のシャードを終了させる（最初の失敗を原因として残す）
+                errors.append(e)
+                token.cancel(REASON_SHARD_FAILED)
+                raise
+
+    borrowed = borrow_render_slots(len(shards) - 1)
+    try:
+        with parent.on_cancel(lambda: token.cancel(parent.reason)) if parent is not None else nullcontext(), \
+                ThreadPoolExecutor(max_workers=1 + borrowed, thread_name_prefix='pdf-shard') as executor:
+            futures = [executor.submit(render, index) for index in range(len(shards))]
+            done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            failed = [future.exception() for future in done if future.exception() is not None]
+            if failed:
+                # 未着手のシャードは実行しない（実行中のシャードは失敗したシャードが終了させている）
+                for future in futures:
+                    future.cancel()
+                raise (errors or failed)[0]
+            parts = [future.result() for future in futures]
+    finally:
+        return_render_slots(borrowed)
+
+    pdf_metrics.increment('pdf_render.sharded')
+    pdf_metrics.increment('pdf_render.shards', len(shards))
+    logger.info(f"Sharded render finished: shards={len(shards)}, sizes={[len(p) for p in parts]}")
+    return concatenate_pdfs(parts)
@@ -0,0 +1,133 @@
+"""同一内容の同時レンダリングの集約（single-flight）
+
+責務: 同じ内容（pdf_cache のキー = 内容ハッシュ）の PDF 生成が同時に複数走らないよう、
+実行中の生成を内容ハッシュごとに1件だけ登録し、後から来た同一内容の要求はその結果を待って共有する。
+
+- 「PDF形式」のダブルクリックや、応答が遅い場合のフロントエンドの再試行、/api/pdf/export と
+  /api/mail/send-pdf の同時呼び出しで wkhtmltopdf が重複起動されるのを防ぐ
+- 集約するのはスタンプ前の本文 PDF の生成のみ。機密スタンプ・線形化は要求ごとに行う
+- 完了済みの結果の再利用は pdf_cache が担う（ここでは実行中の生成のみを扱う）
+- 先行の生成が失敗した場合は、待っていた要求にも同じ例外を返す。ただし先行要求がクライアント切断等で
+  取り消された場合は、待っていた要求のうち1つが生成し直す
+- 待機中の要求はレンダリング実行器の枠を他の要求に譲り（render_executor.release_render_slot）、
+  生成し直す場合のみ空きを待って取り直す。共有した結果へのスタンプ・線形化は枠を持たずに行う
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from . import pdf_metrics
+from .render_cancel import RenderCancelled, is_cancelled, wait_future
+from .render_executor import reclaim_render_slot, release_render_slot
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    def __init__(self):
+        self.future: Future = Future()
+        self.waiters = 0
+
+
+class SingleFlight:
+    """キーごとに実行中の処理を1つに集約する"""
+
+    def __init__(self, metric_prefix: str = 'pdf_singleflight'):
+        self.metric_prefix = metric_prefix
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key: str, func: Callable[[], Any],
+           share: Optional[Callable[[Any], Any]] = None) -> Tuple[Any, bool]:
+        """key の処理が実行中ならその結果を待ち、なければ func を実行する
+
+        share は先行要求の結果を待機中の要求へ渡す値に変換する関数（待機中の要求がある場合のみ、
+        先行要求のスレッドで呼ばれる）。ファイルに書き出す処理の結果をバイト列で共有する場合などに使う。
+
+        Returns:
+            (結果, 他の要求の結果を共有したか)
+        """
+        while True:
+            with self._lock:
+                flight = self._flights.get(key)
+                if flight is None:
+                    flight = self._flights[key] = _Flight()
+                    self.leaders += 1
+                    break
+                flight.waiters += 1
+                self.coalesced += 1
+
+            pdf_metrics.increment(f'{self.metric_prefix}.coalesced')
+            logger.info(f"PDF render coalesced with in-flight render: {key[:12]}")
+            # 待っている間は wkhtmltopdf を起動しないため、実行枠を他の要求に譲る
+            release_render_slot()
+            try:
+                # 自分のリクエストが取り消された場合は待機をやめる
+                return wait_future(flight.future), True
+            except RenderCancelled:
+                if is_cancelled():
+                    raise
+                # 先行要求だけが取り消された（クライアント切断など）場合は生成をやり直す
+                pdf_metrics.increment(f'{self.metric_prefix}.leader_cancelled')
+
+        pdf_metrics.increment(f'{self.metric_prefix}.leaders')
+        try:
+            # 待機中に譲った実行枠は、自分で生成する前に（空きを待って）取り直す
+            reclaim_render_slot()
+            result = func()
+        except BaseException as e:
+            with self._lock:
+                del self._flights[key]
+            flight.future.set_exception(e)
+            raise
+        # 登録を外した後は待機者が増えないため、ここで共有要否を判断できる
+        with self._lock:
+            del self._flights[key]
+            waiters = flight.waiters
+        try:
+            shared = share(result) if share is not None and waiters else result
+        except BaseException as e:
+            flight.future.set_exception(e)
+            raise
+        flight.future.set_result(shared)
+        return result, False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'in_flight': len(self._flights),
+                'waiting': sum(flight.waiters for flight in self._flights.values()),
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+            }
+
+
+_flights: Optional[SingleFlight] = None
+_flights_lock = threading.Lock()
+
+
+def get_render_flights() -> Optional[SingleFlight]:
+    """プロセス共通の集約テーブル（PDF_SINGLE_FLIGHT 無効時は None）"""
+    global _flights
+    from app.config import get_settings
+    if not get_settings().PDF_SINGLE_FLIGHT:
+        return None
+    if _flights is None:
+        with _flights_lock:
+            if _flights is None:
+                _flights = SingleFlight()
+                pdf_metrics.register_provider('pdf_singleflight', _flights.stats)
+    return _flights
+
+
+def run_once(key: str, func: Callable[[], Any], share: Optional[Callable[[Any], Any]] = None) -> Tuple[Any, bool]:
+    """共通の集約テーブルで func を実行する（無効時はそのまま実行する）"""
+    flights = get_render_flights()
+    if flights is None:
+        return func(), False
+    return flights.do(key, func, share)
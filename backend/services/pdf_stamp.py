@@ -0,0 +1,315 @@
+"""機密レベルスタンプ後処理
+
+責務: ヘッダーなしでレンダリングした PDF の各ページ右上に、機密レベルの
+バッジ（赤枠・赤文字）を重ねる。
+
+wkhtmltopdf の --header-html はページごとにヘッダー HTML を読み込み・レイアウトするため
+長い議事録ほど遅くなる。本文を1回だけレンダリングし、ここでスタンプを合成すれば
+同じ本文を別の機密レベルで再利用することもできる。
+
+ファイル配信用の stamp_confidentiality_file は PDF を読み込み直さず、増分更新として末尾に追記する。
+
+バッジの文字は reportlab_fonts が見つけた TrueType の日本語フォントで描画し、使用した文字だけを
+PDF に埋め込む（閲覧環境に日本語フォントがなくても表示される）。TrueType フォントが見つからない場合のみ
+埋め込みなしの CID フォント（HeiseiKakuGo-W5）を使う。
+"""
+from __future__ import annotations
+
+import io
+import logging
+import os
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import (
+    ArrayObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    FloatObject,
+    IndirectObject,
+    NameObject,
+    NumberObject,
+    PdfObject,
+    StreamObject,
+)
+from reportlab.lib import colors
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfgen import canvas
+
+from .reportlab_fonts import get_reportlab_font
+
+logger = logging.getLogger(__name__)
+
+STAMP_FONT_SIZE = 10.5      # 14px 相当
+STAMP_PADDING_X = 7.5       # 10px 相当
+STAMP_PADDING_Y = 3.75      # 5px 相当
+STAMP_BORDER_WIDTH = 1.5    # 2px 相当
+# 旧 header.html のバッジ位置（右余白 15mm + 20px、上端から約 12mm）に合わせる
+STAMP_RIGHT_OFFSET = 15 * mm + 15
+STAMP_TOP_OFFSET = 12 * mm
+
+
+def _overlay_pdf(confidential_level: str, page_width: float, page_height: float) -> bytes:
+    """1ページ分のスタンプ PDF を返す（フォントは reportlab_fonts で1回だけ探索・登録される）"""
+    return _render_overlay(confidential_level, page_width, page_height, get_reportlab_font())
+
+
+@lru_cache(maxsize=32)
+def _render_overlay(confidential_level: str, page_width: float, page_height: float, font_name: str) -> bytes:
+    """1ページ分のスタンプ PDF を生成（機密レベル・用紙サイズ・フォントごとにキャッシュ）"""
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=(page_width, page_height))
+
+    text_width = pdfmetrics.stringWidth(confidential_level, font_name, STAMP_FONT_SIZE)
+    box_width = text_width + STAMP_PADDING_X * 2
+    box_height = STAMP_FONT_SIZE + STAMP_PADDING_Y * 2
+    x = page_width - STAMP_RIGHT_OFFSET - box_width
+    y = page_height - STAMP_TOP_OFFSET - box_height
+
+    c.setLineWidth(STAMP_BORDER_WIDTH)
+    c.setStrokeColor(colors.red)
+    c.setFillColor(colors.white)
+    c.rect(x, y, box_width, box_height, stroke=1, fill=1)
+
+    # 太字相当にするため文字を塗り + 細い輪郭線で描画する
+    text = c.beginText(x + STAMP_PADDING_X, y + STAMP_PADDING_Y + STAMP_FONT_SIZE * 0.15)
+    text.setFont(font_name, STAMP_FONT_SIZE)
+    text.setTextRenderMode(2)
+    c.setFillColor(colors.red)
+    c.setLineWidth(0.3)
+    text.textOut(confidential_level)
+    c.drawText(text)
+
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def stamp_confidentiality(pdf_bytes: bytes, confidential_level: str) -> bytes:
+    """PDF の全ページに機密レベルのバッジを重ねた PDF を返す
+
+    Args:
+        pdf_bytes: ヘッダーなしでレンダリングした PDF
+        confidential_level: 表示する機密レベル（空の場合はそのまま返す）
+
+    Returns:
+        スタンプ済み PDF のバイトデータ
+    """
+    if not confidential_level:
+        return pdf_bytes
+
+    writer = PdfWriter(clone_from=PdfReader(io.BytesIO(pdf_bytes)))
+    for page in writer.pages:
+        width = float(page.mediabox.width)
+        height = float(page.mediabox.height)
+        overlay = PdfReader(io.BytesIO(_overlay_pdf(confidential_level, width, height))).pages[0]
+        page.merge_page(overlay)
+
+    output = io.BytesIO()
+    writer.write(output)
+    logger.info(f"Confidentiality stamp applied: level={confidential_level}, pages={len(writer.pages)}")
+    return output.getvalue()
+
+
+# ---------------------------------------------------------------------------
+# ファイル上の PDF へのスタンプ（増分更新）
+# ---------------------------------------------------------------------------
+
+_TAIL_BYTES = 1024
+_STAMP_XOBJECT = '/ConfidentialityStamp'
+_STREAM_ENCODING_KEYS = ('/Filter', '/DecodeParms', '/Length')
+
+
+def _shallow_copy(source: DictionaryObject) -> DictionaryObject:
+    """辞書を参照（IndirectObject）を解決せずにコピーする"""
+    copied = DictionaryObject()
+    for key in source.keys():
+        copied[NameObject(key)] = source.raw_get(key)
+    return copied
+
+
+class _Increment:
+    """PDF の増分更新セクション（追加・更新オブジェクト + xref + trailer）"""
+
+    def __init__(self, next_number: int):
+        self.next_number = next_number
+        self.objects: Dict[Tuple[int, int], PdfObject] = {}
+
+    def _allocate(self) -> IndirectObject:
+        ref = IndirectObject(self.next_number, 0, None)
+        self.next_number += 1
+        return ref
+
+    def add(self, obj: PdfObject) -> IndirectObject:
+        ref = self._allocate()
+        self.objects[(ref.idnum, 0)] = obj
+        return ref
+
+    def replace(self, ref: IndirectObject, obj: PdfObject) -> None:
+        self.objects[(ref.idnum, ref.generation)] = obj
+
+    def import_object(self, obj: PdfObject, mapping: Dict[int, IndirectObject]) -> PdfObject:
+        """別の PDF（スタンプ用 PDF）のオブジェクトを、参照先ごと新しい番号で取り込む"""
+        if isinstance(obj, IndirectObject):
+            if obj.idnum not in mapping:
+                # 循環参照に備えて番号を先に確保してから中身を取り込む
+                ref = mapping[obj.idnum] = self._allocate()
+                self.objects[(ref.idnum, 0)] = self.import_object(obj.get_object(), mapping)
+            return mapping[obj.idnum]
+        if isinstance(obj, StreamObject):
+            copied = DecodedStreamObject()
+            copied.set_data(obj.get_data())
+            for key in obj.keys():
+                if key not in _STREAM_ENCODING_KEYS:
+                    copied[NameObject(key)] = self.import_object(obj.raw_get(key), mapping)
+            return copied
+        if isinstance(obj, DictionaryObject):
+            copied = DictionaryObject()
+            for key in obj.keys():
+                copied[NameObject(key)] = self.import_object(obj.raw_get(key), mapping)
+            return copied
+        if isinstance(obj, ArrayObject):
+            return ArrayObject(self.import_object(value, mapping) for value in obj)
+        return obj
+
+    def write(self, out, offset: int, trailer: DictionaryObject) -> None:
+        """ファイル位置 offset から増分更新セクションを書き込む"""
+        positions: Dict[int, Tuple[int, int]] = {}
+        for (number, generation), obj in sorted(self.objects.items()):
+            buffer = io.BytesIO()
+            buffer.write(f'{number} {generation} obj\n'.encode('ascii'))
+            obj.write_to_stream(buffer)
+            buffer.write(b'\nendobj\n')
+            positions[number] = (offset, generation)
+            out.write(buffer.getvalue())
+            offset += buffer.tell()
+
+        # 番号が連続する範囲ごとに xref サブセクションを作る
+        lines: List[bytes] = [b'xref\n']
+        numbers = sorted(positions)
+        run_start = 0
+        for i in range(1, len(numbers) + 1):
+            if i == len(numbers) or numbers[i] != numbers[i - 1] + 1:
+                run = numbers[run_start:i]
+                lines.append(f'{run[0]} {len(run)}\n'.encode('ascii'))
+                lines.extend(f'{positions[n][0]:010d} {positions[n][1]:05d} n\r\n'.encode('ascii') for n in run)
+                run_start = i
+        lines.append(b'trailer\n')
+        out.write(b''.join(lines))
+
+        buffer = io.BytesIO()
+        trailer.write_to_stream(buffer)
+        out.write(buffer.getvalue())
+        out.write(f'\nstartxref\n{offset}\n%%EOF\n'.encode('ascii'))
+
+
+def _read_startxref(f) -> int:
+    """ファイル末尾の startxref が指す位置を返す"""
+    f.seek(0, os.SEEK_END)
+    f.seek(max(0, f.tell() - _TAIL_BYTES))
+    tail = f.read()
+    marker = tail.rfind(b'startxref')
+    if marker == -1:
+        raise ValueError('startxref not found')
+    return int(tail[marker + len(b'startxref'):].split()[0])
+
+
+def _page_resources(page: DictionaryObject) -> DictionaryObject:
+    """ページ（または親のページツリー）の /Resources のコピー"""
+    node = page
+    while node is not None:
+        if '/Resources' in node:
+            return _shallow_copy(node['/Resources'])
+        node = node.get('/Parent')
+    return DictionaryObject()
+
+
+def _stamp_form(increment: _Increment, confidential_level: str, width: float, height: float) -> IndirectObject:
+    """スタンプ用 PDF の1ページ目を Form XObject として取り込む"""
+    overlay = PdfReader(io.BytesIO(_overlay_pdf(confidential_level, width, height))).pages[0]
+    form = DecodedStreamObject()
+    form.set_data(overlay.get_contents().get_data())
+    form[NameObject('/Type')] = NameObject('/XObject')
+    form[NameObject('/Subtype')] = NameObject('/Form')
+    form[NameObject('/BBox')] = ArrayObject([FloatObject(0), FloatObject(0), FloatObject(width), FloatObject(height)])
+    form[NameObject('/Resources')] = increment.import_object(overlay.raw_get('/Resources'), {})
+    return increment.add(form)
+
+
+def stamp_confidentiality_file(path: str, confidential_level: str) -> None:
+    """ファイル上の PDF の全ページに機密レベルのバッジを重ねる（ファイル末尾へ増分更新を追記）
+
+    元の PDF のストリーム（画像・本文）は読み込まずに残し、ページ辞書とスタンプ用の
+    Form XObject、xref だけを追記する。元の PDF が増分更新に向かない形式（xref ストリームなど）の
+    場合はメモリ上で stamp_confidentiality を使う。
+    """
+    if not confidential_level:
+        return
+
+    with open(path, 'r+b') as f:
+        try:
+            startxref = _read_startxref(f)
+            f.seek(startxref)
+            classic_xref = f.read(4) == b'xref'
+        except (ValueError, IndexError):
+            classic_xref = False
+
+        if not classic_xref:
+            f.seek(0)
+            stamped = stamp_confidentiality(f.read(), confidential_level)
+            f.seek(0)
+            f.write(stamped)
+            f.truncate()
+            return
+
+        f.seek(0)
+        reader = PdfReader(f)
+        increment = _Increment(int(reader.trailer['/Size']))
+
+        # 元の内容を q ... Q で囲み、グラフィックス状態の変更がスタンプに及ばないようにする
+        save_state = DecodedStreamObject()
+        save_state.set_data(b'q\n')
+        save_state_ref = increment.add(save_state)
+        draw_stamp = DecodedStreamObject()
+        draw_stamp.set_data(f'\nQ\nq {_STAMP_XOBJECT} Do Q\n'.encode('ascii'))
+        draw_stamp_ref = increment.add(draw_stamp)
+
+        forms: Dict[Tuple[float, float], IndirectObject] = {}
+        pages = reader.pages
+        for page in pages:
+            size = (float(page.mediabox.width), float(page.mediabox.height))
+            if size not in forms:
+                forms[size] = _stamp_form(increment, confidential_level, *size)
+
+            resources = _page_resources(page)
+            xobjects = _shallow_copy(resources['/XObject']) if '/XObject' in resources else DictionaryObject()
+            xobjects[NameObject(_STAMP_XOBJECT)] = forms[size]
+            resources[NameObject('/XObject')] = xobjects
+
+            contents = page.raw_get('/Contents') if '/Contents' in page else None
+            if contents is None:
+                original = []
+            elif isinstance(contents.get_object(), ArrayObject):
+                original = list(contents.get_object())
+            else:
+                original = [contents]
+
+            updated = _shallow_copy(page)
+            updated[NameObject('/Resources')] = resources
+            updated[NameObject('/Contents')] = ArrayObject([save_state_ref, *original, draw_stamp_ref])
+            increment.replace(page.indirect_reference, updated)
+
+        trailer = DictionaryObject()
+        for key in ('/Root', '/Info', '/ID'):
+            if key in reader.trailer:
+                trailer[NameObject(key)] = reader.trailer.raw_get(key)
+        trailer[NameObject('/Size')] = NumberObject(increment.next_number)
+        trailer[NameObject('/Prev')] = NumberObject(startxref)
+
+        f.seek(0, os.SEEK_END)
+        f.write(b'\n')
+        increment.write(f, f.tell(), trailer)
+
+    logger.info(f"Confidentiality stamp appended: level={confidential_level}, pages={len(pages)}")
@@ -0,0 +1,246 @@
+"""クライアント切断・期限によるレンダリングの取り消し
+
+責務: リクエストごとの取り消しトークンをレンダリングスレッドへ引き継ぎ、クライアントが切断した場合や
+クライアント指定の期限（X-Request-Timeout ヘッダー、秒）を過ぎた場合に、実行中の wkhtmltopdf を
+直ちに終了させてレンダリング容量を解放する。
+
+- ルートは render_executor.run_render_cancellable で実行し、イベントループ側で request.is_disconnected() と
+  期限を監視する（PDF_DISCONNECT_POLL_INTERVAL 秒ごと）
+- 待ち行列で待機中に取り消された要求は実行せずに破棄する
+- 単発の wkhtmltopdf は新しいセッション（プロセスグループ）で起動し、取り消し時はグループごと終了させる。
+  常駐ワーカーで実行中の場合はそのワーカーを終了させる（プールが再起動する）
+- 期限はサブプロセスのタイムアウトの上限としても使う
+- 作業ファイルは呼び出し側の後始末（TemporaryDirectory・出力ファイルの削除）で削除される
+"""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+import signal
+import subprocess
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional
+
+from . import pdf_metrics
+
+logger = logging.getLogger(__name__)
+
+# クライアントが指定する残り時間（秒）
+DEADLINE_HEADER = 'X-Request-Timeout'
+
+REASON_DISCONNECTED = 'client_disconnected'
+REASON_DEADLINE = 'deadline_exceeded'
+
+# 共有中の生成結果を待つ間に取り消しを確認する間隔（秒）
+_FUTURE_POLL_SECONDS = 0.1
+
+
+class RenderCancelled(RuntimeError):
+    """クライアント切断・期限切れによりレンダリングを中止した"""
+
+    def __init__(self, reason: str):
+        super().__init__(f'PDF生成を中止しました（{reason}）')
+        self.reason = reason
+        # 499: クライアントが切断済み（応答は届かない）、504: 期限切れ
+        self.status_code = 499 if reason == REASON_DISCONNECTED else 504
+
+
+class CancelToken:
+    """1リクエスト分の取り消し状態（deadline は time.monotonic() 基準）"""
+
+    def __init__(self, deadline: Optional[float] = None):
+        self.deadline = deadline
+        self.reason: Optional[str] = None
+        self.started = False
+        self._lock = threading.Lock()
+        self._callbacks: Dict[int, Callable[[], Any]] = {}
+        self._next_id = 0
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def cancel(self, reason: str) -> None:
+        """取り消し、登録中の終了処理（プロセスの kill など）を呼び出す"""
+        with self._lock:
+            if self.reason is not None:
+                return
+            self.reason = reason
+            callbacks = list(self._callbacks.values())
+            self._callbacks.clear()
+        pdf_metrics.increment(f'render_cancel.{reason}')
+        logger.info(f"PDF render cancelled: {reason} (running={self.started}, callbacks={len(callbacks)})")
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Render cancel callback failed: {e}")
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def check(self) -> None:
+        """取り消し済み（期限切れを含む）なら RenderCancelled を送出する"""
+        if self.reason is None and self.expired():
+            self.cancel(REASON_DEADLINE)
+        if self.reason is not None:
+            raise RenderCancelled(self.reason)
+
+    def timeout(self, timeout: float) -> float:
+        """timeout を期限までの残り時間で切り詰める"""
+        self.check()
+        if self.deadline is None:
+            return timeout
+        return min(timeout, self.deadline - time.monotonic())
+
+    @contextmanager
+    def on_cancel(self, callback: Callable[[], Any]):
+        """with ブロックの間、取り消し時に callback を呼ぶ（取り消し済みなら直ちに呼ぶ）"""
+        with self._lock:
+            key = None
+            if self.reason is None:
+                key = self._next_id
+                self._next_id += 1
+                self._callbacks[key] = callback
+        if key is None:
+            callback()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._callbacks.pop(key, None)
+
+
+_current: ContextVar[Optional[CancelToken]] = ContextVar('render_cancel_token', default=None)
+
+
+def current_token() -> Optional[CancelToken]:
+    return _current.get()
+
+
+@contextmanager
+def use_token(token: Optional[CancelToken]):
+    """このスレッド（コンテキスト）での処理を token で取り消せるようにする"""
+    reset = _current.set(token)
+    try:
+        yield
+    finally:
+        _current.reset(reset)
+
+
+def bind(token: CancelToken, func: Callable[[], Any]) -> Callable[[], Any]:
+    """レンダリングスレッドで token を有効にして func を実行する関数を返す"""
+    def run():
+        token.started = True
+        with use_token(token):
+            token.check()
+            return func()
+    return run
+
+
+def is_cancelled() -> bool:
+    token = current_token()
+    return token is not None and token.cancelled
+
+
+def check_cancelled() -> None:
+    token = current_token()
+    if token is not None:
+        token.check()
+
+
+def cap_timeout(timeout: float) -> float:
+    token = current_token()
+    return token.timeout(timeout) if token is not None else timeout
+
+
+def on_cancel(callback: Callable[[], Any]):
+    token = current_token()
+    return token.on_cancel(callback) if token is not None else nullcontext()
+
+
+def wait_future(future: concurrent.futures.Future) -> Any:
+    """future の結果を待つ（待機中も取り消しを確認する）"""
+    token = current_token()
+    if token is None:
+        return future.result()
+    while True:
+        token.check()
+        try:
+            return future.result(timeout=_FUTURE_POLL_SECONDS)
+        except concurrent.futures.TimeoutError:
+            continue
+
+
+def kill_process_group(proc: subprocess.Popen) -> None:
+    """プロセスをプロセスグループごと終了させる（Windows はプロセスのみ）"""
+    if proc.poll() is not None:
+        return
+    try:
+        if os.name == 'posix':
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except (ProcessLookupError, PermissionError):
+        return
+    pdf_metrics.increment('render_cancel.killed_processes')
+
+
+def run_process(cmd: list, input: bytes, stdout: int, timeout: float,
+                env: Optional[dict] = None) -> subprocess.CompletedProcess:
+    """subprocess.run 相当（標準エラーは PIPE）。新しいプロセスグループで起動し、取り消し・タイムアウト時はグループごと終了させる
+
+    Raises:
+        RenderCancelled: 取り消された、または期限を過ぎた場合
+        subprocess.TimeoutExpired: timeout を超えた場合
+    """
+    timeout = cap_timeout(timeout)
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=stdout, stderr=subprocess.PIPE, env=env,
+                            start_new_session=os.name == 'posix')
+    with on_cancel(lambda: kill_process_group(proc)):
+        try:
+            out, err = proc.communicate(input, timeout=max(timeout, 0))
+        except subprocess.TimeoutExpired:
+            kill_process_group(proc)
+            proc.communicate()
+            check_cancelled()
+            raise
+        except BaseException:
+            kill_process_group(proc)
+            proc.wait()
+            raise
+    check_cancelled()
+    return subprocess.CompletedProcess(cmd, proc.returncode, out, err)
+
+
+def client_deadline(request) -> Optional[float]:
+    """X-Request-Timeout ヘッダー（秒）から期限を求める（未指定・不正値は期限なし）"""
+    value = request.headers.get(DEADLINE_HEADER)
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        return None
+    if seconds <= 0:
+        return None
+    return time.monotonic() + seconds
+
+
+async def watch_request(request, token: CancelToken, task: asyncio.Future, interval: float) -> None:
+    """task の完了まで切断・期限を監視し、該当すれば token を取り消す（未開始の task は破棄する）"""
+    while not task.done():
+        if await request.is_disconnected():
+            token.cancel(REASON_DISCONNECTED)
+        elif token.expired():
+            token.cancel(REASON_DEADLINE)
+        if token.cancelled:
+            if not token.started:
+                task.cancel()
+            return
+        await asyncio.wait({task}, timeout=interval)
@@ -0,0 +1,446 @@
+"""PDFレンダリング実行器
+
+責務: ブロッキングな PDF 生成処理（wkhtmltopdf 呼び出し）をイベントループ外の
+スレッドで実行し、同時実行数と待ち行列の長さを制限する。
+
+- 同時実行数を超えたリクエストは待ち行列で待機する
+- 待ち行列は優先度クラス（interactive > mail > batch）ごとに分かれ、空きができたら優先度の高いクラスから
+  実行する。呼び出し側は必ず priority を指定する
+  - interactive: 画面でダウンロード・プレビューを待っているユーザーがいる要求
+  - mail: メール送信用の PDF（数秒の遅れは許容される）
+  - batch: 一括出力など（さらに遅れてよい）
+- mail・batch はクラスごとの同時実行数上限（PDF_RENDER_MAIL_MAX_CONCURRENCY 等）を超えて実行しない
+- 低優先度の要求が PDF_RENDER_STARVATION_SECONDS 秒以上待った場合は、優先度に関係なく先に実行する（飢餓防止）
+- 待ち行列が上限に達している場合は 429 相当の RenderSaturatedError
+  （上限の判定には同じ・より高い優先度の待機数のみ数えるため、一括出力の待機で対話的な要求は拒否されない）
+- 待ち時間が上限を超えた場合は 503 相当の RenderSaturatedError
+- 呼び出し側が取り消されてもスレッドの処理は止まらないため、実行枠はスレッドの処理が終わった時点で返す
+- 実行中の処理が他の要求の生成結果を待つ間（pdf_singleflight の待機）は release_render_slot で枠を他の要求に
+  譲る。待機後にその要求自身が生成する場合は reclaim_render_slot で空き枠ができるまで待って取り直す
+  （待ち行列の上限は適用しないが、待ち時間の上限・取り消し・期限は適用する）
+- 1つの要求が複数の wkhtmltopdf を並行実行する場合（pdf_shard の分割レンダリング）は、待機者がいない
+  空き枠だけを borrow_render_slots で借りる（借りられない分は自分の枠で順に実行する）
+"""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import functools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional
+
+from . import pdf_metrics
+from .render_cancel import check_cancelled
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_MAIL = 'mail'
+PRIORITY_BATCH = 'batch'
+# 優先度の高い順
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_MAIL, PRIORITY_BATCH)
+
+
+class RenderSaturatedError(RuntimeError):
+    """レンダリング容量が飽和しているため受け付けられない"""
+
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+# 枠を取り直すスレッドが取り消しを確認する間隔（秒）
+_RECLAIM_POLL_SECONDS = 0.1
+
+
+class _Waiter:
+    """実行枠の待機者（future は asyncio.Future、スレッドから待つ場合は concurrent.futures.Future）"""
+
+    def __init__(self, priority: str, future=None):
+        self.priority = priority
+        self.enqueued = time.monotonic()
+        self.future = future if future is not None else asyncio.get_running_loop().create_future()
+
+
+class _Slot:
+    """実行中の処理が保持している実行枠（実行スレッドからのみ操作する）"""
+
+    def __init__(self, executor: 'RenderExecutor', loop: asyncio.AbstractEventLoop, priority: str):
+        self.executor = executor
+        self.loop = loop
+        self.priority = priority
+        self.held = True
+
+    def release(self) -> None:
+        if self.held:
+            self.held = False
+            self.executor._finished(self.loop, self.priority)
+
+    def reclaim(self) -> None:
+        if not self.held:
+            self.executor._reclaim(self.loop, self.priority)
+            self.held = True
+
+
+_local = threading.local()
+
+
+def _run_in_slot(slot: _Slot, func: Callable[[], Any]) -> Any:
+    _local.slot = slot
+    try:
+        return func()
+    finally:
+        _local.slot = None
+
+
+class RenderExecutor:
+    """同時実行数・待ち行列長を制限した優先度付きレンダリング用スレッド実行器
+
+    class_limits はクラスごとの同時実行数上限（0・省略時は max_concurrency まで）。
+    limit_provider を指定した場合は、その時点の戻り値（max_concurrency 以下）を同時実行数の上限とする
+    （render_limiter による自動調整）。
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float,
+                 class_limits: Optional[Dict[str, int]] = None, starvation_seconds: float = 10.0,
+                 limit_provider: Optional[Callable[[], int]] = None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.starvation_seconds = starvation_seconds
+        self._limit_provider = limit_provider
+        self.class_limits = {
+            priority: min((class_limits or {}).get(priority) or self.max_concurrency, self.max_concurrency)
+            for priority in PRIORITIES
+        }
+        # 枠を譲って待機中のスレッドがあっても枠を得た要求が実行できるよう、待ち行列の分もスレッドを用意する
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency + self.max_queue,
+                                            thread_name_prefix='pdf-render')
+        self._lock = threading.Lock()
+        self._queues: Dict[str, Deque[_Waiter]] = {priority: deque() for priority in PRIORITIES}
+        self._running: Dict[str, int] = {priority: 0 for priority in PRIORITIES}
+
+    @property
+    def _active(self) -> int:
+        return sum(self._running.values())
+
+    @property
+    def _waiting(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    @property
+    def concurrency_limit(self) -> int:
+        """現在の同時実行数の上限"""
+        if self._limit_provider is None:
+            return self.max_concurrency
+        return max(1, min(self.max_concurrency, self._limit_provider()))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'max_concurrency': self.max_concurrency,
+                'concurrency_limit': self.concurrency_limit,
+                'max_queue': self.max_queue,
+                'active': self._active,
+                'waiting': self._waiting,
+                'classes': {
+                    priority: {
+                        'active': self._running[priority],
+                        'waiting': len(self._queues[priority]),
+                        'limit': self.class_limits[priority],
+                    }
+                    for priority in PRIORITIES
+                },
+            }
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        """次に実行する待機者（上限に達したクラスは除く。飢餓状態の待機者を最優先）"""
+        candidates = []
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            if queue and self._running[priority] < self.class_limits[priority]:
+                candidates.append(queue[0])
+        if not candidates:
+            return None
+        now = time.monotonic()
+        starving = [w for w in candidates if now - w.enqueued >= self.starvation_seconds]
+        if not starving:
+            return candidates[0]
+        oldest = min(starving, key=lambda w: w.enqueued)
+        if oldest is not candidates[0]:
+            pdf_metrics.increment('render_executor.starvation_promotions')
+        return oldest
+
+    def _dispatch(self) -> None:
+        """空いている実行枠を待機者に割り当てる（イベントループ上で呼ぶ）"""
+        with self._lock:
+            while self._active < self.concurrency_limit:
+                waiter = self._next_waiter()
+                if waiter is None:
+                    return
+                self._queues[waiter.priority].popleft()
+                self._running[waiter.priority] += 1
+                waiter.future.set_result(None)
+
+    def _borrow(self, priority: str, count: int) -> int:
+        """待機者がいない場合に限り、空き枠を最大 count 個 priority のクラスで確保する（確保した数を返す）"""
+        with self._lock:
+            if self._waiting:
+                return 0
+            free = min(self.concurrency_limit - self._active,
+                       self.class_limits[priority] - self._running[priority])
+            borrowed = max(0, min(count, free))
+            self._running[priority] += borrowed
+            return borrowed
+
+    def _reclaim(self, loop: asyncio.AbstractEventLoop, priority: str) -> None:
+        """譲った実行枠を空きができるまで待って取り直す（実行スレッドから呼ぶ）
+
+        既に受け付けた要求のため待ち行列の上限では拒否しない。
+
+        Raises:
+            RenderCancelled: 待機中に取り消された・期限を過ぎた場合
+            RenderSaturatedError: 待ち時間が上限を超えた場合
+        """
+        waiter = _Waiter(priority, concurrent.futures.Future())
+        with self._lock:
+            self._queues[priority].append(waiter)
+        loop.call_soon_threadsafe(self._dispatch)
+        deadline = time.monotonic() + self.queue_timeout
+        try:
+            while True:
+                check_cancelled()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning(f"PDF render slot reclaim timed out ({self.queue_timeout}s, {priority}): {self.stats()}")
+                    pdf_metrics.increment('render_executor.rejected_queue_timeout')
+                    raise RenderSaturatedError('PDF生成の待ち時間が上限を超えました', 503, 10)
+                try:
+                    waiter.future.result(timeout=min(_RECLAIM_POLL_SECONDS, remaining))
+                    return
+                except concurrent.futures.TimeoutError:
+                    continue
+        except BaseException:
+            # 待機をやめる（直前に実行枠が割り当てられていた場合は返す）
+            if self._abandon(waiter):
+                self._finished(loop, priority)
+            raise
+
+    def _release(self, priority: str) -> None:
+        with self._lock:
+            self._running[priority] -= 1
+        self._dispatch()
+
+    def _finished(self, loop: asyncio.AbstractEventLoop, priority: str) -> None:
+        """スレッドの処理が終わった時点で実行枠を返す（実行スレッドから呼ばれる）"""
+        with self._lock:
+            self._running[priority] -= 1
+        try:
+            loop.call_soon_threadsafe(self._dispatch)
+        except RuntimeError:
+            # イベントループが既に終了している（割り当てる待機者もいない）
+            pass
+
+    async def _acquire(self, priority: str) -> None:
+        """priority の実行枠を得るまで待機する
+
+        Raises:
+            RenderSaturatedError: 待ち行列が満杯、または待ち時間が上限を超えた場合
+        """
+        rank = PRIORITIES.index(priority)
+        waiter = None
+        with self._lock:
+            # 自分より低い優先度の待機者は数えない（先に実行されることはないため）
+            ahead = sum(len(self._queues[p]) for p in PRIORITIES[:rank + 1])
+            if self._active + ahead < self.concurrency_limit + self.max_queue:
+                waiter = _Waiter(priority)
+                self._queues[priority].append(waiter)
+        if waiter is None:
+            logger.warning(f"PDF render rejected (queue full, {priority}): {self.stats()}")
+            pdf_metrics.increment('render_executor.rejected_queue_full')
+            raise RenderSaturatedError('PDF生成が混雑しています。しばらくしてから再試行してください', 429, 5)
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not self._abandon(waiter):
+                logger.warning(f"PDF render rejected (queue timeout {self.queue_timeout}s, {priority}): {self.stats()}")
+                pdf_metrics.increment('render_executor.rejected_queue_timeout')
+                raise RenderSaturatedError('PDF生成の待ち時間が上限を超えました', 503, 10)
+        except BaseException:
+            # 待機中に取り消された（実行枠が割り当て済みなら返す）
+            if self._abandon(waiter):
+                self._release(priority)
+            raise
+        waited = time.monotonic() - waiter.enqueued
+        pdf_metrics.increment(f'render_executor.{priority}.started')
+        pdf_metrics.increment(f'render_executor.{priority}.wait_seconds', waited)
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """待機をやめる。直前に実行枠が割り当てられていた場合は True（枠は保持したまま）"""
+        with self._lock:
+            if waiter.future.done():
+                return True
+            self._queues[waiter.priority].remove(waiter)
+            waiter.future.cancel()
+            return False
+
+    async def run(self, func: Callable[..., Any], *args: Any, priority: str = PRIORITY_INTERACTIVE,
+                  **kwargs: Any) -> Any:
+        """func をレンダリングスレッドで実行し、結果を返す
+
+        Raises:
+            RenderSaturatedError: 待ち行列が満杯、または待ち時間が上限を超えた場合
+        """
+        if priority not in self._queues:
+            raise ValueError(f'unknown render priority: {priority}')
+        await self._acquire(priority)
+        slot = _Slot(self, asyncio.get_running_loop(), priority)
+        try:
+            future = self._executor.submit(_run_in_slot, slot, functools.partial(func, *args, **kwargs))
+        except BaseException:
+            self._release(priority)
+            raise
+        # 待機中の呼び出し側が取り消されても、実行枠は処理が実際に終わるまで保持する
+        future.add_done_callback(lambda _: slot.release())
+        return await asyncio.wrap_future(future, loop=slot.loop)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+_executor: Optional[RenderExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_render_executor() -> RenderExecutor:
+    """プロセス共通のレンダリング実行器を取得"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                from app.config import get_settings
+                from .render_limiter import get_render_limiter
+                settings = get_settings()
+                limiter = get_render_limiter()
+                max_concurrency = settings.PDF_RENDER_MAX_CONCURRENCY
+                if limiter is not None:
+                    # 同時実行数はリミッターが決める（スレッドは自動調整の上限まで用意する）
+                    max_concurrency = max(max_concurrency, limiter.max_limit)
+                _executor = RenderExecutor(
+                    max_concurrency,
+                    settings.PDF_RENDER_MAX_QUEUE,
+                    settings.PDF_RENDER_QUEUE_TIMEOUT,
+                    class_limits={
+                        PRIORITY_MAIL: settings.PDF_RENDER_MAIL_MAX_CONCURRENCY,
+                        PRIORITY_BATCH: settings.PDF_RENDER_BATCH_MAX_CONCURRENCY,
+                    },
+                    starvation_seconds=settings.PDF_RENDER_STARVATION_SECONDS,
+                    limit_provider=limiter.current_limit if limiter is not None else None,
+                )
+                pdf_metrics.register_provider('render_executor', _executor.stats)
+    return _executor
+
+
+def release_render_slot() -> None:
+    """実行中の処理の実行枠を他の要求に譲る（実行器のスレッド外・譲渡済みの場合は何もしない）"""
+    slot = getattr(_local, 'slot', None)
+    if slot is not None and slot.held:
+        slot.release()
+        pdf_metrics.increment('render_executor.slots_lent')
+
+
+def reclaim_render_slot() -> None:
+    """release_render_slot で譲った実行枠を、空きができるまで待って取り直す（譲っていない場合は何もしない）
+
+    Raises:
+        RenderCancelled: 待機中に取り消された・期限を過ぎた場合
+        RenderSaturatedError: 待ち時間が上限を超えた場合
+    """
+    slot = getattr(_local, 'slot', None)
+    if slot is not None and not slot.held:
+        slot.reclaim()
+        pdf_metrics.increment('render_executor.slots_reclaimed')
+
+
+def borrow_render_slots(count: int) -> int:
+    """実行中の処理が追加で使う実行枠を、待機者のいない空き枠から最大 count 個借りる
+
+    借りた数を返す（実行器のスレッド外・枠を譲渡中の場合は 0）。使い終わったら return_render_slots で返す。
+    """
+    slot = getattr(_local, 'slot', None)
+    if slot is None or not slot.held or count <= 0:
+        return 0
+    borrowed = slot.executor._borrow(slot.priority, count)
+    if borrowed:
+        pdf_metrics.increment('render_executor.slots_borrowed', borrowed)
+    return borrowed
+
+
+def return_render_slots(count: int) -> None:
+    """borrow_render_slots で借りた実行枠を返す"""
+    slot = getattr(_local, 'slot', None)
+    if slot is None:
+        return
+    for _ in range(count):
+        slot.executor._finished(slot.loop, slot.priority)
+
+
+async def run_render(func: Callable[..., Any], *args: Any, priority: str, **kwargs: Any) -> Any:
+    """共通実行器で func を priority のクラスとして実行する（ルートからの呼び出し用）"""
+    return await get_render_executor().run(func, *args, priority=priority, **kwargs)
+
+
+async def run_render_cancellable(request: Any, func: Callable[..., Any], *args: Any, priority: str,
+                                 **kwargs: Any) -> Any:
+    """run_render と同じだが、クライアントの切断・期限（X-Request-Timeout）で取り消す（render_cancel 参照）
+
+    Raises:
+        RenderCancelled: 取り消された場合
+    """
+    from app.config import get_settings
+    from .render_cancel import REASON_DISCONNECTED, CancelToken, RenderCancelled, bind, client_deadline, watch_request
+
+    token = CancelToken(client_deadline(request))
+    task = asyncio.ensure_future(run_render(bind(token, functools.partial(func, *args, **kwargs)), priority=priority))
+    watcher = asyncio.ensure_future(watch_request(request, token, task, get_settings().PDF_DISCONNECT_POLL_INTERVAL))
+    try:
+        return await task
+    except asyncio.CancelledError:
+        if not token.cancelled:
+            # ハンドラー自体が取り消された（サーバーがクライアント切断を検知した場合など）
+            token.cancel(REASON_DISCONNECTED)
+            raise
+        # 監視側が待ち行列で待機中の要求を破棄した
+        raise RenderCancelled(token.reason)
+    finally:
+        watcher.cancel()
+
+
+async def run_render_retrying(func: Callable[..., Any], *args: Any, priority: str, retries: int = 5,
+                              **kwargs: Any) -> Any:
+    """run_render と同じだが、実行器が飽和している間は retry_after 秒待って再試行する
+
+    ジョブ・一括出力などクライアントを待たせていないバックグラウンド処理用。
+    """
+    for attempt in range(retries + 1):
+        try:
+            return await run_render(func, *args, priority=priority, **kwargs)
+        except RenderSaturatedError as e:
+            if attempt == retries:
+                raise
+            await asyncio.sleep(e.retry_after)
+
+
+def shutdown_render_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
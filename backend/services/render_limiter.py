@@ -0,0 +1,208 @@
+"""PDFレンダリング同時実行数の適応制御
+
+責務: generate_pdf_from_html / generate_pdf_file の wkhtmltopdf 実行時間を計測し、実測した遅延とメモリの空きに
+応じてレンダリング実行器（render_executor）の同時実行数の上限を増減させる。適切な並列数はホストのコア数・
+メモリ・文書の構成で変わるため、固定値の代わりに AIMD（加算増・乗算減）で上限を調整する。
+
+- 上限の適用は実行器が行う（優先度クラスの順序を保ったまま、空き枠の数だけがこの上限で決まる）
+- 完了したレンダリング時間を窓（現在の上限と同数、最低 MIN_WINDOW 件）ごとに集計し、窓の中央値（直近）と
+  これまでの窓の中央値から求めた基準を比べる
+  - 直近 > 基準 × PDF_ADAPTIVE_LATENCY_TOLERANCE: 並列数が多すぎて遅くなっている → 上限 × DECREASE_FACTOR
+  - メモリの空きが PDF_ADAPTIVE_MIN_MEMORY_PERCENT 未満: 上限 × DECREASE_FACTOR
+  - 窓の間に上限と同数の wkhtmltopdf が同時に動いていた（需要がある）: 上限 + 1
+  - それ以外: 維持
+- タイムアウトしたレンダリングは遅延の悪化として扱う。取り消し・wkhtmltopdf の失敗は集計しない
+- 基準は窓の中央値が下がった場合は直ちに、上がった場合は BASELINE_ALPHA でゆっくり追従する（上限を1ずつ
+  上げる間の緩やかな悪化を基準に取り込まないため。文書が恒常的に重くなった場合は時間をかけて基準が追いつく）
+- 上限・判断結果はメトリクス（render_limiter.*）で参照できる
+"""
+from __future__ import annotations
+
+import logging
+import os
+import statistics
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+from . import pdf_metrics
+
+logger = logging.getLogger(__name__)
+
+DECISION_INCREASE = 'increase'
+DECISION_HOLD = 'hold'
+DECISION_DECREASE_LATENCY = 'decrease_latency'
+DECISION_DECREASE_MEMORY = 'decrease_memory'
+
+MIN_WINDOW = 4
+DECREASE_FACTOR = 0.75
+# 基準が窓の中央値の上昇に追従する平滑化係数
+BASELINE_ALPHA = 0.05
+
+
+def available_memory_ratio() -> Optional[float]:
+    """物理メモリの空きの割合（0〜1、取得できない場合は None）"""
+    if os.name == 'nt':
+        import ctypes
+
+        class MemoryStatus(ctypes.Structure):
+            _fields_ = [
+                ('dwLength', ctypes.c_ulong), ('dwMemoryLoad', ctypes.c_ulong),
+                ('ullTotalPhys', ctypes.c_ulonglong), ('ullAvailPhys', ctypes.c_ulonglong),
+                ('ullTotalPageFile', ctypes.c_ulonglong), ('ullAvailPageFile', ctypes.c_ulonglong),
+                ('ullTotalVirtual', ctypes.c_ulonglong), ('ullAvailVirtual', ctypes.c_ulonglong),
+                ('ullAvailExtendedVirtual', ctypes.c_ulonglong),
+            ]
+
+        status = MemoryStatus()
+        status.dwLength = ctypes.sizeof(MemoryStatus)
+        if not ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return None
+        return status.ullAvailPhys / status.ullTotalPhys
+    try:
+        values = {}
+        with open('/proc/meminfo') as f:
+            for line in f:
+                name, _, rest = line.partition(':')
+                if name in ('MemTotal', 'MemAvailable'):
+                    values[name] = int(rest.split()[0])
+        return values['MemAvailable'] / values['MemTotal']
+    except (OSError, KeyError, ValueError, ZeroDivisionError):
+        return None
+
+
+class AdaptiveLimiter:
+    """実測遅延に基づいて同時実行数の上限を増減する"""
+
+    def __init__(self, initial_limit: int, min_limit: int, max_limit: int, latency_tolerance: float = 1.5,
+                 min_memory_ratio: float = 0.1, memory_probe=available_memory_ratio):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.latency_tolerance = latency_tolerance
+        self.min_memory_ratio = min_memory_ratio
+        self._memory_probe = memory_probe
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self._samples: List[float] = []
+        self._saturated = False
+        self.baseline: Optional[float] = None
+        self.recent: Optional[float] = None
+        self.last_decision: Optional[str] = None
+        pdf_metrics.set_gauge('render_limiter.limit', int(self.limit))
+
+    def current_limit(self) -> int:
+        return int(self.limit)
+
+    def _release(self, latency: Optional[float]) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if latency is not None:
+                self._samples.append(latency)
+                if len(self._samples) >= max(MIN_WINDOW, int(self.limit)):
+                    self._adjust()
+
+    def _adjust(self) -> None:
+        """窓1つ分の集計で上限を調整する（_lock を保持して呼ぶ）"""
+        recent = statistics.median(self._samples)
+        self._samples.clear()
+        saturated, self._saturated = self._saturated, self.in_flight >= int(self.limit)
+        memory = self._memory_probe()
+        previous = int(self.limit)
+
+        if self.baseline is not None and recent > self.baseline * self.latency_tolerance:
+            decision = DECISION_DECREASE_LATENCY
+        elif memory is not None and memory < self.min_memory_ratio:
+            decision = DECISION_DECREASE_MEMORY
+        elif saturated:
+            decision = DECISION_INCREASE
+        else:
+            decision = DECISION_HOLD
+
+        if decision in (DECISION_DECREASE_LATENCY, DECISION_DECREASE_MEMORY):
+            self.limit = max(self.min_limit, self.limit * DECREASE_FACTOR)
+        elif decision == DECISION_INCREASE:
+            self.limit = min(self.max_limit, self.limit + 1)
+        if self.baseline is None or recent < self.baseline:
+            self.baseline = recent
+        else:
+            self.baseline += (recent - self.baseline) * BASELINE_ALPHA
+        self.recent = recent
+        self.last_decision = decision
+
+        pdf_metrics.increment(f'render_limiter.decisions.{decision}')
+        pdf_metrics.set_gauge('render_limiter.limit', int(self.limit))
+        if int(self.limit) != previous:
+            baseline = f'{self.baseline:.3f}s' if self.baseline is not None else '-'
+            logger.info(f"Render concurrency limit {previous} -> {int(self.limit)} ({decision}, "
+                        f"recent={recent:.3f}s, baseline={baseline}, memory={memory})")
+
+    @contextmanager
+    def track(self):
+        """wkhtmltopdf 1回分の実行を計測する"""
+        with self._lock:
+            self.in_flight += 1
+            if self.in_flight >= int(self.limit):
+                self._saturated = True
+        started = time.monotonic()
+        # 取り消し・wkhtmltopdf の失敗は並列数と無関係のため集計しない。タイムアウトは遅延の悪化として数える
+        latency: Optional[float] = None
+        try:
+            yield
+        except subprocess.TimeoutExpired:
+            latency = time.monotonic() - started
+            raise
+        else:
+            latency = time.monotonic() - started
+        finally:
+            self._release(latency)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'limit': int(self.limit),
+                'min_limit': self.min_limit,
+                'max_limit': self.max_limit,
+                'in_flight': self.in_flight,
+                'baseline_seconds': round(self.baseline, 4) if self.baseline is not None else None,
+                'recent_seconds': round(self.recent, 4) if self.recent is not None else None,
+                'last_decision': self.last_decision,
+            }
+
+
+_limiter: Optional[AdaptiveLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_render_limiter() -> Optional[AdaptiveLimiter]:
+    """プロセス共通のリミッター（PDF_ADAPTIVE_CONCURRENCY 無効時は None）"""
+    global _limiter
+    from app.config import get_settings
+    settings = get_settings()
+    if not settings.PDF_ADAPTIVE_CONCURRENCY:
+        return None
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = AdaptiveLimiter(
+                    initial_limit=settings.PDF_RENDER_MAX_CONCURRENCY,
+                    min_limit=settings.PDF_ADAPTIVE_MIN_CONCURRENCY,
+                    max_limit=settings.PDF_ADAPTIVE_MAX_CONCURRENCY or os.cpu_count() or 1,
+                    latency_tolerance=settings.PDF_ADAPTIVE_LATENCY_TOLERANCE,
+                    min_memory_ratio=settings.PDF_ADAPTIVE_MIN_MEMORY_PERCENT / 100,
+                )
+                pdf_metrics.register_provider('render_limiter', _limiter.stats)
+    return _limiter
+
+
+@contextmanager
+def track_render():
+    """wkhtmltopdf 1回分の実行を計測する（無効時は何もしない）"""
+    limiter = get_render_limiter()
+    if limiter is None:
+        yield
+        return
+    with limiter.track():
+        yield
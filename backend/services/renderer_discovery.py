@@ -0,0 +1,200 @@
+"""wkhtmltopdf の検出と起動時ウォームアップ
+
+責務: 使用する wkhtmltopdf 実行ファイルをアプリケーション起動時に1回だけ解決・バージョン確認し、
+ウォームアップのレンダリングでフォント（fontconfig キャッシュ）と常駐ワーカーを温めておく。
+結果は /api/pdf/ready（レディネス）と /api/pdf/metrics から参照できる。
+
+- 実行ファイルの探索順: 環境変数 WKHTMLTOPDF_PATH → リポジトリ直下の wkhtmltopdf.exe /
+  '#file:wkhtmltopdf.exe' → PATH 上の wkhtmltopdf(.exe)
+- ウォームアップは常駐プールのワーカー数だけ順に行い、全ワーカーが1回ずつ日本語フォントを読み込む
+- デプロイ後最初のエクスポートが Qt/WebKit の初期化とフォント走査の待ち時間を払わないようにする
+"""
+from __future__ import annotations
+
+import logging
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from . import pdf_metrics
+from .pdf_fonts import provision_fonts
+
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+# 環境変数未設定時の既定パス（見つからない場合は探索結果で置き換える）
+DEFAULT_WKHTMLTOPDF_PATH = str(REPO_ROOT / 'wkhtmltopdf.exe')
+# 動作確認済みの最小バージョン（--read-args-from-stdin・--load-media-error-handling を使用）
+MIN_VERSION = (0, 12, 5)
+
+RENDERER_PENDING = 'pending'
+RENDERER_WARMING = 'warming'
+RENDERER_READY = 'ready'
+RENDERER_FAILED = 'failed'
+
+_VERSION_PATTERN = re.compile(r'wkhtmltopdf\s+(\d+)\.(\d+)\.(\d+)(.*)', re.IGNORECASE)
+# ウォームアップ用の議事録（本文・表・太字で日本語フォントの各ウェイトを読み込ませる）
+_WARMUP_MEETING = {
+    'title': '起動時ウォームアップ',
+    'datetime': '2000-01-01 00:00:00',
+    'participants': ['検証'],
+    'summary': '日本語フォント読み込み',
+}
+_WARMUP_MINUTES = (
+    '<h2>議題</h2><p>本文の<strong>日本語</strong>フォントを読み込みます。</p>'
+    '<table><tr><th>担当</th><th>期限</th></tr><tr><td>田中</td><td>来週</td></tr></table>'
+)
+
+_lock = threading.Lock()
+# 探索前を表す値（探索して見つからなかった場合の None と区別する）
+_UNRESOLVED = object()
+_resolved_path: Any = _UNRESOLVED
+_status: Dict[str, Any] = {'state': RENDERER_PENDING}
+
+
+def _candidates():
+    configured = os.getenv('WKHTMLTOPDF_PATH')
+    if configured:
+        yield configured
+    yield DEFAULT_WKHTMLTOPDF_PATH
+    yield str(REPO_ROOT / '#file:wkhtmltopdf.exe')
+    for name in ('wkhtmltopdf', 'wkhtmltopdf.exe'):
+        found = shutil.which(name)
+        if found:
+            yield found
+
+
+def find_wkhtmltopdf() -> Optional[str]:
+    """候補を順に調べ、最初に見つかった実行ファイルのパスを返す（見つからなければ None）"""
+    for candidate in _candidates():
+        if os.path.isfile(candidate) or shutil.which(candidate):
+            return candidate
+    return None
+
+
+def resolve_wkhtmltopdf(refresh: bool = False) -> Optional[str]:
+    """探索結果を返す（初回または refresh=True の場合のみ探索し、以降は保持した結果を返す）"""
+    global _resolved_path
+    with _lock:
+        if refresh or _resolved_path is _UNRESOLVED:
+            _resolved_path = find_wkhtmltopdf()
+        return _resolved_path
+
+
+def wkhtmltopdf_path() -> str:
+    """レンダリングに使う wkhtmltopdf のパス（見つからない場合は設定値・既定パスのまま返し、実行時エラーにする）"""
+    return resolve_wkhtmltopdf() or os.getenv('WKHTMLTOPDF_PATH') or DEFAULT_WKHTMLTOPDF_PATH
+
+
+def parse_version(output: str) -> Optional[Tuple[Tuple[int, int, int], bool]]:
+    """`wkhtmltopdf --version` の出力から (バージョン, patched Qt か) を取り出す"""
+    match = _VERSION_PATTERN.search(output)
+    if match is None:
+        return None
+    version = tuple(int(match.group(i)) for i in (1, 2, 3))
+    return version, 'patched qt' in match.group(4).lower()
+
+
+def check_version(path: str, timeout: float = 10) -> Tuple[Tuple[int, int, int], bool]:
+    """wkhtmltopdf のバージョンを確認する
+
+    Raises:
+        RuntimeError: 起動できない・バージョンを判別できない・最小バージョン未満の場合
+    """
+    try:
+        proc = subprocess.run([path, '--version'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise RuntimeError(f"wkhtmltopdf could not be started: {e}")
+    parsed = parse_version(proc.stdout.decode('utf-8', errors='ignore'))
+    if proc.returncode != 0 or parsed is None:
+        raise RuntimeError(f"wkhtmltopdf version check failed: {proc.stderr.decode('utf-8', errors='ignore').strip()}")
+    version, patched_qt = parsed
+    if version < MIN_VERSION:
+        raise RuntimeError(
+            f"wkhtmltopdf {'.'.join(map(str, version))} is older than {'.'.join(map(str, MIN_VERSION))}"
+        )
+    return version, patched_qt
+
+
+def renderer_status() -> Dict[str, Any]:
+    """検出・ウォームアップの状態"""
+    with _lock:
+        return dict(_status)
+
+
+def _update_status(**values: Any) -> None:
+    with _lock:
+        _status.update(values)
+
+
+def warm_up_renderer(renders: Optional[int] = None) -> float:
+    """ウォームアップのレンダリングを行い、所要秒数を返す（常駐プールが有効ならワーカー数だけ順に実行する）"""
+    from app.config import get_settings
+    from .minutes_pdf_service import render_minutes_html
+    from .pdf_service import generate_pdf_from_html
+
+    if renders is None:
+        renders = max(1, get_settings().PDF_RENDER_POOL_SIZE)
+    html = render_minutes_html(_WARMUP_MEETING, _WARMUP_MINUTES)
+    started = time.monotonic()
+    for _ in range(renders):
+        generate_pdf_from_html(html, use_header=False, meeting_info=_WARMUP_MEETING)
+    return time.monotonic() - started
+
+
+def initialize_renderer() -> None:
+    """起動時処理: 実行ファイルの解決・バージョン確認・ウォームアップ（失敗してもアプリケーションは起動する）"""
+    path = resolve_wkhtmltopdf(refresh=True)
+    if path is None:
+        logger.error("wkhtmltopdf not found (WKHTMLTOPDF_PATH / repository root / PATH); PDF export will fail")
+        pdf_metrics.increment('renderer.discovery_failed')
+        _update_status(state=RENDERER_FAILED, path=None, error='wkhtmltopdf not found')
+        return
+
+    try:
+        version, patched_qt = check_version(path)
+    except RuntimeError as e:
+        logger.error(f"wkhtmltopdf at {path} is not usable: {e}")
+        pdf_metrics.increment('renderer.discovery_failed')
+        _update_status(state=RENDERER_FAILED, path=path, error=str(e))
+        return
+
+    version_text = '.'.join(map(str, version))
+    if not patched_qt:
+        logger.warning(f"wkhtmltopdf {version_text} is not built with patched Qt; page layout may differ")
+    logger.info(f"wkhtmltopdf resolved: {path} (version {version_text}, patched_qt={patched_qt})")
+    _update_status(state=RENDERER_WARMING, path=path, version=version_text, patched_qt=patched_qt, error=None)
+
+    # 同梱フォントの fontconfig キャッシュはワーカー起動（ウォームアップ）より前に作っておく
+    try:
+        provision_fonts()
+    except Exception as e:
+        logger.error(f"PDF font provisioning failed, rendering with system fonts: {e}")
+        pdf_metrics.increment('pdf_fonts.provisioning_failed')
+
+    from app.config import get_settings
+    if not get_settings().PDF_RENDERER_WARMUP:
+        _update_status(state=RENDERER_READY, warmup_seconds=None)
+        return
+    try:
+        seconds = warm_up_renderer()
+    except Exception as e:
+        logger.error(f"wkhtmltopdf warm-up render failed: {e}")
+        pdf_metrics.increment('renderer.warmup_failed')
+        _update_status(state=RENDERER_FAILED, error=f"warm-up render failed: {e}")
+        return
+    logger.info(f"wkhtmltopdf warm-up finished in {seconds:.2f}s")
+    _update_status(state=RENDERER_READY, warmup_seconds=round(seconds, 3))
+
+
+def start_renderer_initialization() -> threading.Thread:
+    """起動時処理をバックグラウンドで開始する（完了までレディネスは 503）"""
+    pdf_metrics.register_provider('renderer', renderer_status)
+    thread = threading.Thread(target=initialize_renderer, name='pdf-renderer-init', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,275 @@
+"""wkhtmltopdf 常駐レンダラープール
+
+責務: `--read-args-from-stdin` モードで起動した wkhtmltopdf プロセスを常駐させ、
+Qt/WebKit の初期化やフォント走査をジョブごとに払わずに PDF を生成する。
+
+- ワーカーは標準入力の1行を1ジョブ（コマンドライン引数）として処理する
+- 完了は標準エラーの "Done" 行で検知する。"Done" を出さずに失敗するジョブもあるため、エラー・終了コードの
+  行（"Error:" / "Exit with code"）が出た場合は FAILURE_GRACE_SECONDS だけ "Done" を待ち、来なければ
+  失敗とする（タイムアウトまで待たない）
+- 規定ジョブ数を超えたワーカー、異常終了・タイムアウトしたワーカーは再起動する
+- 空きワーカーを IDLE_WAIT_SECONDS 待っても得られない場合は RendererBusyError とし、呼び出し側は
+  単発プロセスで生成する
+"""
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+from typing import List, Optional
+
+from .pdf_fonts import provision_fonts, renderer_env
+from .render_cancel import on_cancel
+
+logger = logging.getLogger(__name__)
+
+# エラー・終了コードの行が出てから "Done" を待つ秒数
+FAILURE_GRACE_SECONDS = 1.0
+# 空きワーカーを待つ秒数（超えた場合は単発プロセスで生成する）
+IDLE_WAIT_SECONDS = 2.0
+
+_FAILURE_PREFIXES = ('Error:', 'Exit with code')
+
+
+class RendererWorkerError(RuntimeError):
+    """常駐ワーカーでのレンダリング失敗（ワーカーは破棄される）"""
+
+
+class RendererBusyError(RendererWorkerError):
+    """空きワーカーが得られなかった（ワーカーはそのまま）"""
+
+
+class RendererTimeoutError(RendererWorkerError):
+    """ジョブがタイムアウトした（ワーカーは破棄される）"""
+
+
+def _format_args_line(args: List[str]) -> str:
+    """wkhtmltopdf の標準入力用に引数を1行へ整形する
+
+    wkhtmltopdf はバックスラッシュをエスケープとして解釈するため、
+    Windows パスはスラッシュ区切りに変換し、空白を含む引数は引用符で囲む。
+    """
+    parts = []
+    for arg in args:
+        if os.sep == '\\':
+            arg = arg.replace('\\', '/')
+        if any(ch.isspace() for ch in arg):
+            arg = '"' + arg.replace('"', '\\"') + '"'
+        parts.append(arg)
+    return ' '.join(parts) + '\n'
+
+
+class WkhtmltopdfWorker:
+    """1つの常駐 wkhtmltopdf プロセス"""
+
+    def __init__(self, executable: str):
+        self.executable = executable
+        self.jobs_done = 0
+        self._events: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._proc = subprocess.Popen(
+            [executable, '--read-args-from-stdin'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            env=renderer_env(),
+        )
+        self._reader = threading.Thread(target=self._read_stderr, daemon=True)
+        self._reader.start()
+        logger.info(f"Renderer worker started: pid={self._proc.pid}")
+
+    def _read_stderr(self) -> None:
+        """標準エラーを行単位で読み取りイベントキューへ流す（EOF で None）"""
+        try:
+            for raw in iter(self._proc.stderr.readline, b''):
+                # 進捗バーは \r で上書きされるため最後のセグメントのみ見る
+                line = raw.decode('utf-8', errors='ignore').split('\r')[-1].strip()
+                if line:
+                    self._events.put(line)
+        finally:
+            self._events.put(None)
+
+    def is_alive(self) -> bool:
+        return self._proc.poll() is None
+
+    def render(self, args: List[str], timeout: float) -> None:
+        """引数1行分のジョブを実行し、完了まで待機する
+
+        Raises:
+            RendererWorkerError: プロセス終了・タイムアウト時
+        """
+        # 前ジョブの残りイベントを捨てる
+        while True:
+            try:
+                self._events.get_nowait()
+            except queue.Empty:
+                break
+
+        try:
+            self._proc.stdin.write(_format_args_line(args).encode('utf-8'))
+            self._proc.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise RendererWorkerError(f"renderer worker is not accepting jobs: {e}")
+
+        deadline = time.monotonic() + timeout
+        messages: List[str] = []
+        failed = False
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                if failed:
+                    raise RendererWorkerError(f"renderer worker job failed: {' / '.join(messages[-5:])}")
+                raise RendererTimeoutError(f"renderer worker timed out after {timeout}s")
+            try:
+                line = self._events.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if line is None:
+                raise RendererWorkerError(f"renderer worker exited: {' / '.join(messages[-5:])}")
+            if line.startswith('Done'):
+                self.jobs_done += 1
+                if any(m.startswith('Exit with code') for m in messages):
+                    raise RendererWorkerError(f"renderer worker job failed: {' / '.join(messages[-5:])}")
+                return
+            messages.append(line)
+            if line.startswith(_FAILURE_PREFIXES) and not failed:
+                # 失敗しても "Done" が出ない場合があるため、短時間だけ待つ
+                failed = True
+                deadline = min(deadline, time.monotonic() + FAILURE_GRACE_SECONDS)
+
+    def abort(self) -> None:
+        """実行中のジョブを中止させる（別スレッドから呼ばれる。後始末は render 側の失敗処理で行う）"""
+        try:
+            self._proc.kill()
+        except Exception:
+            pass
+
+    def kill(self) -> None:
+        try:
+            self._proc.kill()
+            self._proc.wait(timeout=5)
+        except Exception:
+            pass
+        for stream in (self._proc.stdin, self._proc.stderr):
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+
+class RendererPool:
+    """事前起動済み wkhtmltopdf ワーカーのプール"""
+
+    def __init__(self, executable: str, size: int, max_jobs_per_worker: int):
+        self.executable = executable
+        self.size = size
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self._idle: "queue.Queue[WkhtmltopdfWorker]" = queue.Queue()
+        self._closed = False
+        for _ in range(size):
+            self._idle.put(WkhtmltopdfWorker(executable))
+
+    def render(self, args: List[str], timeout: float) -> None:
+        """空きワーカーでジョブを実行する
+
+        Args:
+            args: wkhtmltopdf の引数（実行ファイルパスを除く）
+            timeout: 空きワーカー待ちを含めたタイムアウト秒数
+
+        Raises:
+            RendererBusyError: 空きワーカーが得られない場合
+            RendererTimeoutError: ジョブがタイムアウトした場合
+            RendererWorkerError: ワーカーでのレンダリングに失敗した場合
+        """
+        started = time.monotonic()
+        wait = min(timeout, IDLE_WAIT_SECONDS)
+        try:
+            worker = self._idle.get(timeout=wait)
+        except queue.Empty:
+            raise RendererBusyError(f"no renderer worker became available within {wait}s")
+
+        healthy = False
+        try:
+            # リクエストが取り消された場合はワーカーごと終了させる（プールが再起動する）
+            with on_cancel(worker.abort):
+                worker.render(args, timeout=max(timeout - (time.monotonic() - started), 1))
+            healthy = True
+        finally:
+            self._release(worker, healthy)
+
+    def _release(self, worker: WkhtmltopdfWorker, healthy: bool) -> None:
+        """ワーカーをプールへ戻す（必要に応じて再起動）"""
+        if healthy and worker.is_alive() and worker.jobs_done < self.max_jobs_per_worker:
+            self._idle.put(worker)
+            return
+
+        reason = 'recycle' if healthy else 'failure'
+        logger.info(f"Renderer worker replaced ({reason}, jobs={worker.jobs_done})")
+        worker.kill()
+        if self._closed:
+            return
+        try:
+            self._idle.put(WkhtmltopdfWorker(self.executable))
+        except Exception as e:
+            # 起動できない場合はプールが縮退する（残りのワーカーで処理を継続）
+            logger.error(f"Renderer worker restart failed: {e}")
+
+    def shutdown(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().kill()
+            except queue.Empty:
+                break
+
+
+_pool: Optional[RendererPool] = None
+_pool_lock = threading.Lock()
+_pool_disabled = False
+
+
+def get_renderer_pool(executable: str) -> Optional[RendererPool]:
+    """プロセス共通のレンダラープールを取得（無効・起動不可の場合は None）"""
+    global _pool, _pool_disabled
+    if _pool is not None or _pool_disabled:
+        return _pool
+
+    with _pool_lock:
+        if _pool is not None or _pool_disabled:
+            return _pool
+
+        from app.config import get_settings
+        settings = get_settings()
+        size = settings.PDF_RENDER_POOL_SIZE
+        if size <= 0:
+            _pool_disabled = True
+            return None
+        if not (os.path.isfile(executable) or shutil.which(executable)):
+            logger.warning(f"Renderer pool disabled: wkhtmltopdf not found at {executable}")
+            _pool_disabled = True
+            return None
+        # ワーカーは起動時の環境変数を使い続けるため、同梱フォントの fontconfig 設定を先に作る
+        # （起動時処理の完了前にリクエストが来た場合も古い設定のワーカーを残さない）
+        try:
+            provision_fonts()
+        except Exception as e:
+            logger.error(f"PDF font provisioning failed, renderer workers use system fonts: {e}")
+        try:
+            _pool = RendererPool(executable, size, settings.PDF_RENDER_WORKER_MAX_JOBS)
+            logger.info(f"Renderer pool started: size={size}")
+        except Exception as e:
+            logger.error(f"Renderer pool start failed, falling back to per-request processes: {e}")
+            _pool_disabled = True
+        return _pool
+
+
+def shutdown_renderer_pool() -> None:
+    """アプリケーション終了時にワーカーを停止する"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
@@ -0,0 +1,155 @@
+"""reportlab 用日本語フォントとスタイルシートのレジストリ
+
+責務: PdfExportService の reportlab フォールバックで使う日本語フォントをプロセス内で1回だけ探索・登録し、
+そのフォントを使うスタイルシートも1回だけ生成して全リクエストで共有する。
+機密レベルのスタンプ（pdf_stamp）も同じフォントを使う。
+
+- 探索順: 同梱フォント（PDF_FONT_DIR）→ Windows → macOS → Linux のフォントディレクトリ
+- reportlab の TTFont は TrueType アウトラインのみ対応（CFF の .otf や Noto Sans CJK の .ttc は不可）。
+  TTFont は使用した文字だけを埋め込む（サブセット化）ため、大きな TTC でも PDF は肥大化しない
+- 使える TrueType フォントがない場合は埋め込み不要の CID フォント（HeiseiKakuGo-W5）を使う
+  （Helvetica では日本語が表示できないため）
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Iterator, List, Optional, Tuple
+
+from reportlab.lib.styles import ParagraphStyle, StyleSheet1, getSampleStyleSheet
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+from reportlab.pdfbase.ttfonts import TTFont
+
+from . import pdf_metrics
+
+logger = logging.getLogger(__name__)
+
+# (フォントファイル, 登録名)。TTC は先頭のフォント（ゴシック体）を使う
+WINDOWS_FONTS = [
+    ('C:/Windows/Fonts/msgothic.ttc', 'MS Gothic'),
+    ('C:/Windows/Fonts/yugothic.ttc', 'Yu Gothic'),
+    ('C:/Windows/Fonts/meiryo.ttc', 'Meiryo'),
+    ('C:/Windows/Fonts/msmincho.ttc', 'MS Mincho'),
+    ('C:/Windows/Fonts/msgothic.ttf', 'MS Gothic'),
+    ('C:/Windows/Fonts/yugothic.ttf', 'Yu Gothic'),
+    ('C:/Windows/Fonts/meiryo.ttf', 'Meiryo'),
+]
+MACOS_FONTS = [
+    ('/System/Library/Fonts/ヒラギノ角ゴシック W3.ttc', 'Hiragino Sans'),
+    ('/Library/Fonts/Osaka.ttf', 'Osaka'),
+]
+# Linux はディレクトリを1回走査してファイル名で探す（優先順）
+LINUX_FONT_DIRS = ('/usr/share/fonts', '/usr/local/share/fonts', os.path.expanduser('~/.fonts'))
+LINUX_FONT_FILES = [
+    ('ipaexg.ttf', 'IPAexGothic'),
+    ('ipag.ttf', 'IPAGothic'),
+    ('TakaoPGothic.ttf', 'TakaoPGothic'),
+    ('TakaoGothic.ttf', 'TakaoGothic'),
+    ('VL-Gothic-Regular.ttf', 'VL Gothic'),
+    ('fonts-japanese-gothic.ttf', 'Japanese Gothic'),
+    ('NotoSansJP-Regular.ttf', 'Noto Sans JP'),
+]
+# TrueType フォントが見つからない場合の CID フォント
+CID_FALLBACK_FONT = 'HeiseiKakuGo-W5'
+
+_lock = threading.Lock()
+_font_name: Optional[str] = None
+_stylesheet: Optional[StyleSheet1] = None
+_stats: dict = {}
+
+
+def _linux_candidates() -> List[Tuple[str, str]]:
+    wanted = dict(LINUX_FONT_FILES)
+    found = {}
+    for directory in LINUX_FONT_DIRS:
+        if not os.path.isdir(directory):
+            continue
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if name in wanted and name not in found:
+                    found[name] = os.path.join(root, name)
+    return [(found[name], label) for name, label in LINUX_FONT_FILES if name in found]
+
+
+def _bundled_candidates() -> List[Tuple[str, str]]:
+    from app.config import get_settings
+    font_dir = get_settings().PDF_FONT_DIR
+    if not font_dir or not os.path.isdir(font_dir):
+        return []
+    from .pdf_fonts import scan_font_dir
+    return [(face.path, face.family) for face in scan_font_dir(font_dir)
+            if face.weight == 400 and face.path.lower().endswith(('.ttf', '.ttc'))]
+
+
+def font_candidates() -> Iterator[Tuple[str, str]]:
+    """登録を試みる (フォントファイル, 登録名) を優先順に返す"""
+    yield from _bundled_candidates()
+    if os.name == 'nt':
+        yield from WINDOWS_FONTS
+    else:
+        yield from MACOS_FONTS
+        yield from _linux_candidates()
+
+
+def _register_font() -> Tuple[str, Optional[str]]:
+    for path, name in font_candidates():
+        if not os.path.isfile(path):
+            continue
+        try:
+            # TTC の場合は先頭のフォントを使う。使用文字のみサブセットとして埋め込まれる
+            pdfmetrics.registerFont(TTFont(name, path, subfontIndex=0))
+            return name, path
+        except Exception as e:
+            logger.warning(f"reportlab font registration failed for {path}: {e}")
+    logger.warning(f"No TrueType Japanese font found; using CID font {CID_FALLBACK_FONT}")
+    pdfmetrics.registerFont(UnicodeCIDFont(CID_FALLBACK_FONT))
+    return CID_FALLBACK_FONT, None
+
+
+def get_reportlab_font() -> str:
+    """登録済みの日本語フォント名（初回のみ探索・登録する）"""
+    global _font_name
+    if _font_name is None:
+        with _lock:
+            if _font_name is None:
+                started = time.monotonic()
+                name, path = _register_font()
+                _stats.update(font=name, path=path, discovery_seconds=round(time.monotonic() - started, 3))
+                pdf_metrics.register_provider('reportlab_fonts', lambda: dict(_stats))
+                logger.info(f"reportlab Japanese font registered: {_stats}")
+                _font_name = name
+    return _font_name
+
+
+def _build_stylesheet(font_name: str) -> StyleSheet1:
+    styles = getSampleStyleSheet()
+    # カスタムスタイルを追加（日本語フォント対応）
+    styles.add(ParagraphStyle(name='CustomHeading1', parent=styles['Heading1'], fontName=font_name,
+                              fontSize=16, spaceAfter=12))
+    styles.add(ParagraphStyle(name='CustomHeading2', parent=styles['Heading2'], fontName=font_name,
+                              fontSize=14, spaceAfter=10))
+    styles.add(ParagraphStyle(name='CustomHeading3', parent=styles['Heading3'], fontName=font_name,
+                              fontSize=12, spaceAfter=8))
+    # 通常テキスト用のスタイルも日本語フォントに設定
+    styles.add(ParagraphStyle(name='JapaneseNormal', parent=styles['Normal'], fontName=font_name,
+                              fontSize=10, spaceAfter=6))
+    # _process_element が h4〜h6 に使うサンプルの見出しも日本語フォントにする（このスタイルシートはプロセス専用）
+    for level in (4, 5, 6):
+        styles[f'Heading{level}'].fontName = font_name
+    styles.add(ParagraphStyle(name='JapaneseQuote', parent=styles['Italic'], fontName=font_name,
+                              fontSize=10, leftIndent=20, spaceAfter=6))
+    return styles
+
+
+def get_reportlab_stylesheet() -> StyleSheet1:
+    """日本語フォントを使う共有スタイルシート（初回のみ生成、呼び出し側で変更しないこと）"""
+    global _stylesheet
+    if _stylesheet is None:
+        font_name = get_reportlab_font()
+        with _lock:
+            if _stylesheet is None:
+                _stylesheet = _build_stylesheet(font_name)
+    return _stylesheet
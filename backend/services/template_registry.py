@@ -0,0 +1,103 @@
+"""PDFテンプレート・アセットレジストリ
+
+責務: PDF 生成で使う Jinja2 環境・コンパイル済みテンプレート・CSS などの
+アセットをプロセス内で一度だけ読み込み、全 PDF 生成経路で共有する。
+
+- テンプレートは Jinja2 の auto_reload によりファイル更新時刻の変化で再コンパイルされる
+- アセット（pdf.css など）も更新時刻・サイズが変わった時のみ読み直す（開発中のホットエディット対応）
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from jinja2 import Environment, FileSystemLoader, Template, select_autoescape
+
+# templates directory (backend/services/ -> backend/templates/)
+TEMPLATES_DIR = Path(__file__).resolve().parents[1] / 'templates'
+
+# キャッシュキー（テンプレート版）に含めるファイル
+VERSIONED_FILES = ('meeting_minutes.html', 'pdf.css')
+
+_lock = threading.Lock()
+_env: Optional[Environment] = None
+_assets: Dict[str, Tuple[Tuple[int, int], str]] = {}
+_version_memo: Dict[tuple, str] = {}
+
+
+def process_line_breaks(text) -> str:
+    """改行処理のカスタムフィルタ（\\n と /n の両方に対応）"""
+    if not text:
+        return ''
+    return str(text).replace('\\n', '<br/>').replace('/n', '<br/>').replace('\n', '<br/>')
+
+
+def get_environment() -> Environment:
+    """共有 Jinja2 環境を取得（初回のみ生成）"""
+    global _env
+    if _env is None:
+        with _lock:
+            if _env is None:
+                if not TEMPLATES_DIR.exists():
+                    raise FileNotFoundError(f"Templates directory not found: {TEMPLATES_DIR}")
+                env = Environment(
+                    loader=FileSystemLoader(str(TEMPLATES_DIR)),
+                    autoescape=select_autoescape(['html', 'xml']),
+                    auto_reload=True,
+                )
+                env.filters['process_line_breaks'] = process_line_breaks
+                _env = env
+    return _env
+
+
+def get_template(name: str) -> Template:
+    """コンパイル済みテンプレートを取得（ファイル更新時は自動で再コンパイル）"""
+    return get_environment().get_template(name)
+
+
+def _stat_key(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def get_asset_text(name: str) -> str:
+    """テンプレートディレクトリのテキストアセットを取得（存在しない場合は空文字列）"""
+    path = TEMPLATES_DIR / name
+    stamp = _stat_key(path)
+    if stamp is None:
+        return ''
+
+    cached = _assets.get(name)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    try:
+        text = path.read_text(encoding='utf-8')
+    except Exception:
+        return ''
+    with _lock:
+        _assets[name] = (stamp, text)
+    return text
+
+
+def asset_version() -> str:
+    """テンプレート・CSS の内容ハッシュ（キャッシュキー用、更新時刻が変わった時のみ再計算）"""
+    stamps = tuple((name, _stat_key(TEMPLATES_DIR / name)) for name in VERSIONED_FILES)
+
+    version = _version_memo.get(stamps)
+    if version is None:
+        digest = hashlib.sha256()
+        for name, stamp in stamps:
+            if stamp is not None:
+                digest.update(name.encode('utf-8'))
+                digest.update((TEMPLATES_DIR / name).read_bytes())
+        version = digest.hexdigest()[:16]
+        with _lock:
+            _version_memo.clear()
+            _version_memo[stamps] = version
+    return version
@@ -10,9 +10,18 @@ from io import BytesIO
 import logging
 from typing import Dict, Any
 
+from .cpu_pool import run_cpu_task
+
 logger = logging.getLogger(__name__)
 
 
+def html_to_text(minutes_html: str) -> str:
+    """HTMLからテキストを抽出（プロセスプールから呼べるようトップレベル関数とする）"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(minutes_html, 'html.parser')
+    return soup.get_text(separator='\n', strip=True)
+
+
 class WordDocumentService:
     """Wordドキュメント生成サービス"""
 
@@ -118,11 +127,8 @@ class WordDocumentService:
             Wordファイルのバイトデータ
         """
         try:
-            from bs4 import BeautifulSoup
-            
-            # HTMLからテキストを抽出
-            soup = BeautifulSoup(minutes_html, 'html.parser')
-            text_content = soup.get_text(separator='\n', strip=True)
+            # HTMLからテキストを抽出（大きな議事録は別プロセスで実行）
+            text_content = run_cpu_task(html_to_text, minutes_html, size=len(minutes_html or ''))
             
             return WordDocumentService.create_document_from_text(text_content, meeting_info)
             
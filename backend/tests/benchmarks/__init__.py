@@ -0,0 +1,6 @@
+"""
+ベンチマークパッケージ
+
+PDF生成パイプラインの性能比較用スクリプト（pytest の収集対象外）
+実行例: cd backend && python -m tests.benchmarks.bench_template_render
+"""
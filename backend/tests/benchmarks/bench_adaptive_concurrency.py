@@ -0,0 +1,92 @@
+"""
+レンダリング同時実行数の自動調整のベンチマーク
+
+コア数 cores のホストを「同時実行数が cores を超えると1件あたりの時間が比例して延びる」モデルで模擬し
+（レンダリングは time.sleep）、固定の同時実行数（PDF_RENDER_MAX_CONCURRENCY の既定値 2）と自動調整とで
+スループット・所要時間（待ち + 実行）の p95・最終的な上限を比較する。
+
+実行: cd backend && python -m tests.benchmarks.bench_adaptive_concurrency [レンダリング秒数]
+wkhtmltopdf は不要。
+"""
+
+import asyncio
+import sys
+import threading
+import time
+
+from services.render_executor import PRIORITY_BATCH, RenderExecutor
+from services.render_limiter import AdaptiveLimiter
+
+FIXED_LIMIT = 2
+REQUESTS = 240
+
+
+def percentile(values, ratio):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * ratio))]
+
+
+class SimulatedHost:
+    """同時実行数がコア数を超えると処理時間が延びるホスト"""
+
+    def __init__(self, cores: int, render_seconds: float):
+        self.cores = cores
+        self.render_seconds = render_seconds
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def render(self, limiter):
+        with self._lock:
+            self.in_flight += 1
+            contention = max(1.0, self.in_flight / self.cores)
+        try:
+            if limiter is None:
+                time.sleep(self.render_seconds * contention)
+            else:
+                with limiter.track():
+                    time.sleep(self.render_seconds * contention)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+async def simulate(cores: int, render_seconds: float, adaptive: bool) -> dict:
+    host = SimulatedHost(cores, render_seconds)
+    limiter = None
+    if adaptive:
+        # メモリは常に十分にある想定
+        limiter = AdaptiveLimiter(FIXED_LIMIT, min_limit=1, max_limit=cores * 4, memory_probe=lambda: 0.5)
+    executor = RenderExecutor(
+        cores * 4 if adaptive else FIXED_LIMIT, max_queue=REQUESTS, queue_timeout=600,
+        limit_provider=limiter.current_limit if limiter else None,
+    )
+    latencies = []
+
+    async def request():
+        started = time.monotonic()
+        await executor.run(host.render, limiter, priority=PRIORITY_BATCH)
+        latencies.append(time.monotonic() - started)
+
+    started = time.monotonic()
+    try:
+        await asyncio.gather(*(request() for _ in range(REQUESTS)))
+    finally:
+        executor.shutdown()
+    return {
+        'throughput': REQUESTS / (time.monotonic() - started),
+        'p95': percentile(latencies, 0.95),
+        'limit': limiter.current_limit() if limiter else FIXED_LIMIT,
+    }
+
+
+def main() -> None:
+    render_seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 0.05
+    for cores in (1, 4, 16):
+        for label, adaptive in (('fixed   ', False), ('adaptive', True)):
+            result = asyncio.run(simulate(cores, render_seconds, adaptive))
+            print(f"cores={cores:2d} {label} throughput={result['throughput']:6.1f}/s "
+                  f"p95={result['p95']:5.2f}s final_limit={result['limit']}")
+
+
+if __name__ == '__main__':
+    main()
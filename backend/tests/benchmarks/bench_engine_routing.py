@@ -0,0 +1,93 @@
+"""
+レンダリングエンジン振り分け（PDF_ENGINE_ROUTING）のスループットベンチマーク
+
+実運用に近い構成比の議事録コーパス（段落・表のみ / 太字入り / 画像入り / action-item 入り）を、
+全件 wkhtmltopdf で PDF 化した場合と、複雑さに応じて reportlab と振り分けた場合とで処理し、
+reportlab に振り分けられた割合と文書数/秒を比較する。キャッシュは使わない。
+
+実行: cd backend && python -m tests.benchmarks.bench_engine_routing [文書数] [PDF_REPORTLAB_MAX_SCORE]
+wkhtmltopdf（WKHTMLTOPDF_PATH）と日本語フォントが必要。
+実機の wkhtmltopdf での計測結果はまだない（スタブでの実行結果はレイアウト処理を含まないため比較に使えない）。
+"""
+
+import random
+import sys
+import time
+from collections import Counter
+from datetime import date
+
+from services.minutes_pdf_service import normalize_meeting, render_minutes_html
+from services.pdf_engine import assess_complexity, render_minutes_reportlab
+from services.pdf_service import generate_pdf_from_html
+
+MEETING = normalize_meeting({
+    '会議タイトル': '週次定例会議',
+    '会議日時': '2025-01-01 10:00:00',
+    '参加者': ['田中太郎', '佐藤花子', '鈴木一郎'],
+    '要約': 'エンジン振り分けの比較用データ',
+    '議事録No': 'BENCH-ENGINE',
+})
+PIXEL = 'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=='
+
+
+def agenda(i: int, kind: str) -> str:
+    emphasis = '<strong>進捗</strong>' if kind == 'bold' else '進捗'
+    html = (f'<h2>議題 {i + 1}</h2><p>本議題について{emphasis}の報告があり、対応方針を確認した。</p>'
+            '<ul><li>課題の整理</li><li>次回までの対応</li></ul>'
+            '<table><tr><th>担当</th><th>期限</th></tr><tr><td>田中</td><td>来週</td></tr></table>')
+    if kind == 'image' and i == 0:
+        html += f'<p><img src="{PIXEL}" width="200"></p>'
+    if kind == 'action':
+        html += '<p class="action-item">資料を更新する</p>'
+    return html
+
+
+# (種類, 構成比)。社内の議事録は段落・表のみの単純なものが大半
+CORPUS_MIX = [('plain', 0.6), ('bold', 0.2), ('image', 0.1), ('action', 0.1)]
+
+
+def build_corpus(count: int):
+    rng = random.Random(0)
+    kinds = rng.choices([k for k, _ in CORPUS_MIX], weights=[w for _, w in CORPUS_MIX], k=count)
+    return [(kind, ''.join(agenda(i, kind) for i in range(rng.randint(3, 12)))) for kind in kinds]
+
+
+def render_wkhtmltopdf(body: str) -> bytes:
+    html = render_minutes_html(MEETING, body, now='2025-01-01')
+    return generate_pdf_from_html(html, use_header=False, meeting_info=MEETING, creation_date=date(2025, 1, 1))
+
+
+def run(corpus, max_score):
+    engines = Counter()
+    started = time.perf_counter()
+    for _, body in corpus:
+        complexity = assess_complexity(body)
+        if max_score is not None and not complexity.blockers and complexity.score <= max_score:
+            engines['reportlab'] += 1
+            render_minutes_reportlab(MEETING, body, date(2025, 1, 1))
+        else:
+            engines['wkhtmltopdf'] += 1
+            render_wkhtmltopdf(body)
+    return time.perf_counter() - started, engines
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    max_score = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    corpus = build_corpus(count)
+    print(f"corpus: {count} docs {dict(Counter(kind for kind, _ in corpus))}")
+
+    # フォント登録・テンプレート読み込み等の初回コストを計測から除く
+    render_minutes_reportlab(MEETING, corpus[0][1])
+    render_wkhtmltopdf(corpus[0][1])
+
+    baseline_seconds, _ = run(corpus, None)
+    print(f"all wkhtmltopdf: {count / baseline_seconds:7.2f} docs/s")
+    seconds, engines = run(corpus, max_score)
+    print(f"routed         : {count / seconds:7.2f} docs/s  reportlab={engines['reportlab'] / count:.0%} "
+          f"(max score {max_score})")
+    print(f"speedup={baseline_seconds / seconds:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+同梱フォント設定（PDF_FONT_DIR）の前後比較ベンチマーク
+
+同じ議事録を、OS のフォントのまま（fontconfig のフォールバック探索）と、同梱フォントの
+@font-face 別名 + 事前作成した fontconfig キャッシュを使った場合とで wkhtmltopdf の単発プロセスで
+PDF 化し、所要時間（中央値）・PDF サイズ・埋め込まれたフォントを比較する。
+
+実行: cd backend && python -m tests.benchmarks.bench_font_provisioning <フォントディレクトリ> [回数]
+wkhtmltopdf（WKHTMLTOPDF_PATH）と日本語フォント（例: Noto Sans JP の .otf/.ttf）が必要。
+実機の wkhtmltopdf での計測結果はまだないため、所要時間の改善は未確認（同梱フォントの既定は無効のまま）。
+"""
+
+import io
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from pypdf import PdfReader
+
+from services.minutes_pdf_service import normalize_meeting, render_minutes_html
+from services.pdf_fonts import FontProvisioning, get_font_provisioning
+from services.pdf_service import _prepare_render
+
+MEETING = normalize_meeting({
+    '会議タイトル': '週次定例会議',
+    '会議日時': '2025-01-01 10:00:00',
+    '参加者': ['田中太郎', '佐藤花子'],
+    '要約': 'フォント設定の比較用データ',
+    '議事録No': 'BENCH-FONT',
+})
+MINUTES_HTML = ''.join(
+    f'<h2>議題 {i + 1}</h2><p>本議題について<strong>進捗</strong>の報告があり、対応方針を確認した。</p>'
+    '<table><tr><th>担当</th><th>期限</th></tr><tr><td>田中</td><td>来週</td></tr></table>'
+    for i in range(10)
+)
+
+
+def embedded_fonts(pdf_bytes: bytes) -> str:
+    names = set()
+    for page in PdfReader(io.BytesIO(pdf_bytes)).pages:
+        fonts = page.get('/Resources', {}).get('/Font', {})
+        for font in fonts.values():
+            names.add(str(font.get_object().get('/BaseFont')))
+    return ', '.join(sorted(names))
+
+
+def render(html: str, env, runs: int):
+    cmd, html_bytes, _ = _prepare_render(html, '社外秘', MEETING, None, None)
+    seconds = []
+    pdf = b''
+    for _ in range(runs):
+        started = time.perf_counter()
+        proc = subprocess.run(cmd + ['-', '-'], input=html_bytes, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              env=env, timeout=120)
+        seconds.append(time.perf_counter() - started)
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.decode(errors='ignore'))
+        pdf = proc.stdout
+    return statistics.median(seconds), pdf
+
+
+def main() -> None:
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    font_dir = sys.argv[1]
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    html = render_minutes_html(MEETING, MINUTES_HTML, now='2025-01-01')
+
+    # 比較の前後はここで明示的に組み立てるため、設定側の同梱フォントは無効にしておく
+    if get_font_provisioning() is not None:
+        sys.exit('PDF_FONT_DIR を空にして実行してください')
+    baseline_seconds, baseline_pdf = render(html, None, runs)
+    print(f"system fonts : {baseline_seconds:6.3f} s  {len(baseline_pdf) / 1024:8.1f} KB  "
+          f"fonts=[{embedded_fonts(baseline_pdf)}]")
+
+    with tempfile.TemporaryDirectory(prefix='pdf-fontconfig-') as cache_dir:
+        provisioning = FontProvisioning(font_dir, cache_dir)
+        started = time.perf_counter()
+        provisioning.build_cache()
+        print(f"fontconfig cache built in {time.perf_counter() - started:.2f} s (family: {provisioning.family})")
+        seconds, pdf = render(provisioning.apply_css(html), provisioning.env(), runs)
+        print(f"bundled fonts: {seconds:6.3f} s  {len(pdf) / 1024:8.1f} KB  fonts=[{embedded_fonts(pdf)}]")
+        print(f"speedup={baseline_seconds / seconds:.2f}x  size={len(pdf) / len(baseline_pdf):.2f}x")
+
+
+if __name__ == '__main__':
+    main()
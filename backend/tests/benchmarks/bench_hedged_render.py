@@ -0,0 +1,63 @@
+"""
+レンダリングのヘッジ実行のベンチマーク
+
+通常は render_seconds 秒で終わるが、stall_ratio の割合で stall_seconds 秒止まるレンダリングを
+サブプロセス（time.sleep する Python）で模擬し、ヘッジなし・ありで所要時間の p50/p95/p99/最大を比較する。
+止まるかどうかは起動ごとに独立に決まる（fontconfig・画像読み込みでの一時的な停止を想定）。
+
+実行: cd backend && python -m tests.benchmarks.bench_hedged_render [要求数] [停止する割合]
+wkhtmltopdf は不要。
+"""
+
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from services.pdf_hedge import Hedger
+from services.render_cancel import run_process
+
+RENDER_SECONDS = 0.1
+STALL_SECONDS = 2.0
+
+
+def percentile(values, ratio):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * ratio))]
+
+
+def simulate(requests: int, stall_ratio: float, hedger) -> list:
+    rng = random.Random(0)
+
+    def render():
+        seconds = STALL_SECONDS if rng.random() < stall_ratio else RENDER_SECONDS
+        run_process([sys.executable, '-c', f'import time; time.sleep({seconds})'], b'', subprocess.DEVNULL, 30)
+        return b'%PDF'
+
+    latencies = []
+    for _ in range(requests):
+        started = time.monotonic()
+        if hedger is None:
+            render()
+        else:
+            hedger.run(render)
+        latencies.append(time.monotonic() - started)
+    return latencies
+
+
+def main() -> None:
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 80
+    stall_ratio = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    for label, hedger in (('plain ', None), ('hedged', Hedger(50, lambda: 2, min_samples=10))):
+        started = time.monotonic()
+        latencies = simulate(requests, stall_ratio, hedger)
+        total = time.monotonic() - started
+        extra = f"  hedges={hedger.stats()['launched']} won={hedger.stats()['won']}" if hedger else ''
+        print(f"{label} total={total:5.1f}s p50={statistics.median(latencies):5.2f}s "
+              f"p95={percentile(latencies, 0.95):5.2f}s p99={percentile(latencies, 0.99):5.2f}s "
+              f"max={max(latencies):5.2f}s{extra}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+優先度付きレンダリング実行器のベンチマーク
+
+一括出力（batch）とメール送信（mail）が実行器を埋めている間に対話的なダウンロード（interactive）が
+到着する状況を、レンダリングを time.sleep で模擬して再現し、全要求を同じクラスで扱った場合（到着順）と
+優先度クラスを付けた場合とで、クラスごとの所要時間（待ち + 実行）の p50/p95 を比較する。
+
+実行: cd backend && python -m tests.benchmarks.bench_render_priority [同時実行数] [レンダリング秒数]
+wkhtmltopdf は不要。
+"""
+
+import asyncio
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+from services.render_executor import (
+    PRIORITY_BATCH, PRIORITY_INTERACTIVE, PRIORITY_MAIL, RenderExecutor,
+)
+
+# (クラス, 要求数, 到着間隔の平均秒数)。一括出力は開始直後にまとめて投入される
+WORKLOAD = [(PRIORITY_BATCH, 40, 0.0), (PRIORITY_MAIL, 15, 0.15), (PRIORITY_INTERACTIVE, 20, 0.12)]
+
+
+def percentile(values, ratio):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * ratio))]
+
+
+async def simulate(concurrency: int, render_seconds: float, prioritized: bool) -> dict:
+    executor = RenderExecutor(
+        concurrency, max_queue=200, queue_timeout=600,
+        class_limits={PRIORITY_MAIL: max(1, concurrency // 2), PRIORITY_BATCH: max(1, concurrency // 2)},
+        starvation_seconds=10,
+    )
+    rng = random.Random(0)
+    latencies = defaultdict(list)
+
+    async def request(kind: str, delay: float):
+        await asyncio.sleep(delay)
+        started = time.monotonic()
+        jitter = render_seconds * rng.uniform(0.7, 1.3)
+        await executor.run(time.sleep, jitter, priority=kind if prioritized else PRIORITY_INTERACTIVE)
+        latencies[kind].append(time.monotonic() - started)
+
+    tasks = []
+    for kind, count, interval in WORKLOAD:
+        arrival = 0.0
+        for _ in range(count):
+            tasks.append(request(kind, arrival))
+            arrival += rng.expovariate(1 / interval) if interval else 0
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        executor.shutdown()
+    return latencies
+
+
+def main() -> None:
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    render_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+    for label, prioritized in (('fifo       ', False), ('prioritized', True)):
+        started = time.monotonic()
+        latencies = asyncio.run(simulate(concurrency, render_seconds, prioritized))
+        total = time.monotonic() - started
+        summary = '  '.join(
+            f"{kind}: p50={statistics.median(latencies[kind]):5.2f}s p95={percentile(latencies[kind], 0.95):5.2f}s"
+            for kind, _, _ in reversed(WORKLOAD)
+        )
+        print(f"{label} total={total:5.2f}s  {summary}")
+
+
+if __name__ == '__main__':
+    main()
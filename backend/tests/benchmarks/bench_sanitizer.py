@@ -0,0 +1,116 @@
+"""
+議事録サニタイザのサイズ別ベンチマーク
+
+旧実装（正規表現3回 + bleach.clean）と単一パスサニタイザを 100 KB〜20 MB の入力で比較する。
+入力は Word/Teams からの貼り付けを模した HTML（CSS 残骸・style 要素・base64 画像を含む）と、
+旧 CSS 除去正規表現がバックトラックする '{' の多いテキストの2種類。
+
+実行: cd backend && python -m tests.benchmarks.bench_sanitizer
+旧実装の計測には bleach が必要（未インストールの場合は新実装のみ計測）。
+旧実装が1回 LEGACY_LIMIT_SECONDS を超えたサイズ以降は旧実装の計測を打ち切る。
+
+最後に、閉じていない style / script や対応しない '{' が大量に続く入力（終了タグ・'}' を毎回末尾まで探すと
+二乗時間になる）を計測し、いずれかが PATHOLOGICAL_LIMIT_SECONDS を超えた場合は終了コード 1 で終わる。
+"""
+
+import base64
+import os
+import re
+import sys
+import time
+
+from services.html_sanitizer import (
+    MINUTES_ALLOWED_ATTRIBUTES, MINUTES_ALLOWED_TAGS, minutes_sanitizer, strip_css_residue,
+)
+
+SIZES = [100 * 1024, 1024 * 1024, 5 * 1024 * 1024, 20 * 1024 * 1024]
+LEGACY_LIMIT_SECONDS = 5.0
+PATHOLOGICAL_LIMIT_SECONDS = 5.0
+
+# 二乗時間になりうる入力（旧実装では各入力が数秒〜数十秒かかっていた）
+PATHOLOGICAL = [
+    ('unclosed <style> x 80000', minutes_sanitizer.sanitize, '<style>' * 80000),
+    ('unclosed <script> x 40000', minutes_sanitizer.sanitize, '<script>' * 40000),
+    ("'{' x 1280000 + '}'", strip_css_residue, '{' * 1_280_000 + '}'),
+]
+
+_PASTE_BLOCK = (
+    '<style>p.MsoNormal { margin: 0; font-family: "Yu Gothic"; }</style>'
+    '<p class="MsoNormal" style="margin:0">議題について議論した。<o:p></o:p></p>'
+    'div.WordSection1 { page: WordSection1; }'
+    '<table><tr><td>項目</td><td>担当 &amp; 期限</td></tr></table>'
+    '<ul><li>対応事項</li></ul>'
+)
+
+
+def make_paste_html(size: int) -> str:
+    """貼り付け HTML（約 1/4 を base64 画像が占める）"""
+    image = base64.b64encode(os.urandom(size // 6)).decode('ascii')
+    parts = [f'<p><img src="data:image/png;base64,{image}"></p>']
+    total = len(parts[0])
+    while total < size:
+        parts.append(_PASTE_BLOCK)
+        total += len(_PASTE_BLOCK)
+    return ''.join(parts)
+
+
+def make_brace_text(size: int) -> str:
+    """'}' で閉じない '{' が並ぶテキスト（旧 CSS 除去正規表現の最悪ケース）"""
+    unit = 'item {'
+    return '<p>' + unit * (size // len(unit)) + '</p>'
+
+
+def legacy_sanitize(raw: str) -> str:
+    import bleach
+    cleaned = re.sub(r'<style[^>]*>.*?</style>', '', raw, flags=re.DOTALL | re.IGNORECASE)
+    cleaned = re.sub(r'<script[^>]*>.*?</script>', '', cleaned, flags=re.DOTALL | re.IGNORECASE)
+    cleaned = re.sub(r'\s*[a-zA-Z-]+\s*{\s*[^}]*}\s*', '', cleaned, flags=re.MULTILINE)
+    attrs = {k: list(v) for k, v in MINUTES_ALLOWED_ATTRIBUTES.items()}
+    return bleach.clean(cleaned, tags=set(MINUTES_ALLOWED_TAGS), attributes=attrs,
+                        protocols=['http', 'https', 'data'], strip=True)
+
+
+def timed(func, arg) -> float:
+    started = time.perf_counter()
+    func(arg)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    try:
+        import bleach  # noqa: F401
+        legacy_enabled = True
+    except ImportError:
+        legacy_enabled = False
+        print('bleach is not installed: measuring the single-pass sanitizer only')
+
+    import warnings
+    warnings.simplefilter('ignore')
+
+    for label, factory in (('paste', make_paste_html), ('braces', make_brace_text)):
+        legacy_active = legacy_enabled
+        print(f"[{label}]")
+        print(f"{'size':>10} {'single-pass':>14} {'legacy':>14}")
+        for size in SIZES:
+            source = factory(size)
+            new_time = timed(minutes_sanitizer.sanitize, source)
+            legacy_text = '-'
+            if legacy_active:
+                legacy_time = timed(legacy_sanitize, source)
+                legacy_text = f"{legacy_time * 1000:.1f} ms"
+                legacy_active = legacy_time < LEGACY_LIMIT_SECONDS
+            print(f"{size // 1024:>7} KB {new_time * 1000:>11.1f} ms {legacy_text:>14}")
+
+    print('[pathological]')
+    slow = False
+    for label, func, source in PATHOLOGICAL:
+        seconds = timed(func, source)
+        slow = slow or seconds >= PATHOLOGICAL_LIMIT_SECONDS
+        print(f"{label:>28} {seconds * 1000:>11.1f} ms")
+    if slow:
+        print(f'pathological input exceeded {PATHOLOGICAL_LIMIT_SECONDS}s')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+議事録PDF分割レンダリングのベンチマーク
+
+約300ページの議事録（h2 の章が並ぶ長時間会議の議事録を模したもの）を、一括レンダリングと
+シャード数を変えた分割レンダリングで PDF 化し、所要時間・ページ数を比較する。
+あわせて機密レベルのスタンプが全ページに入ること、参加者セクションが末尾にあることを確認する。
+
+実行: cd backend && python -m tests.benchmarks.bench_sharded_render [シャード数 ...]
+wkhtmltopdf（WKHTMLTOPDF_PATH）が必要。代替レンダラーでの実行結果は分割の効果を表さないため、
+PDF_SHARD_THRESHOLD_BYTES の既定値を変える判断には実機の wkhtmltopdf での結果を使うこと。
+分割レンダリングは実行器の空き枠の数までしか並行しないため、シャード数と同じ同時実行数の実行器で実行する。
+"""
+
+import asyncio
+import datetime
+import io
+import sys
+import time
+
+from pypdf import PdfReader
+
+from services.minutes_pdf_service import normalize_meeting, render_minutes_html
+from services.pdf_service import generate_pdf_from_html
+from services.pdf_shard import plan_shards, render_sharded, split_sections
+from services.pdf_stamp import stamp_confidentiality
+from services.render_executor import RenderExecutor
+
+SECTIONS = 150
+PARAGRAPHS_PER_SECTION = 24
+RENDER_TIMEOUT = 600
+
+MEETING = normalize_meeting({
+    '会議タイトル': '年次計画レビュー（終日）',
+    '会議日時': '2025-01-01 09:00:00',
+    '参加者': ['田中太郎', '佐藤花子', '鈴木一郎'],
+    '要約': '長時間会議の議事録ベンチマーク用データ',
+    '議事録No': 'BENCH-300',
+})
+
+_PARAGRAPH = (
+    '<p>本議題について各部門から進捗の報告があり、課題と対応方針について議論した。'
+    '次回までに担当者が詳細な計画を作成し、関係部署と調整のうえ共有することとした。</p>'
+)
+
+
+def make_minutes_html() -> str:
+    """h2 の章が SECTIONS 個並ぶ議事録本文（実 wkhtmltopdf で約300ページ）"""
+    parts = []
+    for i in range(SECTIONS):
+        parts.append(f'<h2>議題 {i + 1}</h2>')
+        parts.append(_PARAGRAPH * PARAGRAPHS_PER_SECTION)
+        parts.append('<table><tr><th>担当</th><th>期限</th></tr><tr><td>田中</td><td>来週</td></tr></table>')
+    return ''.join(parts)
+
+
+def describe(pdf_bytes: bytes) -> str:
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    pages = len(reader.pages)
+    stamped = sum(1 for page in reader.pages if '社外秘' in (page.extract_text() or ''))
+    last_text = reader.pages[-1].extract_text() or ''
+    return f"pages={pages}, stamped={stamped}/{pages}, participants_on_last_page={'参加者' in last_text}"
+
+
+def run_sharded(shards, now, render_date) -> bytes:
+    """シャード数と同じ同時実行数の実行器で分割レンダリングする"""
+    executor = RenderExecutor(max_concurrency=len(shards), max_queue=0, queue_timeout=RENDER_TIMEOUT)
+    try:
+        return asyncio.run(executor.run(
+            render_sharded, MEETING, shards, now, creation_date=render_date, timeout=RENDER_TIMEOUT
+        ))
+    finally:
+        executor.shutdown()
+
+
+def main() -> None:
+    shard_counts = [int(a) for a in sys.argv[1:]] or [2, 4]
+    minutes_html = make_minutes_html()
+    render_date = datetime.date.today()
+    now = render_date.isoformat()
+    print(f"minutes body: {len(minutes_html) / 1024:.0f} KB, sections: {SECTIONS}")
+
+    started = time.perf_counter()
+    monolithic = generate_pdf_from_html(
+        render_minutes_html(MEETING, minutes_html, now=now),
+        timeout=RENDER_TIMEOUT, use_header=False, meeting_info=MEETING, creation_date=render_date,
+    )
+    monolithic_seconds = time.perf_counter() - started
+    print(f"monolithic        : {monolithic_seconds:7.2f} s  "
+          f"{describe(stamp_confidentiality(monolithic, '社外秘'))}")
+
+    sections = split_sections(minutes_html)
+    for count in shard_counts:
+        shards = plan_shards(sections, count)
+        started = time.perf_counter()
+        sharded = run_sharded(shards, now, render_date)
+        seconds = time.perf_counter() - started
+        print(f"sharded ({len(shards)} shards): {seconds:7.2f} s  "
+              f"{describe(stamp_confidentiality(sharded, '社外秘'))}  "
+              f"speedup={monolithic_seconds / seconds:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
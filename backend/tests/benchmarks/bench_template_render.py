@@ -0,0 +1,66 @@
+"""
+テンプレートレンダリングのベンチマーク
+
+毎回 Environment を生成・テンプレートをコンパイル・pdf.css を読み込む従来方式と、
+テンプレートレジストリ（コンパイル済みテンプレート + アセットキャッシュ）を比較する。
+
+実行: cd backend && python -m tests.benchmarks.bench_template_render [回数]
+"""
+
+import datetime
+import sys
+import time
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from services.minutes_pdf_service import normalize_meeting, render_minutes_html
+from services.template_registry import TEMPLATES_DIR, process_line_breaks
+
+MEETING = normalize_meeting({
+    '会議タイトル': '定例会議',
+    '会議日時': '2025-01-01 10:00:00',
+    '参加者': ['田中太郎', '佐藤花子'],
+    '要約': '要約1行目\n要約2行目',
+})
+MINUTES_HTML = '<h2>議題</h2>' + '<p>議事内容の段落です。</p>' * 200
+
+
+def render_uncached() -> str:
+    """従来方式: 呼び出しごとに環境生成・コンパイル・CSS 読み込み"""
+    env = Environment(loader=FileSystemLoader(str(TEMPLATES_DIR)), autoescape=select_autoescape(['html', 'xml']))
+    env.filters['process_line_breaks'] = process_line_breaks
+    template = env.get_template('meeting_minutes.html')
+    pdf_css = (TEMPLATES_DIR / 'pdf.css').read_text(encoding='utf-8')
+    return template.render(
+        meeting=MEETING,
+        minutes_html=MINUTES_HTML,
+        now=datetime.datetime.utcnow().isoformat(),
+        pdf_css=pdf_css,
+    )
+
+
+def render_cached() -> str:
+    """レジストリ方式"""
+    return render_minutes_html(MEETING, MINUTES_HTML)
+
+
+def bench(func, iterations: int) -> float:
+    func()  # ウォームアップ
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    uncached = bench(render_uncached, iterations)
+    cached = bench(render_cached, iterations)
+    print(f"iterations: {iterations}")
+    print(f"uncached (Environment per call): {uncached * 1000:.3f} ms/render")
+    print(f"cached   (template registry)   : {cached * 1000:.3f} ms/render")
+    print(f"saving per render              : {(uncached - cached) * 1000:.3f} ms ({uncached / cached:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
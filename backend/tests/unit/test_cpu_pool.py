@@ -0,0 +1,22 @@
+"""
+CPUバウンド処理用プロセスプールのテスト
+
+しきい値による実行場所の切り替えを検証する
+"""
+
+import os
+
+from services.cpu_pool import run_cpu_task, shutdown_cpu_pool
+
+
+def test_small_input_runs_in_process():
+    """しきい値未満の入力は呼び出し元プロセスで実行されること"""
+    assert run_cpu_task(os.getpid, size=0) == os.getpid()
+
+
+def test_large_input_runs_in_process_pool():
+    """しきい値以上の入力は別プロセスで実行されること"""
+    try:
+        assert run_cpu_task(os.getpid, size=1 << 40) != os.getpid()
+    finally:
+        shutdown_cpu_pool()
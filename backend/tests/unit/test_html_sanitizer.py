@@ -0,0 +1,77 @@
+"""
+議事録サニタイザのテスト
+
+旧実装（正規表現 + bleach）と同等の許可リスト動作と、CSS 残骸除去を検証する
+"""
+
+from services.html_sanitizer import minutes_sanitizer, strip_css_residue
+
+
+def test_style_and_script_are_removed_with_content():
+    """style / script 要素は中身ごと除去されること"""
+    html = '<style>p { color: red }</style><p>本文</p><SCRIPT type="x">alert(1)</SCRIPT>'
+    assert minutes_sanitizer.sanitize(html) == '<p>本文</p>'
+
+
+def test_disallowed_tags_are_stripped_but_text_is_kept():
+    """許可されていないタグは除去し、テキストは残すこと"""
+    html = '<p class="MsoNormal" id="x" onclick="x()">a<o:p>b</o:p><font>c</font></p>'
+    assert minutes_sanitizer.sanitize(html) == '<p class="MsoNormal">abc</p>'
+
+
+def test_url_protocols_are_filtered():
+    """javascript: などの URL は除去し、data: 画像と相対 URL は残すこと"""
+    html = ('<a href="java&#x09;script:alert(1)" title="t">x</a>'
+            '<a href="/rel?a=1&amp;b=2">y</a>'
+            '<img src="data:image/png;base64,AAAA" onerror="x()">')
+    assert minutes_sanitizer.sanitize(html) == (
+        '<a title="t">x</a><a href="/rel?a=1&amp;b=2">y</a><img src="data:image/png;base64,AAAA">'
+    )
+
+
+def test_text_is_escaped_and_entities_are_kept():
+    """テキスト中の < や裸の & はエスケープし、既存の文字参照は保持すること"""
+    assert minutes_sanitizer.sanitize('<p>a < b &amp; c &nbsp;& d</p>') == '<p>a &lt; b &amp; c &nbsp;&amp; d</p>'
+
+
+def test_unbalanced_tags_are_balanced():
+    """閉じ忘れは末尾で閉じ、対応しない終了タグは捨てること"""
+    assert minutes_sanitizer.sanitize('</div><ul><li>x<table><tr><td>1</table>') == (
+        '<ul><li>x<table><tr><td>1</td></tr></table></li></ul>'
+    )
+
+
+def test_css_residue_matches_legacy_regex():
+    """CSS 残骸の除去範囲が旧正規表現と一致すること"""
+    import re
+    legacy = re.compile(r'\s*[a-zA-Z-]+\s*{\s*[^}]*}\s*')
+    samples = [
+        'p.MsoNormal { margin: 0 } 本文',
+        'div.WordSection1 {page:WordSection1;}\n次の行',
+        'a{ b{c} d',
+        '{ 識別子なし } foo{bar}',
+        '閉じない { 括弧',
+        'abc123def{x}tail',
+    ]
+    for text in samples:
+        assert strip_css_residue(text) == legacy.sub('', text), text
+
+
+def test_unclosed_raw_text_drops_rest():
+    """閉じていない style / script は末尾までを中身として除去すること"""
+    assert minutes_sanitizer.sanitize('<p>a<style>x</style>b<style>c</p>') == '<p>ab</p>'
+    assert minutes_sanitizer.sanitize('<p>a<script>x</style>b</script>c<style>d</style>e') == '<p>ace</p>'
+
+
+def test_repeated_unclosed_raw_text_and_braces():
+    """閉じていない style / script や対応しない '{' が大量に続く入力でも結果が変わらないこと
+
+    所要時間の確認は tests/benchmarks/bench_sanitizer.py の pathological で行う。
+    """
+    import re
+    assert minutes_sanitizer.sanitize('<p>a</p>' + '<style>' * 2000) == '<p>a</p>'
+    assert minutes_sanitizer.sanitize('<p>a</p>' + '<script>' * 2000) == '<p>a</p>'
+    assert minutes_sanitizer.sanitize('<style>x</style>' * 2000 + '<p>b</p>') == '<p>b</p>'
+    legacy = re.compile(r'\s*[a-zA-Z-]+\s*{\s*[^}]*}\s*')
+    for text in ('{' * 2000 + '}x', 'a{' * 2000 + '} tail', 'a{b}' * 2000 + '{'):
+        assert strip_css_residue(text) == legacy.sub('', text)
@@ -0,0 +1,53 @@
+"""
+PDF一括出力のテスト
+
+ZIP への格納・ファイル名の重複回避・失敗項目の manifest 記録を検証する
+"""
+
+import asyncio
+import io
+import json
+import zipfile
+
+import pytest
+
+from services.pdf_batch import MANIFEST_NAME, BatchItem, stream_batch_zip
+from services.render_executor import shutdown_render_executor
+
+
+@pytest.fixture(autouse=True)
+def _reset_executor():
+    yield
+    shutdown_render_executor()
+
+
+def _render(text):
+    if text == 'fail':
+        raise RuntimeError('render failed')
+    return text.encode('utf-8')
+
+
+def _collect(items):
+    async def main():
+        return b''.join([chunk async for chunk in stream_batch_zip(items, concurrency=2)])
+    return zipfile.ZipFile(io.BytesIO(asyncio.run(main())))
+
+
+def test_batch_zip_contains_pdfs_and_manifest():
+    """成功した項目は ZIP に格納され、失敗は manifest に記録されること"""
+    items = [
+        BatchItem(0, 'a.pdf', render=(_render, ('one',), {})),
+        BatchItem(1, 'a.pdf', render=(_render, ('two',), {})),
+        BatchItem(2, 'b.pdf', render=(_render, ('fail',), {})),
+        BatchItem(3, '', error='invalid meeting info'),
+    ]
+    archive = _collect(items)
+
+    assert sorted(archive.namelist()) == ['a (2).pdf', 'a.pdf', MANIFEST_NAME]
+    assert {archive.read('a.pdf'), archive.read('a (2).pdf')} == {b'one', b'two'}
+
+    manifest = json.loads(archive.read(MANIFEST_NAME))
+    assert (manifest['total'], manifest['succeeded'], manifest['failed']) == (4, 2, 2)
+    assert [e['index'] for e in manifest['items']] == [0, 1, 2, 3]
+    assert manifest['items'][2]['error'] == 'render failed'
+    assert manifest['items'][3]['error'] == 'invalid meeting info'
@@ -0,0 +1,41 @@
+"""
+PDF生成結果キャッシュのテスト
+
+バイト数上限付き LRU の振る舞いとキー生成の決定性を検証する
+"""
+
+from services.pdf_cache import PdfResultCache, build_cache_key
+
+
+def test_cache_key_is_independent_of_dict_order():
+    """会議情報の辞書順序が違っても同じキーになること"""
+    a = build_cache_key('<p>x</p>', {'title': 't', '機密レベル': '社外秘'}, '社外秘')
+    b = build_cache_key('<p>x</p>', {'機密レベル': '社外秘', 'title': 't'}, '社外秘')
+    assert a == b
+    assert a != build_cache_key('<p>x</p>', {'title': 't', '機密レベル': '社外秘'}, '極秘')
+
+
+def test_lru_eviction_respects_byte_budget():
+    """容量を超えたら最も古く参照されたエントリから破棄されること"""
+    cache = PdfResultCache(max_bytes=10)
+    cache.put('a', b'1234')
+    cache.put('b', b'5678')
+    assert cache.get('a') == b'1234'  # a を最新にする
+    cache.put('c', b'9012')
+
+    assert cache.get('b') is None
+    assert cache.get('a') == b'1234'
+    assert cache.get('c') == b'9012'
+    stats = cache.stats()
+    assert stats['bytes'] == 8
+    assert stats['evictions'] == 1
+    assert stats['hits'] == 3
+    assert stats['misses'] == 1
+
+
+def test_oversized_entry_is_not_cached():
+    """容量を超える単一エントリは保持しないこと"""
+    cache = PdfResultCache(max_bytes=4)
+    cache.put('big', b'123456')
+    assert cache.get('big') is None
+    assert cache.stats()['entries'] == 0
@@ -0,0 +1,64 @@
+"""
+PDF ダウンロード応答のテスト
+
+メモリ上の PDF とファイル配信の PDF の両方が Range / If-Range に対応し、
+ファイル配信では送信後に出力ファイルが削除されることを検証する
+"""
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.routes.pdf_routes import pdf_download_response, pdf_file_download_response
+
+DATA = bytes(range(256)) * 40
+
+
+def make_client(tmp_path):
+    app = FastAPI()
+
+    @app.get('/bytes')
+    async def from_bytes(request: Request):
+        return pdf_download_response(DATA, 'a.pdf', 'etag', request, 'attachment')
+
+    @app.get('/file')
+    async def from_file(request: Request):
+        path = tmp_path / 'out.pdf'
+        path.write_bytes(DATA)
+        return await pdf_file_download_response(str(path), 'a.pdf', request, 'attachment')
+
+    return TestClient(app)
+
+
+def test_range_requests_are_served_from_bytes_and_files(tmp_path):
+    """単一範囲は 206 と Content-Range、範囲指定なしは全体を返すこと（ファイルは送信後に削除）"""
+    client = make_client(tmp_path)
+    for url in ('/bytes', '/file'):
+        full = client.get(url)
+        assert full.status_code == 200
+        assert full.content == DATA
+        assert full.headers['accept-ranges'] == 'bytes'
+
+        partial = client.get(url, headers={'Range': 'bytes=100-1099'})
+        assert partial.status_code == 206
+        assert partial.content == DATA[100:1100]
+        assert partial.headers['content-range'] == f'bytes 100-1099/{len(DATA)}'
+
+        suffix = client.get(url, headers={'Range': 'bytes=-10'})
+        assert suffix.content == DATA[-10:]
+
+        unsatisfiable = client.get(url, headers={'Range': f'bytes={len(DATA)}-'})
+        assert unsatisfiable.status_code == 416
+        assert unsatisfiable.headers['content-range'] == f'bytes */{len(DATA)}'
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_if_range_mismatch_returns_full_body(tmp_path):
+    """If-Range が ETag と一致しない場合は範囲指定を無視して全体を返すこと"""
+    client = make_client(tmp_path)
+    for url in ('/bytes', '/file'):
+        etag = client.get(url).headers['etag']
+        matched = client.get(url, headers={'Range': 'bytes=0-9', 'If-Range': etag})
+        assert matched.status_code == 206
+        stale = client.get(url, headers={'Range': 'bytes=0-9', 'If-Range': '"other"'})
+        assert stale.status_code == 200
+        assert stale.content == DATA
@@ -0,0 +1,67 @@
+"""
+レンダリングエンジン選択のテスト
+
+本文の複雑さ評価（阻害要因・インライン装飾の点数）と reportlab 版議事録PDFの構成を検証する
+"""
+
+import io
+
+import pytest
+from pypdf import PdfReader
+
+from services import reportlab_fonts
+from services.minutes_pdf_service import normalize_meeting
+from services.pdf_engine import assess_complexity, render_minutes_reportlab
+
+
+@pytest.mark.parametrize('html', [
+    '<h2>議題</h2><p>本文</p><ul><li>一</li><li>二</li></ul>',
+    '<table><thead><tr><th>担当</th></tr></thead><tbody><tr><td>田中</td></tr></tbody></table>',
+    '<div><p>段落</p></div>\n<blockquote>引用</blockquote>',
+])
+def test_simple_minutes_have_no_blockers(html):
+    """見出し・段落・リスト・表のみの本文は阻害要因なし・0点であること"""
+    assert assess_complexity(html) == (0, [])
+
+
+@pytest.mark.parametrize('html, blocker', [
+    ('<p><img src="data:image/png;base64,AA"></p>', 'image'),
+    ('<p><code>x = 1</code></p>', 'code'),
+    ('<ul><li><p>入れ子</p></li></ul>', 'nested_block'),
+    ('本文のみ<p>段落</p>', 'loose_text'),
+    ('<p>段落</p>末尾', 'loose_text'),
+    ('<pre>整形済み</pre>', 'tag_pre'),
+    ('<p style="color: red">赤</p>', 'inline_style'),
+    ('<p class="action-item">対応</p>', 'styled_class'),
+])
+def test_blockers(html, blocker):
+    """reportlab で再現できない要素は阻害要因として検出されること"""
+    assert blocker in assess_complexity(html).blockers
+
+
+def test_inline_formatting_is_scored():
+    """インライン装飾は1つにつき1点、阻害要因にはならないこと"""
+    complexity = assess_complexity('<p><strong>太字</strong>と<a href="#">リンク</a><br>改行</p>')
+    assert complexity == (3, [])
+
+
+def test_reportlab_minutes_layout(monkeypatch):
+    """1ページ目に表題・本文、改ページ後に参加者が出力されること"""
+    monkeypatch.setattr(reportlab_fonts, 'font_candidates', lambda: iter([]))
+    monkeypatch.setattr(reportlab_fonts, '_font_name', None)
+    monkeypatch.setattr(reportlab_fonts, '_stylesheet', None)
+    meeting = normalize_meeting({
+        '会議タイトル': 'Weekly meeting',
+        '会議日時': '2025-01-01 10:00:00',
+        '参加者': ['Tanaka', 'Sato'],
+        '議事録No': 'ENGINE-1',
+    })
+
+    pdf = render_minutes_reportlab(meeting, '<h2>Agenda</h2><p>Body &lt;text&gt;</p><ol><li>one</li><li>two</li></ol>')
+
+    pages = PdfReader(io.BytesIO(pdf)).pages
+    assert len(pages) == 2
+    first = pages[0].extract_text()
+    for text in ('ENGINE-1', 'Weekly meeting', 'Agenda', 'Body <text>', '1. one', '2. two'):
+        assert text in first
+    assert 'Tanaka' in pages[1].extract_text()
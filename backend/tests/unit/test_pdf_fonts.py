@@ -0,0 +1,97 @@
+"""
+同梱フォント設定のテスト
+
+フォントディレクトリの走査、@font-face による別名、fontconfig 設定の生成を検証する
+"""
+
+import shutil
+from pathlib import Path
+
+import pytest
+
+from services import pdf_fonts, renderer_pool
+from services.pdf_fonts import ALIASED_FAMILIES, FontProvisioning
+
+DEJAVU_DIR = Path('/usr/share/fonts/truetype/dejavu')
+
+
+@pytest.fixture
+def font_dir(tmp_path):
+    fonts = [DEJAVU_DIR / 'DejaVuSans.ttf', DEJAVU_DIR / 'DejaVuSans-Bold.ttf']
+    if not all(f.exists() for f in fonts):
+        pytest.skip('DejaVu フォントがありません')
+    directory = tmp_path / 'fonts'
+    directory.mkdir()
+    for font in fonts:
+        shutil.copy(font, directory)
+    (directory / 'README.txt').write_text('not a font')
+    return directory
+
+
+def test_aliases_map_to_bundled_faces(font_dir, tmp_path):
+    """3つのファミリー名それぞれに同梱フォントの標準・太字が割り当てられること"""
+    provisioning = FontProvisioning(str(font_dir), str(tmp_path / 'cache'))
+    assert provisioning.family == 'DejaVu Sans'
+    assert sorted(face.weight for face in provisioning.faces) == [400, 700]
+
+    css = provisioning.font_face_css
+    for alias in ALIASED_FAMILIES:
+        assert f"font-family: '{alias}'; font-weight: 400; src: url('{(font_dir / 'DejaVuSans.ttf').as_uri()}')" in css
+        assert f"font-family: '{alias}'; font-weight: 700; src: url('{(font_dir / 'DejaVuSans-Bold.ttf').as_uri()}')" in css
+
+
+def test_css_is_inserted_into_head(font_dir, tmp_path):
+    """@font-face は <head> の直後（なければ先頭）に挿入されること"""
+    provisioning = FontProvisioning(str(font_dir), str(tmp_path / 'cache'))
+    html = provisioning.apply_css('<html><head lang="ja"><title>t</title></head><body></body></html>')
+    assert html.startswith('<html><head lang="ja"><style>\n@font-face')
+    assert provisioning.apply_css('<p>x</p>').endswith('</style><p>x</p>')
+
+
+def test_fontconfig_file_declares_dir_and_aliases(font_dir, tmp_path):
+    """fonts.conf に同梱ディレクトリ・キャッシュ先・別名が含まれ、以後のレンダリングに渡されること"""
+    cache_dir = tmp_path / 'cache'
+    provisioning = FontProvisioning(str(font_dir), str(cache_dir))
+    assert provisioning.env() is None
+
+    provisioning.build_cache()
+
+    conf = (cache_dir / 'fonts.conf').read_text(encoding='utf-8')
+    assert f'<dir>{font_dir}</dir>' in conf
+    assert f'<cachedir>{cache_dir}</cachedir>' in conf
+    assert '<family>Meiryo</family><prefer><family>DejaVu Sans</family></prefer>' in conf
+    assert provisioning.env()['FONTCONFIG_FILE'] == str(cache_dir / 'fonts.conf')
+
+
+def test_provision_fonts_runs_once(monkeypatch):
+    """fonts.conf の作成はプロセスで1回のみ行われること（起動時処理とプールの両方から呼ばれる）"""
+    calls = []
+
+    class Provisioning:
+        def build_cache(self):
+            calls.append('build')
+
+        def stats(self):
+            return {}
+
+    monkeypatch.setattr(pdf_fonts, '_provisioned', False)
+    monkeypatch.setattr(pdf_fonts, 'get_font_provisioning', lambda: Provisioning())
+    pdf_fonts.provision_fonts()
+    pdf_fonts.provision_fonts()
+    assert calls == ['build']
+
+
+def test_pool_workers_start_after_fonts_are_provisioned(monkeypatch, tmp_path):
+    """常駐ワーカーは fontconfig 設定の作成後に起動されること（起動時の環境変数を使い続けるため）"""
+    from app.config import get_settings
+    order = []
+    executable = tmp_path / 'wkhtmltopdf'
+    executable.write_text('')
+    monkeypatch.setattr(get_settings(), 'PDF_RENDER_POOL_SIZE', 1)
+    monkeypatch.setattr(renderer_pool, '_pool', None)
+    monkeypatch.setattr(renderer_pool, '_pool_disabled', False)
+    monkeypatch.setattr(renderer_pool, 'provision_fonts', lambda: order.append('fonts'))
+    monkeypatch.setattr(renderer_pool, 'RendererPool', lambda *args: order.append('pool') or object())
+
+    assert renderer_pool.get_renderer_pool(str(executable)) is not None
+    assert order == ['fonts', 'pool']
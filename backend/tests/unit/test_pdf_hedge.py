@@ -0,0 +1,179 @@
+"""
+レンダリングのヘッジ実行のテスト
+
+p95 を超えたレンダリングに複製が起動され、先に終わった方の結果が返って遅い方が終了させられること、
+予算を超えてヘッジしないことを検証する
+"""
+
+import io
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from services import minutes_pdf_service, pdf_hedge
+from services.pdf_hedge import REASON_HEDGE_LOST, Hedger
+from services.render_cancel import (
+    REASON_DISCONNECTED, CancelToken, RenderCancelled, current_token, run_process, use_token,
+)
+
+# 長時間待機するコマンド（止まった wkhtmltopdf の代わり）
+SLOW_PROCESS = [sys.executable, '-c', 'import time; time.sleep(30)']
+
+
+def warmed_hedger(capacity=2, max_percent=50, seconds=0.05):
+    """p95 が seconds になるよう所要時間を記録済みのヘッジ実行器"""
+    hedger = Hedger(max_percent, lambda: capacity, min_samples=5)
+    for _ in range(5):
+        hedger._record(seconds)
+    return hedger
+
+
+class StallFirst:
+    """1回目の呼び出しは止まり（取り消されるまで待機）、2回目以降はすぐに返すレンダリング"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = []
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        if call > 1:
+            return b'%PDF-hedge'
+        try:
+            run_process(SLOW_PROCESS, b'', subprocess.DEVNULL, timeout=30)
+        except RenderCancelled as e:
+            self.errors.append(e)
+            raise
+        return b'%PDF-primary'
+
+
+def test_no_hedge_until_enough_samples():
+    """所要時間の記録が足りない間はヘッジしないこと"""
+    hedger = Hedger(50, lambda: 2, min_samples=5)
+    assert hedger.hedge_delay() is None
+    assert hedger.run(lambda: b'%PDF') == b'%PDF'
+    assert hedger.stats()['launched'] == 0
+    assert hedger.stats()['samples'] == 1
+
+
+def test_stalled_render_is_hedged_and_loser_killed():
+    """p95 を超えたレンダリングは複製され、先に終わった複製の結果が返り、止まった方が終了させられること"""
+    hedger = warmed_hedger()
+    render = StallFirst()
+
+    started = time.monotonic()
+    assert hedger.run(render) == b'%PDF-hedge'
+    assert time.monotonic() - started < 2
+
+    deadline = time.monotonic() + 2
+    while not render.errors and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert [e.reason for e in render.errors] == [REASON_HEDGE_LOST]
+    assert hedger.stats()['launched'] == 1
+    assert hedger.stats()['won'] == 1
+    assert hedger.stats()['in_flight'] == 0
+
+
+def test_hedges_stay_within_budget():
+    """実行中のヘッジが同時実行数 × 割合に達している場合は複製しないこと"""
+    hedger = warmed_hedger(capacity=1, max_percent=50)
+    assert hedger.max_in_flight() == 0
+    assert hedger.run(lambda: time.sleep(0.2) or b'%PDF') == b'%PDF'
+    assert hedger.stats()['launched'] == 0
+
+    hedger = warmed_hedger(capacity=2, max_percent=50)
+    assert hedger._acquire()
+    assert hedger.run(lambda: time.sleep(0.2) or b'%PDF') == b'%PDF'
+    assert hedger.stats()['launched'] == 1
+
+
+def test_fast_failure_is_not_hedged():
+    """p95 より前に失敗したレンダリングは複製せずにその例外を返すこと"""
+    hedger = warmed_hedger(seconds=1)
+    calls = []
+
+    def fail():
+        calls.append(1)
+        raise RuntimeError('wkhtmltopdf failed')
+
+    with pytest.raises(RuntimeError, match='wkhtmltopdf failed'):
+        hedger.run(fail)
+    assert calls == [1]
+
+
+def test_request_cancel_reaches_all_renders():
+    """リクエストが取り消されると元のレンダリングと複製の両方が終了し、取り消しが送出されること"""
+    hedger = warmed_hedger()
+    parent = CancelToken()
+    tokens = []
+
+    def stall():
+        tokens.append(current_token())
+        run_process(SLOW_PROCESS, b'', subprocess.DEVNULL, timeout=30)
+
+    threading.Timer(0.3, parent.cancel, args=(REASON_DISCONNECTED,)).start()
+    started = time.monotonic()
+    with use_token(parent), pytest.raises(RenderCancelled) as info:
+        hedger.run(stall)
+    assert time.monotonic() - started < 2
+    assert info.value.reason == REASON_DISCONNECTED
+    assert len(tokens) == 2
+    assert all(token.reason == REASON_DISCONNECTED for token in tokens)
+
+
+def _pdf_bytes(text):
+    from reportlab.pdfgen import canvas
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer)
+    pdf.drawString(100, 700, text)
+    pdf.save()
+    return buffer.getvalue()
+
+
+def test_file_render_is_hedged_through_temp_files(monkeypatch, tmp_path):
+    """ファイル版でも止まったレンダリングが複製され、勝った方の出力だけが出力先に残ること"""
+    hedger = warmed_hedger()
+    monkeypatch.setattr(pdf_hedge, 'get_render_hedger', lambda: hedger)
+    render = StallFirst()
+    written = []
+
+    def fake_generate_pdf_file(html, output_path, **kwargs):
+        written.append(output_path)
+        pdf = render()
+        with open(output_path, 'wb') as f:
+            f.write(_pdf_bytes(pdf.decode()))
+
+    monkeypatch.setattr(minutes_pdf_service, 'generate_pdf_file', fake_generate_pdf_file)
+    output = tmp_path / 'minutes.pdf'
+
+    started = time.monotonic()
+    minutes_pdf_service.generate_minutes_pdf_file({'会議タイトル': 'hedge file'}, '<p>hedge file test</p>', str(output))
+    assert time.monotonic() - started < 2
+
+    from pypdf import PdfReader
+    assert 'PDF-hedge' in PdfReader(str(output)).pages[0].extract_text()
+    assert len(written) == 2 and str(output) not in written
+    deadline = time.monotonic() + 2
+    while not render.errors and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert [e.reason for e in render.errors] == [REASON_HEDGE_LOST]
+    assert [p.name for p in tmp_path.iterdir()] == ['minutes.pdf']
+    assert hedger.stats()['won'] == 1
+
+
+def test_failed_file_render_leaves_no_temp_files(tmp_path):
+    """ファイル版のレンダリングが失敗した場合は一時ファイルを残さず例外を送出すること"""
+    hedger = warmed_hedger(seconds=1)
+
+    def fail(output_path):
+        raise RuntimeError('wkhtmltopdf failed')
+
+    with pytest.raises(RuntimeError, match='wkhtmltopdf failed'):
+        hedger.run_to_file(fail, str(tmp_path / 'minutes.pdf'))
+    assert list(tmp_path.iterdir()) == []
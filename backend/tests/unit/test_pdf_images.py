@@ -0,0 +1,74 @@
+"""
+埋め込み画像最適化のテスト
+
+印刷解像度への縮小・同一画像の重複処理回避・統計値を検証する
+"""
+
+import base64
+import io
+
+from PIL import Image
+
+from services.pdf_images import max_image_size, optimize_embedded_images
+
+
+def _data_uri(width, height, fmt='PNG'):
+    image = Image.effect_noise((width, height), 64).convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, fmt)
+    mime = 'image/png' if fmt == 'PNG' else 'image/jpeg'
+    return f'data:{mime};base64,{base64.b64encode(buffer.getvalue()).decode("ascii")}'
+
+
+def _decode_sizes(html):
+    sizes = []
+    for part in html.split('base64,')[1:]:
+        data = base64.b64decode(part.split('"', 1)[0])
+        sizes.append(Image.open(io.BytesIO(data)).size)
+    return sizes
+
+
+def test_large_image_is_downscaled_to_print_size():
+    """本文領域を超える画像が dpi に応じた画素数まで縮小されること"""
+    html = f'<p><img src="{_data_uri(2000, 500)}" alt="x"></p>'
+    result, stats = optimize_embedded_images(html, dpi=150, quality=85)
+
+    max_width, _ = max_image_size(150)
+    assert _decode_sizes(result) == [(max_width, round(500 * max_width / 2000))]
+    assert 'alt="x"' in result
+    assert stats['images'] == 1
+    assert stats['optimized'] == 1
+    assert stats['bytes_after'] < stats['bytes_before']
+
+
+def test_identical_images_are_processed_once():
+    """同じ画像は1回だけ処理され、すべての出現箇所が置き換わること"""
+    uri = _data_uri(1500, 1500)
+    html = f'<img src="{uri}"><p>text</p><img src="{uri}">'
+    result, stats = optimize_embedded_images(html, dpi=100, quality=85)
+
+    assert stats['images'] == 2
+    assert stats['unique'] == 1
+    assert uri not in result
+    assert len(set(_decode_sizes(result))) == 1
+
+
+def test_small_and_non_raster_images_are_kept():
+    """縮小不要で小さくならない画像・SVG・壊れた base64 はそのまま残ること"""
+    small = _data_uri(8, 8)
+    html = (
+        f'<img src="{small}">'
+        '<img src="data:image/svg+xml;base64,PHN2Zy8+">'
+        '<img src="data:image/png;base64,@@@">'
+    )
+    result, stats = optimize_embedded_images(html, dpi=150, quality=85)
+    assert small in result
+    assert 'data:image/svg+xml;base64,PHN2Zy8+' in result
+    assert stats['images'] == 1
+    assert stats['bytes_before'] == stats['bytes_after']
+
+
+def test_disabled_when_dpi_is_zero():
+    """dpi が 0 の場合は何もしないこと"""
+    html = f'<img src="{_data_uri(4000, 100)}">'
+    assert optimize_embedded_images(html, dpi=0, quality=85)[0] == html
@@ -0,0 +1,92 @@
+"""
+PDF生成ジョブストアのテスト
+
+ジョブの完了・失敗・上限・TTL と結果の合計サイズによる破棄を検証する
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from services.pdf_jobs import JOB_FAILED, JOB_SUCCEEDED, PdfJobStore
+from services.render_executor import PRIORITY_INTERACTIVE, RenderSaturatedError, shutdown_render_executor
+
+
+@pytest.fixture(autouse=True)
+def _reset_executor():
+    yield
+    shutdown_render_executor()
+
+
+def _fail():
+    raise RuntimeError('boom')
+
+
+def test_job_completes_and_expires_after_ttl():
+    """完了したジョブの結果が取得でき、TTL 経過後に破棄されること"""
+    store = PdfJobStore(ttl_seconds=60, max_pending=4, max_running=1, max_result_bytes=1024)
+
+    async def main():
+        job = store.submit(lambda: b'%PDF-1.4', filename='a.pdf', priority=PRIORITY_INTERACTIVE)
+        await job.task
+        return job
+
+    job = asyncio.run(main())
+    assert store.get(job.id) is job
+    assert job.status == JOB_SUCCEEDED
+    assert job.result == b'%PDF-1.4'
+    assert job.to_dict(store.ttl_seconds)['size'] == 8
+
+    assert store.purge_expired(now=time.time() + 61) == 1
+    assert store.get(job.id) is None
+
+
+def test_failed_job_records_error():
+    """生成に失敗したジョブは failed となりエラー内容を保持すること"""
+    store = PdfJobStore(ttl_seconds=60, max_pending=4, max_running=1, max_result_bytes=1024)
+
+    async def main():
+        job = store.submit(_fail, filename='a.pdf', priority=PRIORITY_INTERACTIVE)
+        await job.task
+        return job
+
+    job = asyncio.run(main())
+    assert job.status == JOB_FAILED
+    assert job.error == 'boom'
+    assert job.result is None
+
+
+def test_pending_jobs_are_capped():
+    """未完了ジョブ数が上限に達したら 429 で拒否されること"""
+    store = PdfJobStore(ttl_seconds=60, max_pending=1, max_running=1, max_result_bytes=1024)
+
+    async def main():
+        first = store.submit(time.sleep, 0.2, filename='a.pdf', priority=PRIORITY_INTERACTIVE)
+        with pytest.raises(RenderSaturatedError) as exc_info:
+            store.submit(time.sleep, 0, filename='b.pdf', priority=PRIORITY_INTERACTIVE)
+        await first.task
+        return exc_info.value
+
+    assert asyncio.run(main()).status_code == 429
+
+
+def test_results_are_capped_by_total_bytes():
+    """結果の合計が上限を超える場合は完了が古いジョブから破棄し、上限を単独で超える結果は失敗とすること"""
+    store = PdfJobStore(ttl_seconds=60, max_pending=4, max_running=1, max_result_bytes=1000)
+
+    async def run(size):
+        job = store.submit(lambda: b'%' * size, filename='a.pdf', priority=PRIORITY_INTERACTIVE)
+        await job.task
+        return job
+
+    async def main():
+        return [await run(400), await run(400), await run(400), await run(2000)]
+
+    oldest, middle, newest, too_large = asyncio.run(main())
+    assert store.get(oldest.id) is None
+    assert store.get(middle.id) is middle
+    assert store.get(newest.id) is newest
+    assert too_large.status == JOB_FAILED
+    assert too_large.result is None
+    assert store.stats()['result_bytes'] == 800
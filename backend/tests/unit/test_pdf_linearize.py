@@ -0,0 +1,55 @@
+"""
+PDF 線形化のテスト
+
+スタンプ済み PDF が線形化され、内容が保持されることを検証する
+"""
+
+import io
+
+import pytest
+from pypdf import PdfReader
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from services.pdf_linearize import linearize_pdf, linearize_pdf_file
+from services.pdf_stamp import stamp_confidentiality_file
+
+pikepdf = pytest.importorskip('pikepdf')
+
+
+def _make_pdf(pages: int) -> bytes:
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    for i in range(pages):
+        c.drawString(72, 700, f"page {i + 1}")
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def test_bytes_are_linearized():
+    """線形化後も全ページの本文が保持されること"""
+    linearized = linearize_pdf(_make_pdf(3))
+    with pikepdf.open(io.BytesIO(linearized)) as pdf:
+        assert pdf.is_linearized
+    pages = PdfReader(io.BytesIO(linearized)).pages
+    assert [f"page {i + 1}" in page.extract_text() for i, page in enumerate(pages)] == [True] * 3
+
+
+def test_stamped_file_is_linearized_in_place(tmp_path):
+    """追記スタンプ済みのファイルを置き換え、一時ファイルを残さないこと"""
+    path = tmp_path / 'out.pdf'
+    path.write_bytes(_make_pdf(2))
+    stamp_confidentiality_file(str(path), '社外秘')
+
+    linearize_pdf_file(str(path))
+
+    with pikepdf.open(path) as pdf:
+        assert pdf.is_linearized
+    assert all('社外秘' in page.extract_text() for page in PdfReader(str(path)).pages)
+    assert [p.name for p in tmp_path.iterdir()] == ['out.pdf']
+
+
+def test_invalid_pdf_is_returned_unchanged():
+    """線形化できない入力はそのまま返すこと"""
+    assert linearize_pdf(b'not a pdf') == b'not a pdf'
@@ -0,0 +1,78 @@
+"""
+先頭ページプレビューのテスト
+
+本文の切り詰めが最上位の要素単位で行われること、先頭ページが画像化されることを検証する
+"""
+
+import asyncio
+import io
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from services.pdf_preview import IMAGE_WEIGHT, PAGE_GAP, leading_html, rasterize_pages
+
+
+def test_leading_html_cuts_between_top_level_elements():
+    """予算に達した後の最上位要素の境界で切り、入れ子の途中では切らないこと"""
+    html = '<h2>一</h2><p>' + 'あ' * 30 + '<b>太字</b></p><h2>二</h2><p>い</p>'
+    body, truncated = leading_html(html, 20)
+    assert truncated
+    assert body == '<h2>一</h2><p>' + 'あ' * 30 + '<b>太字</b></p>'
+
+
+def test_leading_html_keeps_short_body():
+    """予算に満たない本文はそのまま返すこと"""
+    html = '<h2>一</h2><p>短い本文</p>'
+    assert leading_html(html, 1000) == (html, False)
+
+
+def test_images_count_towards_budget():
+    """画像は IMAGE_WEIGHT 文字分として数えること"""
+    html = '<p><img src="data:image/png;base64,AAAA"></p><p>後続</p>'
+    body, truncated = leading_html(html, IMAGE_WEIGHT)
+    assert truncated
+    assert body == '<p><img src="data:image/png;base64,AAAA"></p>'
+
+
+def test_rasterize_stacks_leading_pages():
+    """指定ページ数（PDF のページ数が上限）を縦に並べた PNG になること"""
+    pytest.importorskip('pymupdf')
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    for i in range(3):
+        c.drawString(72, 700, f"page {i + 1}")
+        c.showPage()
+    c.save()
+
+    single = Image.open(io.BytesIO(rasterize_pages(buffer.getvalue(), 1, 36)))
+    assert single.format == 'PNG'
+    assert single.size == (298, 421)
+
+    stacked = Image.open(io.BytesIO(rasterize_pages(buffer.getvalue(), 5, 36)))
+    assert stacked.size == (298, 421 * 3 + PAGE_GAP * 2)
+
+
+def test_preview_cache_lookup_runs_off_event_loop(monkeypatch):
+    """キャッシュの参照（本文全体のハッシュ）はイベントループ外で行われること"""
+    from app.routes import pdf_routes
+    loops = []
+
+    def fake_cached_preview(meeting_info, minutes_html_raw, pages, dpi):
+        try:
+            loops.append(asyncio.get_running_loop())
+        except RuntimeError:
+            loops.append(None)
+        return b'png'
+
+    monkeypatch.setattr(pdf_routes, 'cached_minutes_preview', fake_cached_preview)
+    app = FastAPI()
+    app.include_router(pdf_routes.router)
+    response = TestClient(app).post('/preview', json={'minutesHtml': '<p>x</p>'})
+    assert response.status_code == 200
+    assert response.content == b'png'
+    assert loops == [None]
@@ -0,0 +1,126 @@
+"""
+PDF生成サービスのテスト
+
+プロファイル選択と、代替の wkhtmltopdf による入出力経路（単発プロセスは標準入出力、
+常駐ワーカーはスクラッチディレクトリの作業ファイル）を検証する
+"""
+
+import json
+import os
+import stat
+import sys
+
+import pytest
+
+from app.config import get_settings
+from services import pdf_service
+from services.pdf_service import (
+    RENDER_PROFILE_FAST, RENDER_PROFILE_SCRIPTED, generate_pdf_from_html, select_render_profile,
+)
+from services.renderer_pool import RendererPool
+
+# 引数・入力を LOG に記録して reportlab で1ページの PDF を出力する代替 wkhtmltopdf
+FAKE_WKHTMLTOPDF = """
+import io, json, shlex, sys
+from reportlab.pdfgen import canvas
+
+LOG = {log!r}
+
+def render(args, stdin_html=None):
+    src, dst = args[-2], args[-1]
+    html = stdin_html if src == '-' else open(src, 'rb').read()
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf)
+    c.drawString(72, 700, 'page')
+    c.showPage()
+    c.save()
+    with open(LOG, 'a') as f:
+        f.write(json.dumps({{'args': args, 'html': html.decode('utf-8')}}) + '\\n')
+    if dst == '-':
+        sys.stdout.buffer.write(buf.getvalue())
+    else:
+        open(dst, 'wb').write(buf.getvalue())
+    sys.stderr.write('Done\\n')
+    sys.stderr.flush()
+
+if '--read-args-from-stdin' in sys.argv:
+    for line in sys.stdin:
+        render(shlex.split(line))
+else:
+    render(sys.argv[1:], sys.stdin.buffer.read() if sys.argv[-2] == '-' else None)
+"""
+
+
+def test_script_free_html_uses_fast_profile():
+    """スクリプトを含まない議事録 HTML は JavaScript なしのプロファイルになること"""
+    html = '<html><body><h2>議題</h2><p class="action-item">対応する</p><img src="data:image/png;base64,AAAA"></body></html>'
+    assert select_render_profile(html) == RENDER_PROFILE_FAST
+
+
+def test_scripted_html_keeps_javascript_profile():
+    """script タグ・イベント属性・javascript: URL を含む場合は従来プロファイルになること"""
+    assert select_render_profile('<p>x</p><SCRIPT>alert(1)</SCRIPT>') == RENDER_PROFILE_SCRIPTED
+    assert select_render_profile('<body onload="init()">') == RENDER_PROFILE_SCRIPTED
+    assert select_render_profile('<a href="javascript:void(0)">x</a>') == RENDER_PROFILE_SCRIPTED
+
+
+@pytest.fixture
+def fake_renderer(tmp_path, monkeypatch):
+    """代替 wkhtmltopdf を使わせ、(実行ファイル, 呼び出し記録を返す関数) を返す"""
+    log = tmp_path / 'calls.jsonl'
+    executable = tmp_path / 'wkhtmltopdf'
+    executable.write_text(f'#!{sys.executable}\n' + FAKE_WKHTMLTOPDF.format(log=str(log)))
+    executable.chmod(executable.stat().st_mode | stat.S_IXUSR)
+    monkeypatch.setattr(pdf_service, 'wkhtmltopdf_path', lambda: str(executable))
+
+    def calls():
+        return [json.loads(line) for line in log.read_text().splitlines()] if log.exists() else []
+    return str(executable), calls
+
+
+posix_only = pytest.mark.skipif(os.name != 'posix', reason='代替 wkhtmltopdf はシバン付きスクリプトで起動する')
+
+
+@posix_only
+def test_one_shot_render_uses_stdin_and_stdout(fake_renderer, tmp_path, monkeypatch):
+    """単発プロセスでは HTML を標準入力で渡し、PDF を標準出力から読み、作業ファイルを作らないこと"""
+    import tempfile
+    executable, calls = fake_renderer
+    monkeypatch.setattr(pdf_service, 'get_renderer_pool', lambda _: None)
+    temp_dir = tmp_path / 'tmp'
+    temp_dir.mkdir()
+    monkeypatch.setattr(tempfile, 'tempdir', str(temp_dir))
+
+    pdf = generate_pdf_from_html('<p>標準入力の本文</p>', confidential_level='社外秘')
+
+    assert pdf.startswith(b'%PDF')
+    [call] = calls()
+    assert call['args'][-2:] == ['-', '-']
+    assert '標準入力の本文' in call['html']
+    # 機密レベルは後処理のスタンプで付与するため、ヘッダー HTML は渡さない
+    assert '--header-html' not in call['args']
+    assert list(temp_dir.iterdir()) == []
+
+
+@posix_only
+def test_pool_render_uses_scratch_dir_and_cleans_up(fake_renderer, tmp_path, monkeypatch):
+    """常駐ワーカーの作業ファイルはスクラッチディレクトリに置き、生成後に削除すること"""
+    executable, calls = fake_renderer
+    scratch = tmp_path / 'scratch'
+    scratch.mkdir()
+    monkeypatch.setattr(get_settings(), 'PDF_SCRATCH_DIR', str(scratch))
+    pool = RendererPool(executable, 1, 10)
+    monkeypatch.setattr(pdf_service, 'get_renderer_pool', lambda _: pool)
+    try:
+        pdf = generate_pdf_from_html('<p>作業ファイルの本文</p>', use_header=False)
+    finally:
+        pool.shutdown()
+
+    assert pdf.startswith(b'%PDF')
+    [call] = calls()
+    html_path, pdf_path = call['args'][-2:]
+    assert os.path.dirname(os.path.dirname(html_path)) == str(scratch)
+    assert os.path.dirname(pdf_path) == os.path.dirname(html_path)
+    assert '作業ファイルの本文' in call['html']
+    assert '--header-html' not in call['args']
+    assert list(scratch.iterdir()) == []
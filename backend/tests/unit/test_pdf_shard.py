@@ -0,0 +1,136 @@
+"""
+議事録PDF分割レンダリングのテスト
+
+章の区切り・シャードへのまとめ方・PDF の連結を検証する
+"""
+
+import asyncio
+import io
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from pypdf import PdfReader
+from reportlab.pdfgen import canvas
+
+from services import pdf_shard
+from services.minutes_pdf_service import normalize_meeting
+from services.pdf_shard import concatenate_pdfs, plan_shards, render_sharded, split_sections
+from services.render_cancel import run_process
+from services.render_executor import RenderExecutor
+
+
+def test_split_at_top_level_headings_only():
+    """最上位の h2 の直前でのみ区切られ、入れ子の見出しでは区切られないこと"""
+    html = '<p>前文</p><h2>議題1</h2><p>a</p><div><h2>引用</h2></div><h2>議題2</h2><p>b<br></p>'
+    assert split_sections(html) == [
+        '<p>前文</p>',
+        '<h2>議題1</h2><p>a</p><div><h2>引用</h2></div>',
+        '<h2>議題2</h2><p>b<br></p>',
+    ]
+
+
+def test_split_prefers_highest_heading_level():
+    """h1 があれば h1 で区切り、h2 では区切らないこと"""
+    html = '<h1>第1部</h1><h2>a</h2><h1>第2部</h1><h2>b</h2>'
+    assert split_sections(html) == ['<h1>第1部</h1><h2>a</h2>', '<h1>第2部</h1><h2>b</h2>']
+    assert split_sections('<p>見出しなし</p>') == ['<p>見出しなし</p>']
+
+
+def test_plan_shards_balances_and_keeps_order():
+    """章の順序を保ったまま、最大シャード数以内でおおよそ均等にまとめること"""
+    sections = ['a' * 10] * 8
+    shards = plan_shards(sections, 3)
+    assert len(shards) == 3
+    assert ''.join(shards) == ''.join(sections)
+    assert all(len(s) >= 20 for s in shards)
+
+    # 章の数がシャード数より少ない場合は章ごと
+    assert plan_shards(['x', 'y'], 4) == ['x', 'y']
+    assert plan_shards(sections, 1) == [''.join(sections)]
+
+
+def _pdf(pages):
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer)
+    for i in range(pages):
+        c.drawString(72, 720, f'page {i}')
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def test_concatenate_preserves_page_order():
+    """連結した PDF のページ数・順序が元の PDF の並びどおりであること"""
+    merged = PdfReader(io.BytesIO(concatenate_pdfs([_pdf(2), _pdf(3)])))
+    assert len(merged.pages) == 5
+    assert [p.extract_text().strip() for p in merged.pages] == [
+        'page 0', 'page 1', 'page 0', 'page 1', 'page 2'
+    ]
+
+
+MEETING = normalize_meeting({'会議タイトル': 'shard'})
+SHARDS = [f'<h2>{i}</h2><p>本文</p>' for i in range(4)]
+
+
+def run_in_executor(executor, func, *args, **kwargs):
+    async def main():
+        return await executor.run(func, *args, **kwargs)
+    return asyncio.run(main())
+
+
+def test_shard_concurrency_is_bounded_by_executor_capacity(monkeypatch):
+    """並行して実行するシャードは実行器の空き枠の数まで（実行器の外では順に実行）であること"""
+    lock = threading.Lock()
+    running = [0]
+    peak = [0]
+
+    def fake_render(html, **kwargs):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.1)
+        with lock:
+            running[0] -= 1
+        return _pdf(1)
+
+    monkeypatch.setattr(pdf_shard, 'generate_pdf_from_html', fake_render)
+    executor = RenderExecutor(max_concurrency=2, max_queue=0, queue_timeout=5)
+    try:
+        pdf = run_in_executor(executor, render_sharded, MEETING, SHARDS, '2025-01-01')
+        assert len(PdfReader(io.BytesIO(pdf)).pages) == 4
+        assert peak[0] == 2
+        assert executor.stats()['active'] == 0
+    finally:
+        executor.shutdown()
+
+    peak[0] = 0
+    render_sharded(MEETING, SHARDS, '2025-01-01')
+    assert peak[0] == 1
+
+
+def test_failed_shard_stops_the_others(monkeypatch):
+    """1つのシャードが失敗したら実行中のシャードを終了させ、未着手のシャードは実行しないこと"""
+    started = []
+
+    def fake_render(html, **kwargs):
+        index = int(html.split('<h2>')[1].split('</h2>')[0])
+        started.append(index)
+        if index == 0:
+            time.sleep(0.1)
+            raise RuntimeError('wkhtmltopdf failed')
+        run_process([sys.executable, '-c', 'import time; time.sleep(30)'], b'', subprocess.DEVNULL, timeout=30)
+        return _pdf(1)
+
+    monkeypatch.setattr(pdf_shard, 'generate_pdf_from_html', fake_render)
+    executor = RenderExecutor(max_concurrency=2, max_queue=0, queue_timeout=5)
+    begun = time.monotonic()
+    try:
+        with pytest.raises(RuntimeError, match='wkhtmltopdf failed'):
+            run_in_executor(executor, render_sharded, MEETING, SHARDS, '2025-01-01')
+    finally:
+        executor.shutdown()
+    assert time.monotonic() - begun < 5
+    assert sorted(started) == [0, 1]
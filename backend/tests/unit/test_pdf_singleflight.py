@@ -0,0 +1,247 @@
+"""
+同一内容の同時レンダリング集約のテスト
+
+実行中の同一キーの要求が1回の実行結果を共有すること、失敗も共有されることを検証する
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services.pdf_singleflight import SingleFlight
+from services.render_cancel import REASON_DISCONNECTED, RenderCancelled
+from services.render_executor import RenderExecutor
+
+
+def run_concurrently(flights, key, func, count, share=None):
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        futures = [pool.submit(flights.do, key, func, share) for _ in range(count)]
+        # 全員が登録されるまで先行要求を待たせる
+        while flights.stats()['waiting'] < count - 1:
+            time.sleep(0.01)
+        release.set()
+        return [f.result() for f in futures]
+
+
+release = threading.Event()
+
+
+@pytest.fixture(autouse=True)
+def reset_release():
+    release.clear()
+
+
+def test_concurrent_identical_requests_share_one_call():
+    """同一キーの同時要求は1回だけ実行され、全員が同じ結果を受け取ること"""
+    flights = SingleFlight()
+    calls = []
+
+    def render():
+        calls.append(1)
+        release.wait(5)
+        return b'%PDF'
+
+    results = run_concurrently(flights, 'k', render, 4)
+
+    assert len(calls) == 1
+    assert sorted(coalesced for _, coalesced in results) == [False, True, True, True]
+    assert all(result == b'%PDF' for result, _ in results)
+    assert flights.stats() == {'in_flight': 0, 'waiting': 0, 'leaders': 1, 'coalesced': 3}
+
+
+def test_failure_is_shared_and_key_released():
+    """先行要求の失敗は待機中の要求にも返り、以後の要求は再実行されること"""
+    flights = SingleFlight()
+
+    def fail():
+        release.wait(5)
+        raise RuntimeError('wkhtmltopdf failed')
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(flights.do, 'k', fail) for _ in range(2)]
+        while flights.stats()['waiting'] < 1:
+            time.sleep(0.01)
+        release.set()
+        for future in futures:
+            with pytest.raises(RuntimeError, match='wkhtmltopdf failed'):
+                future.result()
+
+    assert flights.do('k', lambda: b'ok') == (b'ok', False)
+
+
+def test_share_converts_result_only_for_waiters():
+    """share は待機中の要求がある場合のみ呼ばれ、待機者には変換後の値が渡ること"""
+    flights = SingleFlight()
+    shared = []
+
+    def share(result):
+        shared.append(result)
+        return b'bytes'
+
+    assert flights.do('alone', lambda: None, share) == (None, False)
+    assert shared == []
+
+    def render():
+        release.wait(5)
+        return None
+
+    results = run_concurrently(flights, 'k', render, 2, share)
+    assert sorted(results, key=lambda r: r[1]) == [(None, False), (b'bytes', True)]
+    assert shared == [None]
+
+
+def test_waiter_rerenders_when_only_leader_is_cancelled():
+    """先行要求がクライアント切断で取り消された場合、待機中の要求が生成し直すこと"""
+    flights = SingleFlight()
+    calls = []
+
+    def render():
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(5)
+            raise RenderCancelled(REASON_DISCONNECTED)
+        return b'%PDF'
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flights.do, 'k', render)
+        while flights.stats()['in_flight'] < 1:
+            time.sleep(0.01)
+        waiter = pool.submit(flights.do, 'k', render)
+        while flights.stats()['waiting'] < 1:
+            time.sleep(0.01)
+        release.set()
+        with pytest.raises(RenderCancelled):
+            leader.result()
+        assert waiter.result() == (b'%PDF', False)
+
+    assert len(calls) == 2
+
+
+def test_waiters_lend_executor_slot_to_other_renders():
+    """同一内容の生成を待つ要求は実行器の枠を譲り、別内容の生成が先に実行できること"""
+    flights = SingleFlight()
+    executor = RenderExecutor(max_concurrency=2, max_queue=2, queue_timeout=5)
+
+    def render():
+        release.wait(5)
+        return b'%PDF'
+
+    async def main():
+        leader = asyncio.create_task(executor.run(flights.do, 'k', render))
+        waiter = asyncio.create_task(executor.run(flights.do, 'k', render))
+        while flights.stats()['waiting'] < 1:
+            await asyncio.sleep(0.01)
+        # 待機中の要求が枠を譲っているため、別内容の生成は先行要求の完了を待たずに実行される
+        other = await asyncio.wait_for(executor.run(lambda: 'other'), timeout=2)
+        assert executor.stats()['active'] == 1
+        release.set()
+        results = await asyncio.gather(leader, waiter)
+        await asyncio.sleep(0)
+        return other, results, executor.stats()['active']
+
+    try:
+        other, results, active = asyncio.run(main())
+    finally:
+        release.set()
+        executor.shutdown()
+    assert other == 'other'
+    assert results == [(b'%PDF', False), (b'%PDF', True)]
+    assert active == 0
+
+
+def test_waiter_reclaims_slot_when_rerendering():
+    """先行要求が取り消されて生成し直す要求は、譲った枠を取り直してから生成すること"""
+    flights = SingleFlight()
+    executor = RenderExecutor(max_concurrency=2, max_queue=2, queue_timeout=5)
+    rerender = threading.Event()
+    calls = []
+
+    def render():
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(5)
+            raise RenderCancelled(REASON_DISCONNECTED)
+        rerender.wait(5)
+        return b'%PDF'
+
+    async def main():
+        leader = asyncio.create_task(executor.run(flights.do, 'k', render))
+        while flights.stats()['in_flight'] < 1:
+            await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(executor.run(flights.do, 'k', render))
+        while flights.stats()['waiting'] < 1:
+            await asyncio.sleep(0.01)
+        release.set()
+        with pytest.raises(RenderCancelled):
+            await leader
+        while len(calls) < 2:
+            await asyncio.sleep(0.01)
+        # 先行要求の枠は返され、生成し直している要求が枠を保持している
+        active = executor.stats()['active']
+        rerender.set()
+        return await waiter, active
+
+    try:
+        result, active = asyncio.run(main())
+    finally:
+        release.set()
+        rerender.set()
+        executor.shutdown()
+    assert result == (b'%PDF', False)
+    assert active == 1
+
+
+def test_reclaim_waits_for_a_free_slot():
+    """譲った枠を取り直す要求は、他の要求が枠を使い切っている間は生成を始めないこと"""
+    flights = SingleFlight()
+    executor = RenderExecutor(max_concurrency=2, max_queue=2, queue_timeout=5)
+    other_release = threading.Event()
+    active_at_start = []
+    calls = []
+
+    def render():
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(5)
+            raise RenderCancelled(REASON_DISCONNECTED)
+        active_at_start.append(executor.stats()['active'])
+        return b'%PDF'
+
+    def other():
+        active_at_start.append(executor.stats()['active'])
+        other_release.wait(5)
+        return 'other'
+
+    async def main():
+        leader = asyncio.create_task(executor.run(flights.do, 'k', render))
+        while flights.stats()['in_flight'] < 1:
+            await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(executor.run(flights.do, 'k', render))
+        while flights.stats()['waiting'] < 1:
+            await asyncio.sleep(0.01)
+        # 待機中の要求が譲った枠と、先行要求の終了後に空く枠を他の要求が使う
+        others = [asyncio.create_task(executor.run(other)) for _ in range(2)]
+        while executor.stats()['waiting'] < 1:
+            await asyncio.sleep(0.01)
+        release.set()
+        with pytest.raises(RenderCancelled):
+            await leader
+        await asyncio.sleep(0.3)
+        rerendered_early = len(calls) > 1
+        other_release.set()
+        result = await waiter
+        await asyncio.gather(*others)
+        return rerendered_early, result
+
+    try:
+        rerendered_early, result = asyncio.run(main())
+    finally:
+        release.set()
+        other_release.set()
+        executor.shutdown()
+    assert not rerendered_early
+    assert result == (b'%PDF', False)
+    assert max(active_at_start) <= 2
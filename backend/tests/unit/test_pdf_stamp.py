@@ -0,0 +1,103 @@
+"""
+機密レベルスタンプ後処理のテスト
+
+ヘッダーなしの PDF 全ページにバッジが合成されることを検証する
+"""
+
+import io
+from pathlib import Path
+
+import pytest
+from pypdf import PdfReader
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from services import reportlab_fonts
+from services.pdf_stamp import stamp_confidentiality, stamp_confidentiality_file
+
+DEJAVU = Path('/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+
+
+def _make_pdf(pages: int) -> bytes:
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    for i in range(pages):
+        c.drawString(72, 700, f"page {i + 1}")
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def test_every_page_is_stamped():
+    """全ページに機密レベルが描画され、本文も保持されること"""
+    stamped = stamp_confidentiality(_make_pdf(3), '社外秘')
+    pages = PdfReader(io.BytesIO(stamped)).pages
+    assert len(pages) == 3
+    for i, page in enumerate(pages):
+        text = page.extract_text()
+        assert f"page {i + 1}" in text
+        assert '社外秘' in text
+
+
+def test_empty_level_returns_input_unchanged():
+    """機密レベルが空ならスタンプしないこと"""
+    pdf = _make_pdf(1)
+    assert stamp_confidentiality(pdf, '') is pdf
+
+
+def test_file_stamp_appends_incremental_update(tmp_path):
+    """ファイル版は元の PDF を書き換えずに末尾へ追記し、全ページにスタンプが入ること"""
+    original = _make_pdf(3)
+    path = tmp_path / 'out.pdf'
+    path.write_bytes(original)
+
+    stamp_confidentiality_file(str(path), '極秘')
+
+    stamped = path.read_bytes()
+    assert stamped.startswith(original)
+    pages = PdfReader(io.BytesIO(stamped)).pages
+    assert len(pages) == 3
+    for i, page in enumerate(pages):
+        text = page.extract_text()
+        assert f"page {i + 1}" in text
+        assert '極秘' in text
+
+
+def _stamp_fonts(pdf_bytes):
+    """1ページ目で本文（Helvetica）以外に使われているフォントの (BaseFont, 埋め込みの有無) の一覧"""
+    resources = PdfReader(io.BytesIO(pdf_bytes)).pages[0]['/Resources']
+    fonts = []
+    for font in resources['/Font'].values():
+        font = font.get_object()
+        if font['/BaseFont'] == '/Helvetica':
+            continue
+        if '/DescendantFonts' in font:
+            font = font['/DescendantFonts'][0].get_object()
+        descriptor = font['/FontDescriptor'].get_object() if '/FontDescriptor' in font else {}
+        fonts.append((str(font['/BaseFont']), any(k in descriptor for k in ('/FontFile', '/FontFile2', '/FontFile3'))))
+    return fonts
+
+
+@pytest.fixture
+def fresh_fonts(monkeypatch):
+    monkeypatch.setattr(reportlab_fonts, '_font_name', None)
+    monkeypatch.setattr(reportlab_fonts, '_stats', {})
+
+
+def test_stamp_embeds_truetype_font(fresh_fonts, monkeypatch):
+    """TrueType フォントが見つかる場合はスタンプの文字がそのフォントで埋め込まれること"""
+    if not DEJAVU.exists():
+        pytest.skip('DejaVu フォントがありません')
+    monkeypatch.setattr(reportlab_fonts, 'font_candidates', lambda: iter([(str(DEJAVU), 'Stamp Test Sans')]))
+    stamped = stamp_confidentiality(_make_pdf(1), 'Internal')
+    fonts = _stamp_fonts(stamped)
+    assert len(fonts) == 1
+    assert fonts[0][1]
+    assert 'Internal' in PdfReader(io.BytesIO(stamped)).pages[0].extract_text()
+
+
+def test_stamp_falls_back_to_cid_font(fresh_fonts, monkeypatch):
+    """TrueType フォントが見つからない場合のみ埋め込みなしの CID フォントを使うこと"""
+    monkeypatch.setattr(reportlab_fonts, 'font_candidates', lambda: iter([]))
+    fonts = _stamp_fonts(stamp_confidentiality(_make_pdf(1), '社外秘'))
+    assert fonts == [('/HeiseiKakuGo-W5', False)]
@@ -0,0 +1,154 @@
+"""
+レンダリング取り消しのテスト
+
+クライアント切断・期限切れでサブプロセスがプロセスグループごと直ちに終了し、
+待ち行列の要求が実行されずに破棄されることを検証する
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from services import render_executor
+from services.render_cancel import (
+    REASON_DEADLINE, REASON_DISCONNECTED, CancelToken, RenderCancelled, run_process, use_token,
+)
+from services.render_executor import PRIORITY_INTERACTIVE, RenderExecutor, run_render_cancellable
+
+# 長時間待機するコマンド（wkhtmltopdf の代わり）
+SLOW_PROCESS = [sys.executable, '-c', 'import time; time.sleep(30)']
+
+
+def slow_process_with_child(pid_file):
+    """子プロセスを1つ起動して PID を pid_file に書き、自身も長時間待機するコマンド"""
+    return [sys.executable, '-c', (
+        'import subprocess, sys, time\n'
+        'child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])\n'
+        f'open({str(pid_file)!r}, "w").write(str(child.pid))\n'
+        'time.sleep(30)\n'
+    )]
+
+
+class FakeRequest:
+    """is_disconnected() が disconnect_after 秒後に True になるリクエスト"""
+
+    def __init__(self, disconnect_after=None, headers=None):
+        self.headers = headers or {}
+        self._disconnect_at = None if disconnect_after is None else time.monotonic() + disconnect_after
+
+    async def is_disconnected(self):
+        return self._disconnect_at is not None and time.monotonic() >= self._disconnect_at
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    executor = RenderExecutor(max_concurrency=1, max_queue=4, queue_timeout=10)
+    monkeypatch.setattr(render_executor, '_executor', executor)
+    yield executor
+    executor.shutdown()
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # 終了済みで回収待ちのプロセス（ゾンビ）は終了とみなす
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().split()[2] != 'Z'
+    except OSError:
+        return True
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='プロセスグループは POSIX のみ')
+def test_cancel_kills_process_group_promptly(tmp_path):
+    """取り消すと wkhtmltopdf が起動した子プロセスを含むプロセスグループが直ちに終了すること"""
+    pid_file = tmp_path / 'child.pid'
+    token = CancelToken()
+    errors = []
+
+    def render():
+        with use_token(token):
+            try:
+                run_process(slow_process_with_child(pid_file), b'', subprocess.DEVNULL, timeout=30)
+            except RenderCancelled as e:
+                errors.append(e)
+
+    thread = threading.Thread(target=render)
+    thread.start()
+    while not pid_file.exists() or not pid_file.read_text():
+        time.sleep(0.05)
+    child = int(pid_file.read_text())
+
+    started = time.monotonic()
+    token.cancel(REASON_DISCONNECTED)
+    thread.join(5)
+
+    assert time.monotonic() - started < 2
+    assert [e.status_code for e in errors] == [499]
+    deadline = time.monotonic() + 2
+    while pid_alive(child) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not pid_alive(child)
+
+
+def test_deadline_caps_subprocess_timeout():
+    """期限を過ぎると timeout より前に 504 相当で中止されること"""
+    token = CancelToken(deadline=time.monotonic() + 0.5)
+    started = time.monotonic()
+    with use_token(token), pytest.raises(RenderCancelled) as info:
+        run_process(SLOW_PROCESS, b'', subprocess.DEVNULL, timeout=30)
+    assert time.monotonic() - started < 2
+    assert info.value.reason == REASON_DEADLINE
+    assert info.value.status_code == 504
+
+
+def test_disconnected_client_cancels_running_render(executor):
+    """実行中にクライアントが切断すると中止され、実行枠が解放されること"""
+    async def main():
+        request = FakeRequest(disconnect_after=0.3)
+        return await run_render_cancellable(request, run_process, SLOW_PROCESS, b'', subprocess.DEVNULL, 30,
+                                            priority=PRIORITY_INTERACTIVE)
+
+    started = time.monotonic()
+    with pytest.raises(RenderCancelled) as info:
+        asyncio.run(main())
+    assert info.value.reason == REASON_DISCONNECTED
+    assert time.monotonic() - started < 3
+    assert executor.stats()['active'] == 0
+
+
+def test_queued_request_is_dropped_without_running(executor):
+    """待ち行列で待機中に切断された要求は実行されないこと"""
+    calls = []
+
+    async def main():
+        busy = asyncio.ensure_future(
+            run_render_cancellable(FakeRequest(), time.sleep, 1, priority=PRIORITY_INTERACTIVE)
+        )
+        await asyncio.sleep(0.1)
+        with pytest.raises(RenderCancelled):
+            await run_render_cancellable(FakeRequest(disconnect_after=0.2), calls.append, 'ran',
+                                         priority=PRIORITY_INTERACTIVE)
+        await busy
+
+    asyncio.run(main())
+    assert calls == []
+
+
+def test_client_deadline_header(executor):
+    """X-Request-Timeout ヘッダーの期限を過ぎた要求は 504 相当で中止されること"""
+    async def main():
+        request = FakeRequest(headers={'X-Request-Timeout': '0.3'})
+        return await run_render_cancellable(request, run_process, SLOW_PROCESS, b'', subprocess.DEVNULL, 30,
+                                            priority=PRIORITY_INTERACTIVE)
+
+    with pytest.raises(RenderCancelled) as info:
+        asyncio.run(main())
+    assert info.value.status_code == 504
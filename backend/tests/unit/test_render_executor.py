@@ -0,0 +1,192 @@
+"""
+PDFレンダリング実行器のテスト
+
+同時実行数・待ち行列の上限を超えた場合の振る舞いを検証する
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.render_executor import (
+    PRIORITY_BATCH, PRIORITY_INTERACTIVE, PRIORITY_MAIL, RenderExecutor, RenderSaturatedError,
+)
+
+
+def test_run_returns_result_off_event_loop():
+    """ブロッキング関数がイベントループ外のスレッドで実行されること"""
+    executor = RenderExecutor(max_concurrency=1, max_queue=0, queue_timeout=1)
+
+    async def main():
+        return await executor.run(lambda: threading.current_thread().name)
+
+    try:
+        assert asyncio.run(main()).startswith('pdf-render')
+    finally:
+        executor.shutdown()
+
+
+def test_queue_full_is_rejected_with_429():
+    """同時実行数 + 待ち行列を超えたリクエストは 429 で拒否されること"""
+    executor = RenderExecutor(max_concurrency=1, max_queue=1, queue_timeout=5)
+
+    async def main():
+        tasks = [asyncio.create_task(executor.run(time.sleep, 0.2)) for _ in range(3)]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    try:
+        results = asyncio.run(main())
+    finally:
+        executor.shutdown()
+
+    errors = [r for r in results if isinstance(r, RenderSaturatedError)]
+    assert len(errors) == 1
+    assert errors[0].status_code == 429
+
+
+def test_queue_timeout_is_rejected_with_503():
+    """待ち時間が上限を超えたリクエストは 503 で拒否されること"""
+    executor = RenderExecutor(max_concurrency=1, max_queue=1, queue_timeout=0.05)
+
+    async def main():
+        first = asyncio.create_task(executor.run(time.sleep, 0.3))
+        await asyncio.sleep(0.01)
+        with pytest.raises(RenderSaturatedError) as exc_info:
+            await executor.run(time.sleep, 0)
+        await first
+        return exc_info.value
+
+    try:
+        error = asyncio.run(main())
+    finally:
+        executor.shutdown()
+
+    assert error.status_code == 503
+
+
+def test_cancelled_caller_keeps_slot_until_thread_finishes():
+    """呼び出し側が取り消されても、スレッドの処理が終わるまで実行枠を返さないこと"""
+    executor = RenderExecutor(max_concurrency=1, max_queue=1, queue_timeout=5)
+    release = threading.Event()
+    order = []
+
+    def blocking():
+        release.wait(5)
+        order.append('first')
+
+    async def main():
+        first = asyncio.create_task(executor.run(blocking))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert executor.stats()['active'] == 1
+
+        second = asyncio.create_task(executor.run(lambda: order.append('second')))
+        await asyncio.sleep(0.05)
+        assert not second.done()
+        release.set()
+        await second
+        await asyncio.sleep(0)
+        return executor.stats()['active']
+
+    try:
+        assert asyncio.run(main()) == 0
+    finally:
+        release.set()
+        executor.shutdown()
+    assert order == ['first', 'second']
+
+
+def _record(order, name):
+    order.append(name)
+
+
+def test_higher_priority_runs_first():
+    """空きができたら到着順に関係なく interactive > mail > batch の順に実行されること"""
+    executor = RenderExecutor(max_concurrency=1, max_queue=8, queue_timeout=5)
+    order = []
+
+    async def main():
+        blocker = asyncio.create_task(executor.run(time.sleep, 0.2, priority=PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0.05)
+        tasks = [asyncio.create_task(executor.run(_record, order, p, priority=p))
+                 for p in (PRIORITY_BATCH, PRIORITY_MAIL, PRIORITY_INTERACTIVE)]
+        await asyncio.sleep(0)
+        await asyncio.gather(blocker, *tasks)
+
+    try:
+        asyncio.run(main())
+    finally:
+        executor.shutdown()
+
+    assert order == [PRIORITY_INTERACTIVE, PRIORITY_MAIL, PRIORITY_BATCH]
+
+
+def test_class_limit_leaves_room_for_interactive():
+    """batch は上限数までしか同時に実行されず、残りの枠で interactive が待たずに実行されること"""
+    executor = RenderExecutor(max_concurrency=2, max_queue=8, queue_timeout=5, class_limits={PRIORITY_BATCH: 1})
+
+    async def main():
+        batch = [asyncio.create_task(executor.run(time.sleep, 0.3, priority=PRIORITY_BATCH)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        stats = executor.stats()['classes'][PRIORITY_BATCH]
+        started = time.monotonic()
+        await executor.run(time.sleep, 0, priority=PRIORITY_INTERACTIVE)
+        waited = time.monotonic() - started
+        await asyncio.gather(*batch)
+        return stats, waited
+
+    try:
+        stats, waited = asyncio.run(main())
+    finally:
+        executor.shutdown()
+
+    assert stats == {'active': 1, 'waiting': 2, 'limit': 1}
+    assert waited < 0.2
+
+
+def test_starving_low_priority_request_is_promoted():
+    """低優先度の要求が starvation_seconds 以上待つと、後続の高優先度より先に実行されること"""
+    executor = RenderExecutor(max_concurrency=1, max_queue=16, queue_timeout=5, starvation_seconds=0.2)
+    order = []
+
+    async def main():
+        # interactive が途切れず到着し続ける状況を作る
+        tasks = [asyncio.create_task(executor.run(time.sleep, 0.1, priority=PRIORITY_INTERACTIVE))]
+        await asyncio.sleep(0.01)
+        tasks.append(asyncio.create_task(executor.run(_record, order, PRIORITY_BATCH, priority=PRIORITY_BATCH)))
+        for i in range(6):
+            tasks.append(asyncio.create_task(executor.run(_record, order, i, priority=PRIORITY_INTERACTIVE)))
+            tasks.append(asyncio.create_task(executor.run(time.sleep, 0.1, priority=PRIORITY_INTERACTIVE)))
+            await asyncio.sleep(0.05)
+        await asyncio.gather(*tasks)
+
+    try:
+        asyncio.run(main())
+    finally:
+        executor.shutdown()
+
+    assert order.index(PRIORITY_BATCH) < len(order) - 1
+
+
+def test_lower_priority_waiters_do_not_block_admission():
+    """待ち行列が低優先度の要求で埋まっていても interactive は受け付けられること"""
+    executor = RenderExecutor(max_concurrency=1, max_queue=1, queue_timeout=5)
+
+    async def main():
+        blocker = asyncio.create_task(executor.run(time.sleep, 0.1, priority=PRIORITY_BATCH))
+        await asyncio.sleep(0.01)
+        queued = asyncio.create_task(executor.run(time.sleep, 0, priority=PRIORITY_BATCH))
+        await asyncio.sleep(0.01)
+        with pytest.raises(RenderSaturatedError):
+            await executor.run(time.sleep, 0, priority=PRIORITY_BATCH)
+        await executor.run(time.sleep, 0, priority=PRIORITY_INTERACTIVE)
+        await asyncio.gather(blocker, queued)
+
+    try:
+        asyncio.run(main())
+    finally:
+        executor.shutdown()
@@ -0,0 +1,121 @@
+"""
+レンダリング同時実行数の自動調整のテスト
+
+遅延が横ばいなら上限を上げ、遅延の悪化・メモリ不足で下げること、実行器が上限に従うことを検証する
+"""
+
+import asyncio
+import subprocess
+import time
+import types
+from contextlib import ExitStack
+
+import pytest
+
+from services import render_limiter
+from services.render_executor import PRIORITY_INTERACTIVE, RenderExecutor
+from services.render_limiter import (
+    DECISION_DECREASE_LATENCY, DECISION_DECREASE_MEMORY, DECISION_HOLD, DECISION_INCREASE, AdaptiveLimiter,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """render_limiter が参照する時刻を手動で進める"""
+    fake = types.SimpleNamespace(now=0.0)
+    monkeypatch.setattr(render_limiter, 'time', types.SimpleNamespace(monotonic=lambda: fake.now))
+    return fake
+
+
+def run_window(limiter, clock, latency, concurrent=True):
+    """窓1つ分のレンダリングを実行する（concurrent なら全件を同時に実行した状態にする）"""
+    count = max(render_limiter.MIN_WINDOW, limiter.current_limit())
+    if concurrent:
+        with ExitStack() as stack:
+            for _ in range(count):
+                stack.enter_context(limiter.track())
+            clock.now += latency
+    else:
+        for _ in range(count):
+            with limiter.track():
+                clock.now += latency
+
+
+def test_limit_grows_while_latency_is_flat(clock):
+    """遅延が横ばいで上限まで使われている間は上限を1ずつ上げ、max_limit で止まること"""
+    limiter = AdaptiveLimiter(initial_limit=2, min_limit=1, max_limit=5, memory_probe=lambda: 0.5)
+    limits = []
+    for _ in range(5):
+        run_window(limiter, clock, 1.0)
+        limits.append(limiter.current_limit())
+    assert limits == [3, 4, 5, 5, 5]
+    assert limiter.last_decision == DECISION_INCREASE
+
+
+def test_latency_degradation_backs_off(clock):
+    """直近の遅延が基準 × 許容倍率を超えたら上限を下げ、基準は悪化した遅延にゆっくりとしか追従しないこと"""
+    limiter = AdaptiveLimiter(initial_limit=8, min_limit=1, max_limit=16, memory_probe=lambda: 0.5)
+    run_window(limiter, clock, 1.0)
+    assert limiter.current_limit() == 9
+
+    run_window(limiter, clock, 2.0)
+    assert limiter.last_decision == DECISION_DECREASE_LATENCY
+    assert limiter.current_limit() == 6
+    assert limiter.baseline == pytest.approx(1.0 + render_limiter.BASELINE_ALPHA)
+
+
+def test_memory_pressure_backs_off(clock):
+    """メモリの空きが下限を下回ったら遅延が横ばいでも上限を下げること"""
+    limiter = AdaptiveLimiter(initial_limit=4, min_limit=2, max_limit=8, min_memory_ratio=0.1,
+                              memory_probe=lambda: 0.05)
+    for _ in range(5):
+        run_window(limiter, clock, 1.0)
+    assert limiter.last_decision == DECISION_DECREASE_MEMORY
+    assert limiter.current_limit() == 2
+
+
+def test_limit_is_held_without_demand(clock):
+    """上限まで使われていない（需要がない）場合は上限を上げないこと"""
+    limiter = AdaptiveLimiter(initial_limit=2, min_limit=1, max_limit=8, memory_probe=lambda: 0.5)
+    run_window(limiter, clock, 1.0, concurrent=False)
+    assert limiter.last_decision == DECISION_HOLD
+    assert limiter.current_limit() == 2
+
+
+def test_timeouts_count_and_failures_do_not(clock):
+    """タイムアウトは遅延として集計し、wkhtmltopdf の失敗は集計しないこと"""
+    limiter = AdaptiveLimiter(initial_limit=1, min_limit=1, max_limit=4, memory_probe=lambda: None)
+    with pytest.raises(RuntimeError):
+        with limiter.track():
+            raise RuntimeError('wkhtmltopdf failed')
+    with pytest.raises(subprocess.TimeoutExpired):
+        with limiter.track():
+            clock.now += 30
+            raise subprocess.TimeoutExpired('wkhtmltopdf', 30)
+    assert limiter._samples == [30]
+
+
+def test_executor_follows_adaptive_limit():
+    """実行器はその時点の上限を超えて実行しないこと"""
+    limit = {'value': 1}
+    executor = RenderExecutor(max_concurrency=4, max_queue=8, queue_timeout=5,
+                              limit_provider=lambda: limit['value'])
+
+    async def main():
+        tasks = [asyncio.create_task(executor.run(time.sleep, 0.2, priority=PRIORITY_INTERACTIVE))
+                 for _ in range(4)]
+        await asyncio.sleep(0.05)
+        first = executor.stats()
+        limit['value'] = 3
+        await asyncio.gather(*tasks[:1])
+        second = executor.stats()
+        await asyncio.gather(*tasks)
+        return first, second
+
+    try:
+        first, second = asyncio.run(main())
+    finally:
+        executor.shutdown()
+
+    assert (first['active'], first['waiting'], first['concurrency_limit']) == (1, 3, 1)
+    assert (second['active'], second['waiting']) == (3, 0)
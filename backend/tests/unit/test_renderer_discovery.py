@@ -0,0 +1,44 @@
+"""
+wkhtmltopdf 検出・バージョン確認のテスト
+
+探索順とバージョン文字列の判定を検証する
+"""
+
+import os
+import stat
+import sys
+
+import pytest
+
+from services.renderer_discovery import check_version, find_wkhtmltopdf, parse_version
+
+
+def _fake_executable(path, version_line: str):
+    path.write_text(f"#!{sys.executable}\nprint({version_line!r})\n")
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+def test_parse_version_detects_patched_qt():
+    """バージョンと patched Qt ビルドかどうかを取り出すこと"""
+    assert parse_version('wkhtmltopdf 0.12.6 (with patched qt)') == ((0, 12, 6), True)
+    assert parse_version('wkhtmltopdf 0.12.5') == ((0, 12, 5), False)
+    assert parse_version('unknown') is None
+
+
+def test_configured_path_takes_precedence(tmp_path, monkeypatch):
+    """環境変数 WKHTMLTOPDF_PATH の実行ファイルが存在すれば最優先で使うこと"""
+    executable = _fake_executable(tmp_path / 'wkhtmltopdf', 'wkhtmltopdf 0.12.6 (with patched qt)')
+    monkeypatch.setenv('WKHTMLTOPDF_PATH', executable)
+    assert find_wkhtmltopdf() == executable
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='シェバン付きスクリプトを実行ファイルとして使うため')
+def test_check_version_rejects_old_renderer(tmp_path):
+    """最小バージョン未満は起動時に検出されること"""
+    current = _fake_executable(tmp_path / 'current', 'wkhtmltopdf 0.12.6 (with patched qt)')
+    assert check_version(current) == ((0, 12, 6), True)
+
+    old = _fake_executable(tmp_path / 'old', 'wkhtmltopdf 0.12.4')
+    with pytest.raises(RuntimeError, match='older than'):
+        check_version(old)
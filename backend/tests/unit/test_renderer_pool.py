@@ -0,0 +1,184 @@
+"""
+wkhtmltopdf 常駐レンダラープールのテスト
+
+代替のワーカースクリプト（--read-args-from-stdin の入出力だけを真似る）で、規定ジョブ数での再起動、
+異常終了後の再起動、タイムアウト、失敗時の単発プロセスへの切り替えを検証する
+"""
+
+import os
+import stat
+import subprocess
+import sys
+import time
+
+import pytest
+
+from services import pdf_service
+from services.renderer_pool import RendererBusyError, RendererPool, RendererTimeoutError, RendererWorkerError
+
+# 入力 HTML に含まれる語で動作を切り替える代替 wkhtmltopdf
+#   CRASH: 常駐ワーカーとして動いている場合のみ "Done" を出さずに終了 / HANG: 応答しない /
+#   FAIL: 終了コードの行のみ出して次の行を待つ
+FAKE_WKHTMLTOPDF = '''
+import os, shlex, sys, time
+
+def render(src, dst, worker=False):
+    html = sys.stdin.buffer.read() if src == '-' else open(src, 'rb').read()
+    if worker and b'CRASH' in html:
+        sys.exit(1)
+    if b'HANG' in html:
+        time.sleep(30)
+    if b'FAIL' in html:
+        sys.stderr.write('Exit with code 1 due to network error: ContentNotFoundError\\n')
+        sys.stderr.flush()
+        return
+    pdf = b'%PDF-1.4 pid=' + str(os.getpid()).encode()
+    if dst == '-':
+        sys.stdout.buffer.write(pdf)
+    else:
+        open(dst, 'wb').write(pdf)
+    sys.stderr.write('Loading pages (1/6)\\n[==========] 100%\\rDone\\n')
+    sys.stderr.flush()
+
+if '--read-args-from-stdin' in sys.argv:
+    for line in sys.stdin:
+        args = shlex.split(line)
+        render(args[-2], args[-1], worker=True)
+else:
+    render(sys.argv[-2], sys.argv[-1])
+'''
+
+
+@pytest.fixture
+def executable(tmp_path):
+    path = tmp_path / 'wkhtmltopdf'
+    path.write_text(f'#!{sys.executable}\n{FAKE_WKHTMLTOPDF}')
+    path.chmod(path.stat().st_mode | stat.S_IXUSR)
+    return str(path)
+
+
+@pytest.fixture
+def make_pool(executable):
+    pools = []
+
+    def make(size=1, max_jobs=100):
+        pool = RendererPool(executable, size, max_jobs)
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+
+def render_job(pool, tmp_path, body='ok', timeout=10):
+    """1ジョブ実行して出力 PDF の内容を返す"""
+    html = tmp_path / 'input.html'
+    pdf = tmp_path / 'output.pdf'
+    html.write_text(f'<p>{body}</p>')
+    if pdf.exists():
+        pdf.unlink()
+    pool.render([str(html), str(pdf)], timeout=timeout)
+    return pdf.read_bytes()
+
+
+def worker_pid(pdf):
+    return int(pdf.split(b'pid=')[1])
+
+
+pytestmark = pytest.mark.skipif(os.name != 'posix', reason='代替ワーカーはシバン付きスクリプトで起動する')
+
+
+def test_worker_is_reused_then_recycled(make_pool, tmp_path):
+    """ワーカーは使い回され、規定ジョブ数に達したら新しいプロセスに置き換わること"""
+    pool = make_pool(size=1, max_jobs=2)
+    pids = [worker_pid(render_job(pool, tmp_path)) for _ in range(3)]
+    assert pids[0] == pids[1]
+    assert pids[2] != pids[1]
+
+
+def test_crashed_worker_is_restarted(make_pool, tmp_path):
+    """ワーカーが異常終了したジョブは失敗とし、次のジョブは再起動したワーカーで実行されること"""
+    pool = make_pool()
+    first = worker_pid(render_job(pool, tmp_path))
+    with pytest.raises(RendererWorkerError, match='exited'):
+        render_job(pool, tmp_path, 'CRASH')
+    assert worker_pid(render_job(pool, tmp_path)) != first
+
+
+def test_hung_worker_times_out(make_pool, tmp_path):
+    """応答しないワーカーはタイムアウトで失敗し、置き換えられること"""
+    pool = make_pool()
+    started = time.monotonic()
+    with pytest.raises(RendererTimeoutError, match='timed out'):
+        render_job(pool, tmp_path, 'HANG', timeout=1)
+    assert time.monotonic() - started < 5
+    assert render_job(pool, tmp_path).startswith(b'%PDF')
+
+
+def test_failure_without_done_does_not_wait_for_timeout(make_pool, tmp_path):
+    """"Done" を出さずに失敗したジョブはタイムアウトを待たずに失敗とすること"""
+    pool = make_pool()
+    started = time.monotonic()
+    with pytest.raises(RendererWorkerError, match='job failed'):
+        render_job(pool, tmp_path, 'FAIL', timeout=30)
+    assert time.monotonic() - started < 5
+
+
+def test_busy_pool_raises_worker_error(make_pool, tmp_path, monkeypatch):
+    """空きワーカーがない場合は RendererWorkerError（の派生）になること"""
+    from services import renderer_pool
+    monkeypatch.setattr(renderer_pool, 'IDLE_WAIT_SECONDS', 0.1)
+    pool = make_pool()
+    worker = pool._idle.get()
+    try:
+        with pytest.raises(RendererBusyError):
+            render_job(pool, tmp_path)
+    finally:
+        pool._idle.put(worker)
+
+
+@pytest.mark.parametrize('body', ['CRASH', 'busy'])
+def test_pool_failure_falls_back_to_one_shot(make_pool, executable, monkeypatch, body):
+    """プールでの失敗・空きワーカー不足時は単発プロセスで生成し直すこと"""
+    from services import renderer_pool
+    monkeypatch.setattr(renderer_pool, 'IDLE_WAIT_SECONDS', 0.1)
+    pool = make_pool()
+    monkeypatch.setattr(pdf_service, 'get_renderer_pool', lambda _: pool)
+    if body == 'busy':
+        pool._idle.get()
+    started = time.monotonic()
+    data = pdf_service._run_wkhtmltopdf([executable, '--quiet'], f'<p>{body}</p>'.encode(), timeout=10)
+    assert data.startswith(b'%PDF')
+    assert time.monotonic() - started < 5
+
+
+def test_pool_timeout_is_not_retried(make_pool, executable, monkeypatch):
+    """ワーカーがタイムアウトした文書は単発プロセスで再試行せず、元のタイムアウトで失敗すること"""
+    pool = make_pool()
+    monkeypatch.setattr(pdf_service, 'get_renderer_pool', lambda _: pool)
+    one_shot = []
+    monkeypatch.setattr(pdf_service, 'run_process', lambda *args, **kwargs: one_shot.append(args))
+    started = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        pdf_service._run_wkhtmltopdf([executable, '--quiet'], b'<p>HANG</p>', timeout=1)
+    assert time.monotonic() - started < 2
+    assert one_shot == []
+
+
+def test_one_shot_retry_gets_only_remaining_time(make_pool, executable, monkeypatch):
+    """単発プロセスでの再試行には元の期限までの残り時間のみ与えること"""
+    from services import renderer_pool
+    monkeypatch.setattr(renderer_pool, 'IDLE_WAIT_SECONDS', 0.5)
+    pool = make_pool()
+    pool._idle.get()
+    monkeypatch.setattr(pdf_service, 'get_renderer_pool', lambda _: pool)
+    timeouts = []
+
+    def fake_run_process(cmd, input_bytes, stdout, timeout, env=None):
+        timeouts.append(timeout)
+        return subprocess.CompletedProcess(cmd, 0, b'%PDF', b'')
+
+    monkeypatch.setattr(pdf_service, 'run_process', fake_run_process)
+    assert pdf_service._run_wkhtmltopdf([executable, '--quiet'], b'<p>ok</p>', timeout=10) == b'%PDF'
+    assert len(timeouts) == 1 and 9 < timeouts[0] <= 9.5
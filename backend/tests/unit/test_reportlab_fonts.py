@@ -0,0 +1,54 @@
+"""
+reportlab 用フォントレジストリのテスト
+
+フォントの探索・登録とスタイルシート生成がプロセス内で1回だけ行われることを検証する
+"""
+
+from pathlib import Path
+
+import pytest
+from reportlab.pdfbase import pdfmetrics
+
+from services import reportlab_fonts
+
+DEJAVU = Path('/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+
+
+@pytest.fixture
+def fresh_registry(monkeypatch):
+    monkeypatch.setattr(reportlab_fonts, '_font_name', None)
+    monkeypatch.setattr(reportlab_fonts, '_stylesheet', None)
+    monkeypatch.setattr(reportlab_fonts, '_stats', {})
+
+
+def test_first_existing_candidate_is_registered_once(fresh_registry, monkeypatch):
+    """存在する最初の候補を登録し、2回目以降は探索しないこと"""
+    if not DEJAVU.exists():
+        pytest.skip('DejaVu フォントがありません')
+    calls = []
+
+    def candidates():
+        calls.append(1)
+        return iter([('/nonexistent/font.ttc', 'Missing'), (str(DEJAVU), 'Test Gothic')])
+
+    monkeypatch.setattr(reportlab_fonts, 'font_candidates', candidates)
+
+    assert reportlab_fonts.get_reportlab_font() == 'Test Gothic'
+    assert reportlab_fonts.get_reportlab_font() == 'Test Gothic'
+    assert len(calls) == 1
+    assert 'Test Gothic' in pdfmetrics.getRegisteredFontNames()
+
+
+def test_cid_font_is_used_without_truetype_fonts(fresh_registry, monkeypatch):
+    """TrueType フォントが見つからない場合は日本語を表示できる CID フォントを使うこと"""
+    monkeypatch.setattr(reportlab_fonts, 'font_candidates', lambda: iter([('/nonexistent/font.ttc', 'Missing')]))
+    assert reportlab_fonts.get_reportlab_font() == reportlab_fonts.CID_FALLBACK_FONT
+
+
+def test_stylesheet_is_shared(fresh_registry, monkeypatch):
+    """スタイルシートは共有され、全カスタムスタイルが登録済みフォントを使うこと"""
+    monkeypatch.setattr(reportlab_fonts, 'font_candidates', lambda: iter([]))
+    styles = reportlab_fonts.get_reportlab_stylesheet()
+    assert reportlab_fonts.get_reportlab_stylesheet() is styles
+    for name in ('CustomHeading1', 'CustomHeading2', 'CustomHeading3', 'JapaneseNormal', 'JapaneseQuote'):
+        assert styles[name].fontName == reportlab_fonts.CID_FALLBACK_FONT